@@ -47,7 +47,12 @@ INSTALLED_APPS = [
     'operation',
     'position',
     'dashboard',
-    'chatbot'
+    'chatbot',
+    'stock',
+    'search',
+    'imports',
+    'jobs',
+    'packing',
 ]
 
 # Konfigurace Django REST Framework
@@ -92,9 +97,35 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'querycount.middleware.QueryCountMiddleware'
+    'querycount.middleware.QueryCountMiddleware',
+    'history.middleware.HistoryBufferMiddleware',
 ]
 
+# Historie změn – True = záznamy zapisuje worker na pozadí, požadavek na ně nečeká
+HISTORY_ASYNC = os.getenv("HISTORY_ASYNC", "0") == "1"
+
+# Výchozí strategie vychystávání výdejek (FEFO, FIFO, LIFO) a limit prohledaných skupin
+STOCK_ALLOCATION_STRATEGY = os.getenv("STOCK_ALLOCATION_STRATEGY", "FEFO")
+STOCK_ALLOCATION_MAX_ROWS = 1000
+
+# Sdílená cache (statistiky, dashboard, zámky asistenta) – napříč workery přes Redis,
+# lokálně lze použít soubor nebo databázi (`python manage.py createcachetable`)
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "redis" if REDIS_URL else "locmem")
+CACHE_BACKENDS = {
+    "redis": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL},
+    "file": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+             "LOCATION": os.getenv("CACHE_LOCATION", "/tmp/stockwise-cache")},
+    "db": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "stockwise_cache"},
+    "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+CACHES = {"default": CACHE_BACKENDS[CACHE_BACKEND]}
+
+# Stale-while-revalidate cache statistik – po jaké době (s) je záznam zastaralý i bez změny dat
+# a zda se zastaralý záznam přepočítává na pozadí (False = hned v požadavku)
+SWR_CACHE_MAX_AGE = int(os.getenv("SWR_CACHE_MAX_AGE", 60 * 60))
+SWR_CACHE_ASYNC = os.getenv("SWR_CACHE_ASYNC", "1") == "1"
+
 # CORS a CSRF nastavení pro FE běžící na localhostu nebo Vercelu
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -26,11 +26,14 @@ from rest_framework.urlpatterns import format_suffix_patterns
 
 from batch.views import BatchViewSet
 from box.views import BoxViewSet
-from chatbot.views import ChatbotView, StatisticsView
+from chatbot.views import ChatbotStreamView, ChatbotView, StatisticsView
 from client.views import ClientViewSet
 from group.views import GroupViewSet
 from history.views import HistoryViewSet
+from imports.views import ImportJobViewSet
+from jobs.views import JobViewSet
 from operation.views import OperationViewSet
+from packing.views import PackingSessionViewSet
 from position.views import PositionViewSet
 from product.views import ProductViewSet
 from user.views import UserViewSet
@@ -64,6 +67,9 @@ router.register(r'positions', PositionViewSet)
 router.register(r'history', HistoryViewSet)
 router.register(r'boxes', BoxViewSet)
 router.register(r'products', ProductViewSet)
+router.register(r'imports', ImportJobViewSet)
+router.register(r'jobs', JobViewSet)
+router.register(r'packing-sessions', PackingSessionViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -73,6 +79,8 @@ urlpatterns = [
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
     path('accounts/login/', auth_views.LoginView.as_view(), name='login'),
     path('api/dashboard/', include('dashboard.urls')),
+    path('api/stock/', include('stock.urls')),
     path("api/chatbot", ChatbotView.as_view(), name="chatbot"),
+    path("api/chatbot/stream", ChatbotStreamView.as_view(), name="chatbot_stream"),
     path("api/statistics", StatisticsView.as_view(), name="chatbot_statistics"),
 ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:20
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_amounts(apps, schema_editor):
+    """
+    Naplní čítače šarží a produktů z vazeb operací (stejně jako `ledger_service.recalculate_amounts`).
+    """
+    Operation = apps.get_model('operation', 'Operation')
+    Batch = apps.get_model('batch', 'Batch')
+    Product = apps.get_model('product', 'Product')
+    signs = {'IN': 1, 'OUT': -1}
+
+    product_amounts = defaultdict(int)
+    batch_amounts = defaultdict(int)
+    rows = (
+        Operation.groups.through.objects
+        .values('group__batch_id', 'group__batch__product_id', 'operation__type')
+        .annotate(total=Sum('group__quantity'))
+        .order_by()
+    )
+    for row in rows.iterator():
+        amount = signs.get(row['operation__type'], 0) * (row['total'] or 0)
+        product_amounts[row['group__batch__product_id']] += amount
+        batch_amounts[row['group__batch_id']] += amount
+
+    batches = list(Batch.objects.only('id', 'amount_cached'))
+    for batch in batches:
+        batch.amount_cached = batch_amounts.get(batch.id, 0)
+    Batch.objects.bulk_update(batches, ['amount_cached'], batch_size=1000)
+
+    products = list(Product.objects.only('id', 'amount_cached'))
+    for product in products:
+        product.amount_cached = product_amounts.get(product.id, 0)
+    Product.objects.bulk_update(products, ['amount_cached'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0002_remove_batch_quantity'),
+        ('group', '0003_alter_group_box'),
+        ('operation', '0009_remove_operation_shipping_extern_id_and_more'),
+        ('product', '0005_product_amount_cached'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='amount_cached',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_amounts, migrations.RunPython.noop),
+    ]
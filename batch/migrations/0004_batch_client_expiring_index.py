@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 14:15
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_clients(apps, schema_editor):
+    """
+    Doplní existujícím šaržím klienta jejich produktu.
+    """
+    Batch = apps.get_model('batch', 'Batch')
+    Product = apps.get_model('product', 'Product')
+    Batch.objects.filter(client__isnull=True).update(
+        client_id=Subquery(Product.objects.filter(id=OuterRef('product_id')).values('client_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0001_initial'),
+        ('batch', '0003_batch_amount_cached'),
+        ('product', '0005_product_amount_cached'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='client',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='client.client'),
+        ),
+        migrations.RunPython(backfill_clients, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(condition=models.Q(('amount_cached__gt', 0), ('expiration_date__isnull', False)), fields=['client', 'expiration_date'], name='batch_expiring_idx'),
+        ),
+    ]
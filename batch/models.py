@@ -1,16 +1,66 @@
 from django.db import models
-from history.models import History
+from django.db.models import Q
 
+from history.services import history_writer
+from history.tracking import TrackedFieldsMixin
 
-class Batch(models.Model):
+
+def assign_clients(batches):
+    """
+    Doplní šaržím klienta produktu (kopie kvůli indexu expirací) – z načteného produktu,
+    ostatním jedním dotazem.
+
+    :param batches: Instance Batch
+    """
+    from product.models import Product
+
+    missing = [batch for batch in batches if batch.client_id is None]
+    unresolved = []
+    for batch in missing:
+        if Batch.product.is_cached(batch):
+            batch.client_id = batch.product.client_id
+        else:
+            unresolved.append(batch)
+    if unresolved:
+        clients = dict(Product.objects.filter(
+            id__in={batch.product_id for batch in unresolved}).values_list('id', 'client_id'))
+        for batch in unresolved:
+            batch.client_id = clients.get(batch.product_id)
+
+
+class BatchManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        assign_clients(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class Batch(TrackedFieldsMixin, models.Model):
     # Odkaz na produkt, kterému šarže patří
     product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name="batches")
+    # Klient produktu – kopie pro index expirací (klient, datum) bez joinu na produkt
+    client = models.ForeignKey('client.Client', null=True, on_delete=models.CASCADE, related_name="+",
+                               db_index=False)
     # Číslo šarže
     batch_number = models.CharField(max_length=100)
     # Datum expirace (volitelné)
     expiration_date = models.DateField(null=True, blank=True)
     # Datum vytvoření záznamu
     created_at = models.DateTimeField(auto_now_add=True)
+    # Aktuální množství v šarži (udržuje skladová kniha)
+    amount_cached = models.IntegerField(default=0)
+
+    # Pole, jejichž změny se zapisují do historie
+    tracked_fields = ('batch_number',)
+
+    objects = BatchManager()
+
+    class Meta:
+        indexes = [
+            # Expirace šarží se zásobou – přehledy expirací jsou rozsahové dotazy nad tímto indexem
+            models.Index(fields=['client', 'expiration_date'], name='batch_expiring_idx',
+                         condition=Q(amount_cached__gt=0, expiration_date__isnull=False)),
+        ]
 
     def __str__(self):
         return f'{self.batch_number} - {self.product.name}'
@@ -19,18 +69,27 @@ class Batch(models.Model):
         """
         Uloží šarži a vytvoří záznam do historie (nová šarže nebo změna čísla)
         """
+        assign_clients([self])
         if self.pk:
-            previous = Batch.objects.get(pk=self.pk)
-            if previous.batch_number != self.batch_number:
-                History.objects.create(
+            previous = self.tracked_previous()
+            if previous['batch_number'] != self.batch_number:
+                history_writer.record(
                     related_id=self.id,
                     type='batch',
-                    description=f"Změněno číslo šarže z {previous.batch_number} na {self.batch_number}"
+                    description=f"Změněno číslo šarže z {previous['batch_number']} na {self.batch_number}"
                 )
+            # Čítač zásob patří skladové knize – běžné uložení ho nepřepisuje
+            if not kwargs.get('update_fields'):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != 'amount_cached'
+                ]
             super().save(*args, **kwargs)
+            self.refresh_tracked_snapshot()
         else:
             super().save(*args, **kwargs)
-            History.objects.create(
+            self.refresh_tracked_snapshot()
+            history_writer.record(
                 related_id=self.id,
                 type='batch',
                 description=f"Vytvořena nová šarže {self.batch_number}"
@@ -40,7 +99,7 @@ class Batch(models.Model):
         """
         Odstraní šarži a uloží informaci do historie
         """
-        History.objects.create(
+        history_writer.record(
             related_id=self.id,
             type='batch',
             description=f"Odstraněna šarže {self.batch_number}"
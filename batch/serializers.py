@@ -1,7 +1,9 @@
+from django.utils import timezone
 from rest_framework import serializers
 
 from batch.models import Batch
 from product.models import Product
+from search.services import search_service
 
 
 class BatchSerializer(serializers.ModelSerializer):
@@ -37,7 +39,9 @@ class BatchSerializer(serializers.ModelSerializer):
         print(validated_data)  # Debugging
 
         if isinstance(validated_data, list):
-            return Batch.objects.bulk_create([Batch(**batch) for batch in validated_data])
+            batches = Batch.objects.bulk_create([Batch(**batch) for batch in validated_data])
+            search_service.schedule_instances(batches)
+            return batches
 
         return super().create(validated_data)
 
@@ -63,4 +67,27 @@ class BatchBulkSerializer(serializers.ModelSerializer):
 
     # Vytvoří více záznamů najednou pomocí `bulk_create`
     def create(self, validated_data):
-        return Batch.objects.bulk_create([Batch(**item) for item in validated_data])
\ No newline at end of file
+        batches = Batch.objects.bulk_create([Batch(**item) for item in validated_data])
+        search_service.schedule_instances(batches)
+        return batches
+
+class ExpiringBatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer pro výpis upozornění na expirace.
+
+    Atributy:
+        - product_name, sku: Produkt šarže
+        - amount: Zásoba v šarži
+        - days_left: Počet dní do expirace (záporný = po expiraci)
+    """
+    product_name = serializers.CharField(source="product.name", read_only=True)
+    sku = serializers.CharField(source="product.sku", read_only=True)
+    amount = serializers.IntegerField(source="amount_cached", read_only=True)
+    days_left = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Batch
+        fields = ["id", "product_id", "product_name", "sku", "batch_number", "expiration_date", "amount", "days_left"]
+
+    def get_days_left(self, obj):
+        return (obj.expiration_date - timezone.now().date()).days
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+
+from batch.models import Batch
+
+# Výchozí a maximální počet dní dopředu, za které se expirace sledují
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+}
+
+# Řazení výpisu expirací (poslední pole je unikátní – kurzor)
+FEED_ORDERING = ('expiration_date', 'id')
+
+
+def _days(days):
+    return max(0, min(int(days), MAX_DAYS))
+
+
+def expiring(client_ids, days=DEFAULT_DAYS, include_expired=False):
+    """
+    Šarže se zásobou, které expirují do `days` dní – rozsahový dotaz nad indexem
+    `batch_expiring_idx` (klient, datum expirace; jen šarže s kladnou zásobou).
+
+    :param client_ids: ID klientů
+    :param days: Počet dní dopředu
+    :param include_expired: Zahrnout i šarže už po expiraci
+    :return: Queryset Batch
+    """
+    today = timezone.now().date()
+    batches = Batch.objects.filter(
+        client_id__in=client_ids,
+        amount_cached__gt=0,
+        expiration_date__isnull=False,
+        expiration_date__lte=today + timedelta(days=_days(days)),
+    )
+    if not include_expired:
+        batches = batches.filter(expiration_date__gte=today)
+    return batches
+
+
+def count_per_client(client_ids, days=DEFAULT_DAYS):
+    """
+    Počet expirujících šarží (včetně prošlých) pro každého klienta.
+
+    :return: Slovník {client_id: počet}
+    """
+    rows = expiring(client_ids, days, include_expired=True).values('client_id').annotate(count=Count('id'))
+    return {row['client_id']: row['count'] for row in rows}
+
+
+def buckets(client_id, days=DEFAULT_DAYS, bucket='day'):
+    """
+    Počet šarží a množství, které expirují v jednotlivých dnech / týdnech.
+
+    :param client_id: ID klienta
+    :param days: Počet dní dopředu
+    :param bucket: 'day' nebo 'week'
+    :return: Seznam {"date", "batches", "quantity"} od nejbližšího data
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Neznámé seskupení '{bucket}', povolené: {', '.join(BUCKETS)}.")
+    rows = (
+        expiring([client_id], days)
+        .annotate(bucket=BUCKETS[bucket]('expiration_date'))
+        .values('bucket')
+        .annotate(batches=Count('id'), quantity=Sum('amount_cached'))
+        .order_by('bucket')
+    )
+    return [{'date': row['bucket'], 'batches': row['batches'], 'quantity': row['quantity']} for row in rows]
+
+
+def feed(client_ids, days=DEFAULT_DAYS, include_expired=True):
+    """
+    Výpis upozornění na expirace seřazený od nejdříve expirující šarže (pro kurzorové stránkování
+    podle `FEED_ORDERING`).
+
+    :return: Queryset Batch s načteným produktem
+    """
+    return (
+        expiring(client_ids, days, include_expired)
+        .select_related('product')
+        .order_by(*FEED_ORDERING)
+    )
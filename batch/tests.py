@@ -1,5 +1,8 @@
 import pytest
 import uuid
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import status
 
 from batch.models import Batch
@@ -84,4 +87,52 @@ class TestBatchViewSetList:
         response = authenticated_client.get(f'/api/batches/search/?q=XYZ&clientId={other_client.id}')
 
         assert response.status_code == status.HTTP_200_OK
-        assert any(b['id'] == batch.id for b in response.data.get('results'))
\ No newline at end of file
+        assert any(b['id'] == batch.id for b in response.data.get('results'))
+
+@pytest.mark.django_db
+class TestBatchExpiring:
+
+    # Šarže expirující v termínu (jen se zásobou) – kurzorové stránkování od nejdřívější expirace
+    def test_expiring_feed(self, authenticated_client, batch_factory, user_with_client):
+        client = user_with_client.client.first()
+        today = timezone.now().date()
+        soon = [batch_factory(client=client, batch_number=f"EXP{day}", expiration_date=today + timedelta(days=day))
+                for day in (3, 1, 2)]
+        empty = batch_factory(client=client, batch_number="EMPTY", expiration_date=today + timedelta(days=1))
+        later = batch_factory(client=client, batch_number="LATER", expiration_date=today + timedelta(days=90))
+        Batch.objects.filter(id__in=[batch.id for batch in soon] + [later.id]).update(amount_cached=5)
+
+        response = authenticated_client.get(f'/api/batches/expiring/?client_id={client.id}&page_size=2&cursor=')
+        assert response.status_code == status.HTTP_200_OK
+        assert [b['batch_number'] for b in response.data['results']] == ["EXP1", "EXP2"]
+        assert response.data['results'][0]['days_left'] == 1
+
+        response = authenticated_client.get(
+            f'/api/batches/expiring/?client_id={client.id}&page_size=2&cursor={response.data["cursor"]}')
+        assert [b['batch_number'] for b in response.data['results']] == ["EXP3"]
+        assert response.data['cursor'] is None
+        assert empty.client_id == client.id
+
+    # Počty expirací po týdnech
+    def test_expiring_summary(self, authenticated_client, batch_factory, user_with_client):
+        client = user_with_client.client.first()
+        batch = batch_factory(client=client, expiration_date=timezone.now().date() + timedelta(days=10))
+        Batch.objects.filter(id=batch.id).update(amount_cached=7)
+
+        response = authenticated_client.get(f'/api/batches/expiring/summary/?client_id={client.id}&bucket=week')
+        assert response.status_code == status.HTTP_200_OK
+        assert [(row['batches'], row['quantity']) for row in response.data] == [(1, 7)]
+
+        response = authenticated_client.get(f'/api/batches/expiring/summary/?client_id={client.id}&bucket=year')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Změna klienta produktu se promítne do kopie u šarží
+    def test_product_client_change_updates_batches(self, batch_factory, client_factory):
+        batch = batch_factory()
+        other = client_factory(name="Nový klient")
+        product = batch.product
+        product.client = other
+        product.save()
+
+        batch.refresh_from_db()
+        assert batch.client_id == other.id
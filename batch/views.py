@@ -1,15 +1,14 @@
-from functools import reduce
-
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
 
 from batch.models import Batch
-from batch.serializers import BatchSerializer
-from utils.pagination import CustomPageNumberPagination
+from batch.serializers import BatchSerializer, ExpiringBatchSerializer
+from batch.services import expiry_service
+from search.services import search_service
+from utils.pagination import CustomPageNumberPagination, KeysetPagination
 
 
 class BatchViewSet(viewsets.ModelViewSet):
@@ -20,12 +19,15 @@ class BatchViewSet(viewsets.ModelViewSet):
     - standardní CRUD operace děděné z `ModelViewSet`
     - omezení záznamů dle klienta přihlášeného uživatele (`get_queryset`)
     - vlastní endpoint `/search/`, který umožňuje hledat šarže podle názvu produktu, SKU, čísla šarže nebo data expirace. Vyhledávání podporuje vícenásobné výrazy oddělené čárkou a funguje jako OR kombinace mezi jednotlivými poli a výrazy.
+    - `/expiring/` – upozornění na expirace šarží se zásobou (kurzorové stránkování `?cursor=`)
+      a `/expiring/summary/` – počty expirací po dnech nebo týdnech
 
     Bezpečnostní filtr: Šarže jsou filtrovány podle klientů, ke kterým má přihlášený uživatel přiřazený přístup.
     """
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
     pagination_class = CustomPageNumberPagination
+    keyset_ordering = expiry_service.FEED_ORDERING
 
     @swagger_auto_schema(
         operation_description="Vrací seznam všech šarží s možností filtrování dle klienta.",
@@ -108,34 +110,68 @@ class BatchViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        data_query = query.split(',')
-        if len(data_query) > 1:
-            data_query = [term.strip() for term in data_query if term.strip()]
-            # Sestavení složeného OR dotazu přes více polí
-            query_filters = reduce(
-                lambda q, term: q
-                                | Q(product__name__icontains=term)
-                                | Q(product__sku__icontains=term)
-                                | Q(batch_number__icontains=term)
-                                | Q(expiration_date__icontains=term),
-                data_query,
-                Q()
-            )
-            batches = Batch.objects.filter(query_filters).distinct()
-        else:
-            batches = Batch.objects.filter(
-                Q(product__name__icontains=query) |
-                Q(product__sku__icontains=query) |
-                Q(batch_number__icontains=query) |
-                Q(expiration_date__icontains=query)
-            )
-
-        if client_id:
-            batches = batches.filter(product__client_id=client_id)
+        terms = search_service.split_terms(query)
+        batches = Batch.objects.filter(id__in=search_service.search('batch', terms, client_id))
+        batches = search_service.rank(batches, 'batch', terms)
 
         paginator = CustomPageNumberPagination()
         paginator.page_size = request.GET.get('page_size') or 10
         paginated_data = paginator.paginate_queryset(batches, request)
 
         serializer = self.get_serializer(paginated_data, many=True)
-        return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
+        return paginator.get_paginated_response(serializer.data)
+
+    def _expiry_params(self, request):
+        """
+        Klienti uživatele (případně jen `client_id`) a počet dní dopředu z parametrů požadavku.
+        """
+        client_ids = list(request.user.client.values_list('id', flat=True))
+        client_id = request.GET.get('client_id')
+        if client_id:
+            client_ids = [cid for cid in client_ids if str(cid) == client_id]
+        try:
+            days = int(request.GET.get('days', expiry_service.DEFAULT_DAYS))
+        except ValueError:
+            days = expiry_service.DEFAULT_DAYS
+        return client_ids, days
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('client_id', openapi.IN_QUERY, description="ID klienta", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('days', openapi.IN_QUERY, description="Počet dní dopředu (výchozí 30)",
+                              type=openapi.TYPE_INTEGER),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Kurzor další stránky (první stránka prázdný)",
+                              type=openapi.TYPE_STRING),
+        ],
+        responses={200: ExpiringBatchSerializer(many=True)},
+        operation_description="Upozornění na expirace – šarže se zásobou, které expirují do zadaného počtu dní "
+                              "(včetně prošlých), od nejdříve expirující."
+    )
+    @action(detail=False, methods=['get'], url_path='expiring')
+    def expiring(self, request):
+        client_ids, days = self._expiry_params(request)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(expiry_service.feed(client_ids, days), request, view=self)
+        return paginator.get_paginated_response(ExpiringBatchSerializer(page, many=True).data)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('client_id', openapi.IN_QUERY, description="ID klienta", type=openapi.TYPE_INTEGER,
+                              required=True),
+            openapi.Parameter('days', openapi.IN_QUERY, description="Počet dní dopředu (výchozí 30)",
+                              type=openapi.TYPE_INTEGER),
+            openapi.Parameter('bucket', openapi.IN_QUERY, description="Seskupení: day nebo week",
+                              type=openapi.TYPE_STRING),
+        ],
+        operation_description="Počet šarží a množství expirujících v jednotlivých dnech nebo týdnech."
+    )
+    @action(detail=False, methods=['get'], url_path='expiring/summary')
+    def expiring_summary(self, request):
+        client_ids, days = self._expiry_params(request)
+        if not request.GET.get('client_id') or not client_ids:
+            return Response({"detail": "Query parameter 'client_id' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rows = expiry_service.buckets(client_ids[0], days, request.GET.get('bucket', 'day'))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rows)
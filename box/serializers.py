@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from box.models import Box
 from position.models import Position
+from search.services import search_service
 
 
 class BoxSerializer(serializers.ModelSerializer):
@@ -61,6 +62,8 @@ class BoxSerializer(serializers.ModelSerializer):
         print(validated_data)  # Debugging
 
         if isinstance(validated_data, list):
-            return Box.objects.bulk_create([Box(**batch) for batch in validated_data])
+            boxes = Box.objects.bulk_create([Box(**batch) for batch in validated_data])
+            search_service.schedule_instances(boxes)
+            return boxes
 
         return super().create(validated_data)
\ No newline at end of file
@@ -1,16 +1,15 @@
-from functools import reduce
-
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Prefetch
+from django.db.models import Prefetch
 
 from box.models import Box
 from box.serializers import BoxSerializer
 from group.models import Group
+from search.services import search_service
 from utils.pagination import CustomPageNumberPagination
 
 
@@ -107,23 +106,9 @@ class BoxViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        data_query = query.split(',')
-        if len(data_query) > 1:
-            data_query = [term.strip() for term in data_query if term.strip()]
-
-            query_filters = reduce(
-                lambda q, term: q |
-                                Q(ean__icontains=term) |
-                                Q(position__code__icontains=term),
-                data_query,
-                Q()
-            )
-            boxes = Box.objects.filter(query_filters).distinct("id")
-        else:
-            boxes = Box.objects.filter(
-                Q(ean__icontains=query) |
-                Q(position__code__icontains=query)
-            )
+        terms = search_service.split_terms(query)
+        boxes = Box.objects.filter(id__in=search_service.search('box', terms))
+        boxes = search_service.rank(boxes, 'box', terms)
 
         paginator = CustomPageNumberPagination()
         paginator.page_size = request.GET.get('page_size') or 10
@@ -150,16 +135,13 @@ class BoxViewSet(viewsets.ModelViewSet):
         Vrací produkty (skupiny) obsažené v konkrétní krabici
         """
         box = get_object_or_404(Box, id=pk)
-        groups = Group.objects.filter(box=box)
-
-        product_summary = {}
-        for group in groups:
-            product = group.batch.product
-            product_summary[group.id] = {
-                "id": product.id,
-                "group_id": group.id,
-                "name": product.name,
-                "quantity": group.quantity,
-            }
-
-        return Response(list(product_summary.values()), status=200)
\ No newline at end of file
+        # Jeden dotaz se spojením na produkt (bez dotazu na šarži a produkt pro každou skupinu)
+        groups = Group.objects.filter(box=box).order_by('id').values_list(
+            'id', 'quantity', 'batch__product_id', 'batch__product__name'
+        )
+
+        products = [
+            {"id": product_id, "group_id": group_id, "name": name, "quantity": quantity}
+            for group_id, quantity, product_id, name in groups
+        ]
+        return Response(products, status=200)
\ No newline at end of file
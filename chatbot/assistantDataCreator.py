@@ -1,13 +1,17 @@
+import inspect
 from datetime import datetime, timedelta
 
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Avg, Count, Max, Min, Sum
 
 from batch.models import Batch
 from batch.serializers import BatchSerializer, BatchBulkSerializer
 from box.models import Box
+from chatbot.tool_output import fit_rows, tool_output
 from client.models import Client
 from client.serializers import ClientSerializer, ClientBulkSerializer
+from dashboard.services import statistics_service
 from group.models import Group
 from group.serializers import GroupSerializer, GroupBulkSerializer
 from history.models import History
@@ -18,10 +22,82 @@ from position.models import Position
 from position.serializers import PositionSerializer, PositionBulkSerializer
 from product.models import Product
 from product.serializers import ProductSerializer, ProductBulkSerializer
+from search.services import search_service
 from user.models import User
 from user.serializers import UserSerializer, UserBulkSerializer
 from warehouse.models import Warehouse
 from warehouse.serializers import WarehouseSerializer, WarehouseBulkSerializer
+from utils.pagination import keyset_filter
+
+# Čtecí nástroje asistenta – pro každý model pole, která smí vracet a filtrovat (`fields`),
+# výchozí projekce (`default`) a cesta ke klientovi pro omezení na klienta konverzace (`client`)
+TOOL_MODELS = {
+    Product: {
+        'client': 'client_id',
+        'fields': ['id', 'sku', 'name', 'description', 'amount_cached', 'created_at', 'client_id'],
+        'default': ['id', 'sku', 'name', 'amount_cached'],
+    },
+    Batch: {
+        'client': 'product__client_id',
+        'fields': ['id', 'batch_number', 'expiration_date', 'amount_cached', 'created_at', 'product_id',
+                   'product__sku', 'product__name'],
+        'default': ['id', 'batch_number', 'expiration_date', 'amount_cached', 'product__sku'],
+    },
+    Group: {
+        'client': 'batch__product__client_id',
+        'fields': ['id', 'quantity', 'rescanned', 'created_at', 'batch_id', 'batch__batch_number',
+                   'batch__expiration_date', 'batch__product_id', 'batch__product__sku', 'batch__product__name',
+                   'box_id', 'box__ean', 'box__position__code'],
+        'default': ['id', 'quantity', 'batch__batch_number', 'batch__product__sku', 'box__ean', 'box__position__code'],
+    },
+    Operation: {
+        'client': 'client_id',
+        'fields': ['id', 'number', 'type', 'status', 'description', 'created_at', 'updated_at', 'delivery_date',
+                   'user_id', 'user__name', 'groups_amount', 'product_amount', 'groups_name', 'delivery_name',
+                   'delivery_city', 'delivery_country', 'cash_on_delivery'],
+        'default': ['id', 'number', 'type', 'status', 'created_at', 'product_amount'],
+    },
+    Client: {
+        'client': 'id',
+        'fields': ['id', 'name', 'email', 'created_at'],
+        'default': ['id', 'name', 'email'],
+    },
+    User: {
+        'client': 'client',
+        'fields': ['id', 'name', 'email', 'role', 'is_active', 'created_at'],
+        'default': ['id', 'name', 'email', 'role'],
+    },
+    Position: {
+        'fields': ['id', 'code', 'warehouse_id', 'warehouse__name'],
+        'default': ['id', 'code', 'warehouse__name'],
+    },
+    Warehouse: {
+        'fields': ['id', 'name', 'description', 'city', 'state', 'address', 'psc', 'created_at'],
+        'default': ['id', 'name', 'city'],
+    },
+    History: {
+        'fields': ['id', 'type', 'related_id', 'description', 'timestamp', 'user_id', 'user__email'],
+        'default': ['id', 'type', 'related_id', 'description', 'timestamp'],
+    },
+}
+
+# Povolené lookupy a transformace ve `filters` (např. `created_at__date__gte`)
+FILTER_LOOKUPS = {'exact', 'iexact', 'contains', 'icontains', 'startswith', 'istartswith', 'in', 'gt', 'gte', 'lt',
+                  'lte', 'range', 'isnull'}
+FILTER_TRANSFORMS = {'date', 'year', 'month', 'week', 'day'}
+
+AGGREGATE_FUNCTIONS = {'count': Count, 'sum': Sum, 'avg': Avg, 'min': Min, 'max': Max}
+
+# Počet záznamů na stránku výstupu (výchozí a maximální); výstup navíc hlídá rozpočet tokenů
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class ToolParameterError(ValueError):
+    """
+    Neplatný parametr čtecího nástroje – text chyby se vrací asistentovi jako výstup.
+    """
+
 
 def with_type(func, history_type):
     """
@@ -35,14 +111,25 @@ def with_type(func, history_type):
         func(call_id, parameters, client_id, model, serializer, user, history_type)
 
 
+def with_statistic(statistic):
+    """
+    Pomocná funkce pro agregační nástroj – volá `get_statistic` s danou agregací.
+
+    :param statistic: Funkce z `statistics_service` (první parametr je ID klienta)
+    :return: Lambda funkce se signaturou nástroje
+    """
+    return lambda call_id, parameters, client_id, model, serializer, user: \
+        AssistantDataCreator().get_statistic(call_id, parameters, client_id, statistic)
+
+
 def get_function(function_name):
-    available_functions = {
-        """
-        Vrací trojici (funkce, model, serializer) podle názvu funkce.
+    """
+    Vrací trojici (funkce, model, serializer) podle názvu funkce.
 
-        :param function_name: Název funkce (např. 'getProducts')
-        :return: Tuple (funkce, model, serializer)
-        """
+    :param function_name: Název funkce (např. 'getProducts')
+    :return: Tuple (funkce, model, serializer)
+    """
+    available_functions = {
         # GET funkce – získání dat
         'getBatches': (AssistantDataCreator().get_data, Batch, BatchSerializer),
         'getClients': (AssistantDataCreator().get_data, Client, ClientSerializer),
@@ -60,6 +147,13 @@ def get_function(function_name):
         'getGroupHistory': (with_type(AssistantDataCreator().get_specific_history_data, 'group'), History, HistorySerializer),
         'getPositionHistory': (with_type(AssistantDataCreator().get_specific_history_data, 'position'), History, HistorySerializer),
 
+        # Agregace počítané v databázi – malé výsledky místo celých tabulek
+        'getWeeklyOperationCounts': (with_statistic(statistics_service.operations_per_week), Operation, None),
+        'getTopOutboundProducts': (with_statistic(statistics_service.top_outbound_products), Product, None),
+        'getExpirationsPerWeek': (with_statistic(statistics_service.expirations_per_week), Batch, None),
+        'getBoxesPerPosition': (with_statistic(statistics_service.boxes_per_position), Position, None),
+        'getUserOperationCounts': (with_statistic(statistics_service.operations_per_user), Operation, None),
+
         # POST funkce – vytvoření objektů (single/bulk)
         'createBatch': (AssistantDataCreator().create_data, Batch, BatchSerializer),
         'createClient': (AssistantDataCreator().create_data, Client, ClientSerializer),
@@ -117,7 +211,7 @@ class AssistantDataCreator(object):
         if 'to_timestamp' in parameters:
             data_query = data_query.filter(timestamp__lte=parameters['to_timestamp'])
 
-        return self.format_data(HistorySerializer, data_query, call_id)
+        return self.query_output(call_id, parameters, data_query, model, HistorySerializer)
 
     def get_specific_history_data(self, call_id, parameters, client_id, model, serializer, user, history_type):
         """
@@ -133,6 +227,13 @@ class AssistantDataCreator(object):
         """
         Obecné získání dat z daného modelu s volitelným filtrováním.
 
+        Parametry nástroje:
+        - `fields` – seznam vracených polí (výchozí je kompaktní projekce modelu)
+        - `filters` – podmínky `{"pole__lookup": hodnota}` nad povolenými poli
+        - `limit` a `cursor` – stránkování (kurzor z `nextCursor` předchozího výstupu)
+        - `aggregate` – `{"function": "count|sum|avg|min|max", "field": ..., "groupBy": [...]}`
+        - `onlyCount` – vrátí jen počet záznamů
+
         :param call_id: ID volání nástroje
         :param parameters: Filtrovací parametry
         :param client_id: ID klienta
@@ -143,37 +244,166 @@ class AssistantDataCreator(object):
         """
         data_query = model.objects.all()
 
-        if client_id:
-            if isinstance(model, Batch):
-                data_query = data_query.filter(item__client_id=client_id)
-            elif isinstance(model, Client):
-                data_query = data_query.filter(id=client_id)
-            elif isinstance(model, Group):
-                data_query = data_query.filter(batch__item__client_id=model.id)
-            elif isinstance(model, Operation):
-                data_query = data_query.filter(items__batch__item__client_id=model.id)
+        spec = TOOL_MODELS.get(model)
+        if client_id and spec and spec.get('client'):
+            data_query = data_query.filter(**{spec['client']: client_id})
 
+        # Původní jednoduché filtry (kód pozice, EAN krabice)
         filter_params = ['code', 'ean',]
         for param in filter_params:
             if parameters.get(param) is not None:
-                if param == 'created_by_month':
-                    data_query = self.filter_by_month(parameters.get(param), data_query, model)
-                elif param == 'created_by_year':
-                    data_query = self.filter_by_year(parameters.get(param), data_query, model)
-                elif param == 'created_by_day':
-                    data_query = self.filter_by_day(parameters.get(param), data_query, model)
-                else:
-                    data_query = data_query.filter(**{param: parameters.get(param)})
-
-        # Vrací pouze počet
-        if parameters.get('onlyCount'):
-            count_of_data_query = data_query.count()
-            return {
-                        'tool_call_id': call_id,
-                        'output': str(count_of_data_query)
-                    }
+                data_query = data_query.filter(**{param: parameters.get(param)})
+
+        return self.query_output(call_id, parameters, data_query, model, serializer)
+
+    def query_output(self, call_id, parameters, data_query, model, serializer):
+        """
+        Použije na queryset parametry nástroje a vrátí výstup v rozpočtu tokenů.
+        Modely bez definice v `TOOL_MODELS` se serializují celé přes `format_data`.
+
+        :param call_id: ID volání nástroje
+        :param parameters: Parametry nástroje
+        :param data_query: Queryset omezený na klienta
+        :param model: Django model
+        :param serializer: Serializer pro modely mimo `TOOL_MODELS`
+        :return: dict
+        """
+        spec = TOOL_MODELS.get(model)
+        try:
+            if spec:
+                data_query = self.apply_filters(data_query, spec, parameters.get('filters'))
+
+            # Vrací pouze počet
+            if parameters.get('onlyCount'):
+                count_of_data_query = data_query.count()
+                return {
+                            'tool_call_id': call_id,
+                            'output': str(count_of_data_query)
+                        }
+
+            if not spec:
+                return self.format_data(serializer, data_query, call_id)
+
+            if parameters.get('aggregate'):
+                return tool_output(call_id, self.aggregate(data_query, spec, parameters))
+            return tool_output(call_id, self.project(data_query, spec, parameters))
+        except (ToolParameterError, FieldError, ValidationError, ValueError, TypeError) as e:
+            return tool_output(call_id, {'error': str(e)})
+
+    def get_statistic(self, call_id, parameters, client_id, statistic):
+        """
+        Spustí agregaci pro klienta konverzace. Z parametrů se předají jen ty, které agregace
+        přijímá (`weeks`, `days`, `limit`), jako celá čísla.
+
+        :param call_id: ID volání nástroje
+        :param parameters: Parametry nástroje
+        :param client_id: ID klienta
+        :param statistic: Funkce z `statistics_service`
+        :return: dict
+        """
+        if not client_id:
+            return tool_output(call_id, {'error': "Agregace vyžaduje klienta."})
+
+        accepted = set(inspect.signature(statistic).parameters) - {'client_id'}
+        try:
+            options = {name: int(value) for name, value in parameters.items() if name in accepted}
+        except (TypeError, ValueError):
+            return tool_output(call_id, {'error': f"Parametry {', '.join(sorted(accepted))} musí být čísla."})
+
+        rows, truncated = fit_rows(statistic(client_id, **options))
+        return tool_output(call_id, {'results': rows, 'count': len(rows), 'truncated': truncated})
+
+    @staticmethod
+    def _field(spec, name):
+        if name not in spec['fields']:
+            raise ToolParameterError(f"Neznámé pole '{name}'. Dostupná pole: {', '.join(spec['fields'])}.")
+        return name
+
+    def apply_filters(self, data_query, spec, filters):
+        """
+        Použije filtry `{"pole__lookup": hodnota}` – jen nad povolenými poli a lookupy
+        (asistent tak nemůže procházet libovolné relace).
+
+        :return: Filtrovaný queryset
+        """
+        if not filters:
+            return data_query
+        if not isinstance(filters, dict):
+            raise ToolParameterError("Parametr 'filters' musí být objekt {pole__lookup: hodnota}.")
+
+        conditions = {}
+        for key, value in filters.items():
+            parts = key.split('__')
+            suffix = []
+            while parts and '__'.join(parts) not in spec['fields']:
+                suffix.insert(0, parts.pop())
+            if not parts:
+                self._field(spec, key)
+            if len(suffix) > 2 or any(
+                part not in FILTER_LOOKUPS | FILTER_TRANSFORMS for part in suffix
+            ) or (len(suffix) == 2 and suffix[0] not in FILTER_TRANSFORMS):
+                raise ToolParameterError(f"Nepodporovaný filtr '{key}'.")
+            conditions[key] = value
+        return data_query.filter(**conditions)
+
+    def project(self, data_query, spec, parameters):
+        """
+        Stránka záznamů jako `values()` projekce, seřazená od nejnovějších (podle ID).
+
+        :return: dict {'results', 'count', 'nextCursor', 'truncated'}
+        """
+        fields = [self._field(spec, name) for name in parameters.get('fields') or spec['default']]
+        if 'id' not in fields:
+            fields.insert(0, 'id')
+        limit = self._limit(parameters)
+
+        data_query = data_query.order_by('-id')
+        if parameters.get('cursor'):
+            data_query = data_query.filter(keyset_filter(('-id',), [int(parameters['cursor'])]))
+
+        rows = list(data_query.values(*fields)[:limit + 1])
+        has_more = len(rows) > limit
+        rows, truncated = fit_rows(rows[:limit])
+
+        return {
+            'results': rows,
+            'count': len(rows),
+            'nextCursor': str(rows[-1]['id']) if rows and (has_more or truncated) else None,
+            'truncated': truncated,
+        }
+
+    def aggregate(self, data_query, spec, parameters):
+        """
+        Agregace v databázi (GROUP BY) – asistent dostane jen součty místo celých tabulek.
+
+        :return: dict {'results', 'count', 'truncated'}
+        """
+        aggregate = parameters['aggregate']
+        if not isinstance(aggregate, dict):
+            raise ToolParameterError("Parametr 'aggregate' musí být objekt {function, field, groupBy}.")
+
+        function = AGGREGATE_FUNCTIONS.get(str(aggregate.get('function', 'count')).lower())
+        if function is None:
+            raise ToolParameterError(f"Podporované funkce: {', '.join(AGGREGATE_FUNCTIONS)}.")
+        field = self._field(spec, aggregate.get('field') or 'id')
+        group_by = [self._field(spec, name) for name in aggregate.get('groupBy') or []]
+
+        value = function(field, distinct=True) if function is Count and field != 'id' else function(field)
+        if not group_by:
+            return {'results': [data_query.aggregate(value=value)], 'count': 1, 'truncated': False}
+
+        rows = list(data_query.values(*group_by).annotate(value=value).order_by('-value', *group_by)[
+                    :self._limit(parameters)])
+        rows, truncated = fit_rows(rows)
+        return {'results': rows, 'count': len(rows), 'truncated': truncated}
 
-        return self.format_data(serializer, data_query, call_id)
+    @staticmethod
+    def _limit(parameters):
+        try:
+            limit = int(parameters.get('limit') or DEFAULT_LIMIT)
+        except (TypeError, ValueError):
+            raise ToolParameterError("Parametr 'limit' musí být číslo.")
+        return max(1, min(limit, MAX_LIMIT))
 
     def update_data(self, call_id, parameters, client_id, model, serializer, user):
         """
@@ -281,6 +511,7 @@ class AssistantDataCreator(object):
             if serializer_instance.is_valid():
                 instances = [model(**item) for item in serializer_instance.validated_data]
                 model.objects.bulk_create(instances, batch_size=1000)  # můžeš upravit batch_size dle potřeby
+                search_service.schedule_instances(instances)
                 return {
                     'tool_call_id': call_id,
                     'output': f'{len(instances)} {model.__name__} objects created'
@@ -312,27 +543,15 @@ class AssistantDataCreator(object):
     @staticmethod
     def format_data(serializer, data_query, call_id):
         """
-        Serializuje queryset do JSON formátu.
+        Serializuje queryset do kompaktního JSON (v rozpočtu tokenů výstupu).
 
         :param serializer: Serializér pro výstup
         :param data_query: Queryset s daty
         :param call_id: ID volání nástroje
         :return: dict
         """
-        if data_query is []:
-            return None
-
-        data = serializer(data_query, many=True).data
-        data_bytes = JsonResponse(data, safe=False).content
-
-        outputs = {
-            data_bytes.decode("utf-8")
-        }
-        return {
-            'tool_call_id': call_id,
-            'output': str(outputs)
-        }
-
+        rows, truncated = fit_rows(serializer(data_query, many=True).data)
+        return tool_output(call_id, {'results': rows, 'count': len(rows), 'truncated': truncated})
 
     @staticmethod
     def filter_by_year(date, data_query, model):
@@ -1,13 +1,15 @@
 import re
 import csv
 
+from asgiref.sync import async_to_sync
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 
-from chatbot.views import OpenAIHandler, ChatbotView
+from chatbot.openai_handler import OpenAIHandler
+from chatbot.views import ChatbotView
 from client.models import Client
-from position.models import Position
 from product.models import Product
+from stock.services import location_service
 
 RUNS = 100
 ASSISTANT_KEY = ChatbotView.ASSISTANT_KEY
@@ -25,13 +27,12 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         test_type = options["test_type"]
-        handler = OpenAIHandler()
         user = get_user_model().objects.first()
         client = Client.objects.first()
 
         if test_type == "pozice":
             prompt = "Jaká je neobsazenější pozice a kolik je na ní krabic. Odpověz jednou větou."
-            target, expected = self.get_position_data()
+            target, expected = self.get_position_data(client)
             self.stdout.write(f"❗ Nejvíc krabic je na pozici: {target} ({expected} ks)")
             match_func = lambda answer: (
                 str(expected) in answer and
@@ -44,9 +45,9 @@ class Command(BaseCommand):
             match_func = lambda answer: set(map(str.lower, map(str.strip, answer.split(",")))) == set(p.lower() for p in expected_set)
 
         csv_path = f"chatbot_results_{test_type}.csv"
-        self.run_test(handler, user, client, prompt, match_func, csv_path)
+        self.run_test(user, client, prompt, match_func, csv_path)
 
-    def run_test(self, handler, user, client, prompt, match_func, csv_path):
+    def run_test(self, user, client, prompt, match_func, csv_path):
         with open(csv_path, "w", newline="", encoding="utf-8") as file:
             writer = csv.DictWriter(file, fieldnames=["run", "actual", "is_correct"])
             writer.writeheader()
@@ -54,12 +55,7 @@ class Command(BaseCommand):
             for i in range(RUNS):
                 self.stdout.write(f"Run {i + 1}/{RUNS}...")
                 try:
-                    response = handler.run_prompt(
-                        user=user,
-                        client=client,
-                        prompt=prompt,
-                        assistant_id=ASSISTANT_KEY
-                    )
+                    response = async_to_sync(self.ask)(user, client, prompt)
                     answer = response.get("content", "").strip()
                     correct = match_func(answer)
                     writer.writerow({
@@ -73,9 +69,13 @@ class Command(BaseCommand):
 
         self.stdout.write(f"✅ Testování dokončeno. Výsledky uloženy do: {csv_path}")
 
-    def get_position_data(self):
-        positions = Position.objects.prefetch_related("boxes").filter(boxes__isnull=False)
-        if not positions.exists():
+    async def ask(self, user, client, prompt):
+        # Handler se vytváří uvnitř event loop (sdílený klient patří ke smyčce)
+        return await OpenAIHandler().run_prompt(user=user, client=client, prompt=prompt, assistant_id=ASSISTANT_KEY)
+
+    def get_position_data(self, client):
+        # Stejná data, jaká asistent dostane z getBoxesPerPosition (krabice se zbožím klienta)
+        rows = location_service.occupancy([client.id], limit=1)
+        if not rows:
             raise ValueError("Žádné pozice s krabicemi ve skladu neexistují.")
-        best = max(positions, key=lambda p: p.boxes.count())
-        return best.code, best.boxes.count()
\ No newline at end of file
+        return rows[0]['position'], rows[0]['boxes']
\ No newline at end of file
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import weakref
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from openai import AsyncOpenAI
+
+from chatbot.assistant_threads.models import ChatBotAssistantThread, OPEANAI_MODEL
+from chatbot.assistantDataCreator import get_function
+
+logger = logging.getLogger(__name__)
+
+# Stavy runu, ve kterých už se nic dalšího nestane
+FINISHED_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete"}
+
+# Polling runu – první dotaz rychle, pak s rostoucí pauzou (v sekundách)
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 5
+POLL_BACKOFF = 1.5
+
+# Omezený pool vláken pro souběžné tool cally (každé vlákno drží vlastní DB spojení)
+TOOL_WORKERS = getattr(settings, "CHATBOT_TOOL_WORKERS", 8)
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="chatbot-tool")
+
+# Sdílený klient (pool HTTP spojení) pro každou event loop – httpx spojení nelze sdílet mezi smyčkami
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client():
+    """
+    Vrací sdílený AsyncOpenAI klient pro aktuální event loop. Pod ASGI workerem běží jedna
+    smyčka na proces, takže všechny požadavky používají stejný pool spojení.
+
+    :return: AsyncOpenAI
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        _clients[loop] = client
+    return client
+
+
+def _lock_key(user, client, stat_id=None):
+    # Jeden běžící prompt na uživatele, klienta a statistiku (konverzace má stat_id None)
+    return f"stat_lock_{user.id}_{client.id}_{stat_id}"
+
+
+def _call_tool(function, call_id, parameters, client_id, model, serializer, user):
+    # Běží ve vlákně z `_tool_executor`; spojení se po dotazech uklidí jako po požadavku
+    try:
+        return function(call_id, parameters, client_id, model, serializer, user)
+    finally:
+        close_old_connections()
+
+
+# OpenAI handler a statistiky pomocí definovaných promptů (asynchronní – čekání na run neblokuje worker)
+class OpenAIHandler:
+    def __init__(self):
+        self.client = get_openai_client()
+        self.model = OPEANAI_MODEL[0]
+
+    # Vrátí existující vlákno nebo vytvoří nové
+    async def get_or_create_thread(self, user, client, stat_id=None):
+        filters = {"user": user, "client": client, "model": self.model}
+        if stat_id:
+            filters["stat_id"] = stat_id
+
+        thread = await ChatBotAssistantThread.objects.filter(**filters).afirst()
+
+        if not thread:
+            thread_obj = await self.client.beta.threads.create()
+            thread = await ChatBotAssistantThread.objects.acreate(
+                user=user,
+                client=client,
+                stat_id=stat_id,
+                thread_id=thread_obj.id,
+                model=self.model
+            )
+        return thread
+
+    # Resetuje konverzační vlákno (použije nové ID)
+    async def reset_thread(self, client, user, stat=None):
+        stock_thread = await ChatBotAssistantThread.objects.filter(
+            user=user,
+            client=client,
+            stat_id=stat,
+            model=self.model
+        ).order_by("-token_count").afirst()
+
+        if stock_thread:
+            stock_thread.token_count = 0
+            stock_thread.thread_id = (await self.client.beta.threads.create()).id
+            await stock_thread.asave(update_fields=['thread_id', 'token_count'])
+
+    # Zruší aktivní runy (čekající nebo probíhající) – všechny najednou
+    async def cancel_active_runs(self, thread_id, timeout=10):
+        runs = (await self.client.beta.threads.runs.list(thread_id=thread_id)).data
+        active = [r for r in runs if r.status in ["queued", "in_progress", "requires_action"]]
+        if active:
+            await asyncio.gather(*(self._cancel_run(thread_id, run, timeout) for run in active))
+
+    async def _cancel_run(self, thread_id, run, timeout):
+        logger.info(f"Ruším run {run.id} se statusem {run.status}")
+        try:
+            await self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+        except Exception as e:
+            if "Cannot cancel run" not in str(e):
+                raise
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            status = (await self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)).status
+            if status in FINISHED_STATUSES:
+                return
+            if loop.time() >= deadline:
+                raise Exception(f"Nelze pokračovat – run {run.id} má stále status: {status}")
+            await asyncio.sleep(POLL_INITIAL_DELAY)
+
+    # Pošle uživatelský prompt do vlákna
+    async def send_prompt(self, thread_id, prompt):
+        await self.client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=prompt
+        )
+
+    # Spustí běh asistenta nad threadem
+    async def create_run(self, assistant_id, thread_id):
+        return await self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id
+        )
+
+    # Čeká na dokončení běhu – polling s rostoucí pauzou, během čekání worker obsluhuje další požadavky
+    async def wait_for_completion(self, thread_id, run, client_id, user, timeout=90):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        delay = POLL_INITIAL_DELAY
+
+        while True:
+            if run.status == "completed":
+                return run
+            if run.status == "failed":
+                raise Exception(run.last_error.message)
+            if run.status in FINISHED_STATUSES:
+                raise Exception(f"Run skončil se statusem {run.status}.")
+
+            if run.status == "requires_action":
+                calls = run.required_action.submit_tool_outputs.tool_calls
+                outputs = await self._handle_tool_calls(calls, client_id, user)
+                run = await self.client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=run.id,
+                    tool_outputs=outputs
+                )
+                delay = POLL_INITIAL_DELAY
+                continue
+
+            if loop.time() >= deadline:
+                raise Exception("Timeout při čekání na dokončení runu.")
+            await asyncio.sleep(delay)
+            delay = min(POLL_MAX_DELAY, delay * POLL_BACKOFF)
+            run = await self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+
+    # Zpracuje výzvy na funkce (tool calls) – nezávislé dotazy běží souběžně v omezeném poolu vláken
+    async def _handle_tool_calls(self, calls, client_id, user):
+        return list(await asyncio.gather(*(self._run_tool_call(call, client_id, user) for call in calls)))
+
+    async def _run_tool_call(self, call, client_id, user):
+        try:
+            parameters = json.loads(call.function.arguments)
+            function, model, serializer = get_function(call.function.name)
+            return await sync_to_async(_call_tool, thread_sensitive=False, executor=_tool_executor)(
+                function, call.id, parameters, client_id, model, serializer, user
+            )
+        except Exception as e:
+            return {"tool_call_id": call.id, "output": str(e)}
+
+    # Získá odpověď z vlákna (text nebo obrázek)
+    async def get_response(self, thread_id):
+        messages = await self.client.beta.threads.messages.list(thread_id=thread_id)
+        if not messages.data:
+            raise Exception("Vlákno neobsahuje žádné odpovědi.")
+
+        latest = messages.data[0]
+        if not latest.content:
+            raise Exception("Poslední zpráva neobsahuje žádný obsah.")
+
+        content = latest.content[0]
+
+        # Obrázek
+        if content.type == "image_file":
+            return await self._image_element(content.image_file.file_id)
+
+        # Text
+        return {
+            "element": "div",
+            "content": content.text.value,
+            "class": "assistant"
+        }
+
+    # Stáhne obrázek vygenerovaný asistentem a vrátí ho jako element
+    async def _image_element(self, file_id):
+        image_response = await self.client.files.content(file_id)
+        encoded = b64encode(image_response.content)
+        return {
+            "element": "img",
+            "src": f"data:image/jpeg;base64,{encoded.decode()}",
+            "alt": file_id
+        }
+
+    # Vrací historii zpráv ve vlákně
+    async def get_thread_messages(self, user, client, model):
+        thread = await ChatBotAssistantThread.objects.filter(
+            user=user,
+            client=client,
+            stat_id__isnull=True,
+            model=model
+        ).order_by("-token_count").afirst()
+
+        if not thread:
+            thread_obj = await self.client.beta.threads.create()
+            thread = await ChatBotAssistantThread.objects.acreate(
+                user=user,
+                client=client,
+                stat_id=None,
+                model=model,
+                thread_id=thread_obj.id,
+            )
+
+        return await self.client.beta.threads.messages.list(thread_id=thread.thread_id)
+
+    # Hlavní metoda pro spuštění promptu
+    async def run_prompt(self, user, client, prompt, assistant_id, stat_id=None):
+        lock_key = _lock_key(user, client, stat_id)
+        if not await cache.aadd(lock_key, True, timeout=90):
+            raise Exception("Statistika již běží, zkus to za chvíli.")
+
+        try:
+            thread = await self.get_or_create_thread(user, client, stat_id)
+            await self.cancel_active_runs(thread.thread_id)
+            await self.send_prompt(thread.thread_id, prompt)
+            run = await self.create_run(assistant_id, thread.thread_id)
+            await self.wait_for_completion(thread.thread_id, run, client.id, user)
+            return await self.get_response(thread.thread_id)
+        finally:
+            await cache.adelete(lock_key)
+
+    # Streamované spuštění promptu – průběžně vrací události (tokeny textu, průběh tool callů)
+    async def stream_prompt(self, user, client, prompt, assistant_id):
+        """
+        Spustí run přes streamovací Assistants API a generuje události pro SSE:
+        `status`, `token` (část textu), `tool` (průběh tool callů), `message` (obrázek),
+        `done` (celá odpověď ve stejném tvaru jako `get_response`) nebo `error`.
+
+        :return: Asynchronní generátor slovníků {"event": ..., "data": ...}
+        """
+        yield {"event": "status", "data": {"status": "started"}}
+
+        lock_key = _lock_key(user, client)
+        if not await cache.aadd(lock_key, True, timeout=90):
+            yield {"event": "error", "data": {"message": "Statistika již běží, zkus to za chvíli."}}
+            return
+
+        try:
+            thread = await self.get_or_create_thread(user, client)
+            await self.cancel_active_runs(thread.thread_id)
+            await self.send_prompt(thread.thread_id, prompt)
+
+            text = []
+            stream = await self.client.beta.threads.runs.create(
+                thread_id=thread.thread_id,
+                assistant_id=assistant_id,
+                stream=True
+            )
+            # Po tool callech pokračuje run v novém streamu (submit_tool_outputs)
+            while stream is not None:
+                next_stream = None
+                async with stream:
+                    async for event in stream:
+                        if event.event == "thread.message.delta":
+                            for part in event.data.delta.content or []:
+                                if part.type == "text" and part.text and part.text.value:
+                                    text.append(part.text.value)
+                                    yield {"event": "token", "data": {"text": part.text.value}}
+
+                        elif event.event == "thread.message.completed":
+                            for part in event.data.content:
+                                if part.type == "image_file":
+                                    yield {"event": "message", "data": await self._image_element(part.image_file.file_id)}
+
+                        elif event.event == "thread.run.requires_action":
+                            run = event.data
+                            calls = run.required_action.submit_tool_outputs.tool_calls
+                            names = [call.function.name for call in calls]
+                            yield {"event": "tool", "data": {"status": "running", "tools": names}}
+                            outputs = await self._handle_tool_calls(calls, client.id, user)
+                            yield {"event": "tool", "data": {"status": "done", "tools": names}}
+                            next_stream = await self.client.beta.threads.runs.submit_tool_outputs(
+                                thread_id=thread.thread_id,
+                                run_id=run.id,
+                                tool_outputs=outputs,
+                                stream=True
+                            )
+
+                        elif event.event == "thread.run.failed":
+                            error = event.data.last_error
+                            raise Exception(error.message if error else "Run selhal.")
+
+                        elif event.event in ("thread.run.cancelled", "thread.run.expired", "thread.run.incomplete"):
+                            raise Exception(f"Run skončil se statusem {event.data.status}.")
+
+                        elif event.event == "error":
+                            raise Exception(event.data.message)
+                stream = next_stream
+
+            yield {"event": "done", "data": {"element": "div", "content": "".join(text), "class": "assistant"}}
+        except Exception as e:
+            logger.exception("Chyba při streamování odpovědi chatbota")
+            yield {"event": "error", "data": {"message": str(e)}}
+        finally:
+            await cache.adelete(lock_key)
@@ -0,0 +1,30 @@
+# chatbot/tasks.py
+from asgiref.sync import async_to_sync
+
+from chatbot.openai_handler import OpenAIHandler
+from chatbot.views import StatisticsView, statistics_cache_name
+from dashboard.services import cache_service
+from jobs.registry import task
+
+
+@task('chatbot.statistics', max_attempts=2)
+def generate_statistics(job, stat_id):
+    """
+    Vygeneruje statistiku přes asistenta (běh trvá desítky sekund – proto mimo webový worker).
+    Odpověď se uloží do sdílené cache klienta i jako výsledek úlohy.
+    """
+    job.report_progress(message="Čekám na odpověď asistenta.")
+    return cache_service.store(
+        job.client_id, statistics_cache_name(stat_id),
+        lambda: async_to_sync(_run_prompt)(job.user, job.client, stat_id),
+    )
+
+
+async def _run_prompt(user, client, stat_id):
+    return await OpenAIHandler().run_prompt(
+        user=user,
+        client=client,
+        prompt=StatisticsView.STAT_PROMPTS[stat_id],
+        stat_id=stat_id,
+        assistant_id=StatisticsView.ASSISTANT_KEY,
+    )
@@ -1,8 +1,17 @@
+import json
+
 import pytest
 from unittest.mock import MagicMock, patch
 
+from batch.models import Batch
 from chatbot.assistantDataCreator import AssistantDataCreator, get_function
+from chatbot.tool_output import fit_rows
 from history.models import History
+from operation.models import Operation
+from operation.services.operation_service import (
+    add_group_to_in_operation, add_group_to_out_operation, create_new_box
+)
+from product.models import Product
 
 
 @pytest.mark.django_db
@@ -179,4 +188,81 @@ class TestAssistantDataCreator:
                 "from_timestamp": "2024-01-01",
                 "to_timestamp": "2024-12-31"
             }, 1, self.mock_model, self.mock_serializer, self.mock_user)
-            assert result["output"] == "filtered"
\ No newline at end of file
+            assert result["output"] == "filtered"
+
+@pytest.mark.django_db
+class TestAssistantDataQueries:
+
+    # Data jen klienta konverzace, projekce polí, filtry a stránkování kurzorem
+    def test_get_data_projection_and_cursor(self, client_factory):
+        client = client_factory(name="Asistent")
+        other = client_factory(name="Cizí")
+        for index in range(3):
+            Product.objects.create(name=f"Produkt {index}", sku=f"AST-{index}", client=client)
+        Product.objects.create(name="Cizí produkt", sku="AST-X", client=other)
+        func, model, serializer = get_function("getProducts")
+
+        result = func("call1", {"fields": ["sku"], "filters": {"sku__startswith": "AST"}, "limit": 2},
+                      client.id, model, serializer, MagicMock(id=1))
+        output = json.loads(result["output"])
+        assert [row["sku"] for row in output["results"]] == ["AST-2", "AST-1"]
+        assert set(output["results"][0]) == {"id", "sku"}
+
+        result = func("call2", {"fields": ["sku"], "limit": 2, "cursor": output["nextCursor"]},
+                      client.id, model, serializer, MagicMock(id=1))
+        output = json.loads(result["output"])
+        assert [row["sku"] for row in output["results"]] == ["AST-0"]
+        assert output["nextCursor"] is None
+
+    # Agregace v databázi a odmítnutí pole mimo povolenou projekci
+    def test_get_data_aggregate_and_invalid_field(self, client_factory):
+        client = client_factory(name="Asistent")
+        product = Product.objects.create(name="Produkt", sku="AGG-1", client=client)
+        Batch.objects.create(product=product, batch_number="B1")
+        Batch.objects.create(product=product, batch_number="B2")
+        func, model, serializer = get_function("getBatches")
+
+        result = func("call3", {"aggregate": {"function": "count", "groupBy": ["product__sku"]}},
+                      client.id, model, serializer, MagicMock(id=1))
+        assert json.loads(result["output"])["results"] == [{"product__sku": "AGG-1", "value": 2}]
+
+        result = func("call4", {"filters": {"product__client__users__password": "x"}},
+                      client.id, model, serializer, MagicMock(id=1))
+        assert "error" in json.loads(result["output"])
+
+    # Výstup se zkrátí na rozpočet tokenů a nabídne kurzor na pokračování
+    def test_output_respects_token_budget(self, client_factory):
+        client = client_factory(name="Asistent")
+        for index in range(20):
+            Product.objects.create(name=f"Produkt s dlouhým názvem {index}", sku=f"BUD-{index}", client=client)
+        func, model, serializer = get_function("getProducts")
+
+        with patch("chatbot.assistantDataCreator.fit_rows",
+                   lambda rows: fit_rows(rows, max_tokens=120)):
+            output = json.loads(func("call5", {}, client.id, model, serializer, MagicMock(id=1))["output"])
+
+        assert output["truncated"] is True
+        assert 0 < output["count"] < 20
+        assert output["nextCursor"] == str(output["results"][-1]["id"])
+
+    # Agregační nástroje vrací spočtené řádky místo surových dat
+    def test_statistic_tools(self, client_factory):
+        client = client_factory(name="Asistent")
+        product = Product.objects.create(name="Produkt", sku="STAT-1", client=client)
+        incoming = Operation.objects.create(number="IN-STAT", type="IN", client=client)
+        add_group_to_in_operation(incoming, product.id, "S1", create_new_box("STAT-BOX").id, 10)
+        outgoing = Operation.objects.create(number="OUT-STAT", type="OUT", client=client)
+        add_group_to_out_operation(outgoing, product.id, 4, "S1")
+        Operation.objects.create(number="OUT-ZRUSENO", type="OUT", client=client, status="CANCELLED")
+
+        func, model, serializer = get_function("getWeeklyOperationCounts")
+        output = json.loads(func("call6", {"weeks": 4}, client.id, model, serializer, MagicMock(id=1))["output"])
+        assert sum(row["in"] for row in output["results"]) == 1
+        assert sum(row["out"] for row in output["results"]) == 1
+
+        func, model, serializer = get_function("getTopOutboundProducts")
+        output = json.loads(func("call7", {"days": 7, "limit": 5}, client.id, model, serializer, MagicMock(id=1))["output"])
+        assert output["results"] == [{"product_id": product.id, "sku": "STAT-1", "name": "Produkt", "quantity": 4}]
+
+        output = json.loads(func("call8", {}, None, model, serializer, MagicMock(id=1))["output"])
+        assert "error" in output
@@ -0,0 +1,110 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from chatbot.openai_handler import OpenAIHandler
+
+
+def make_run(status, tool_calls=None):
+    required_action = None
+    if tool_calls:
+        required_action = SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=tool_calls))
+    return SimpleNamespace(id="run_1", status=status, required_action=required_action, last_error=None)
+
+
+def make_call(call_id, name):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments="{}"))
+
+
+class TestOpenAIHandler:
+    # Nezávislé tool cally běží souběžně (bariéra projde jen tehdy, když běží oba najednou)
+    # a run se dál dotazuje bez blokujícího sleep
+    @patch("chatbot.openai_handler.POLL_INITIAL_DELAY", 0)
+    @patch("chatbot.openai_handler.get_function")
+    @patch("chatbot.openai_handler.get_openai_client")
+    def test_tool_calls_run_concurrently(self, get_client, get_function):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def tool(call_id, parameters, client_id, model, serializer, user):
+            barrier.wait()
+            return {"tool_call_id": call_id, "output": f"{client_id}"}
+
+        get_function.return_value = (tool, None, None)
+        client = MagicMock()
+        runs = client.beta.threads.runs
+        runs.submit_tool_outputs = AsyncMock(return_value=make_run("in_progress"))
+        runs.retrieve = AsyncMock(side_effect=[make_run("in_progress"), make_run("completed")])
+        get_client.return_value = client
+
+        async def wait():
+            handler = OpenAIHandler()
+            run = make_run("requires_action", [make_call("call_1", "getProducts"), make_call("call_2", "getBatches")])
+            return await handler.wait_for_completion("thread_1", run, 7, user=None)
+
+        assert async_to_sync(wait)().status == "completed"
+        outputs = runs.submit_tool_outputs.await_args.kwargs["tool_outputs"]
+        assert outputs == [{"tool_call_id": "call_1", "output": "7"}, {"tool_call_id": "call_2", "output": "7"}]
+        assert runs.retrieve.await_count == 2
+
+
+class FakeStream:
+    # Náhrada AsyncStream – async context manager iterující připravené události
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+
+
+def text_delta(value):
+    part = SimpleNamespace(type="text", text=SimpleNamespace(value=value))
+    return SimpleNamespace(event="thread.message.delta", data=SimpleNamespace(delta=SimpleNamespace(content=[part])))
+
+
+@pytest.mark.django_db
+class TestOpenAIHandlerStream:
+    # Tokeny se předávají průběžně, po tool callu run pokračuje v novém streamu
+    @patch("chatbot.openai_handler.get_function")
+    @patch("chatbot.openai_handler.get_openai_client")
+    def test_stream_prompt(self, get_client, get_function, user_with_client):
+        get_function.return_value = (lambda call_id, *args: {"tool_call_id": call_id, "output": "[]"}, None, None)
+        client = MagicMock()
+        threads = client.beta.threads
+        threads.create = AsyncMock(return_value=SimpleNamespace(id="thread_stream"))
+        threads.messages.create = AsyncMock()
+        threads.runs.list = AsyncMock(return_value=SimpleNamespace(data=[]))
+        threads.runs.create = AsyncMock(return_value=FakeStream([
+            text_delta("Na skladě"),
+            SimpleNamespace(event="thread.run.requires_action",
+                            data=make_run("requires_action", [make_call("call_1", "getProducts")])),
+        ]))
+        threads.runs.submit_tool_outputs = AsyncMock(return_value=FakeStream([
+            text_delta(" nic není."),
+            SimpleNamespace(event="thread.run.completed", data=make_run("completed")),
+        ]))
+        get_client.return_value = client
+
+        stock_client = user_with_client.client.first()
+
+        async def collect():
+            handler = OpenAIHandler()
+            return [event async for event in handler.stream_prompt(
+                user_with_client, stock_client, "Co je skladem?", "asst_1")]
+
+        events = async_to_sync(collect)()
+
+        assert [event["event"] for event in events] == ["status", "token", "tool", "tool", "token", "done"]
+        assert events[-1]["data"]["content"] == "Na skladě nic není."
+        assert threads.runs.submit_tool_outputs.await_args.kwargs["tool_outputs"] == [
+            {"tool_call_id": "call_1", "output": "[]"}
+        ]
@@ -1,6 +1,23 @@
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+
+from batch.models import Batch
+from jobs.models import Job
+from jobs.services import job_service
+from product.models import Product
+
+
+@pytest.fixture(autouse=True)
+def openai_client():
+    """
+    Nahradí klienta OpenAI, aby testy běžely bez `OPENAI_API_KEY` a bez přístupu k síti.
+
+    :return: MagicMock klienta
+    """
+    with patch("chatbot.openai_handler.get_openai_client", return_value=MagicMock()) as get_client:
+        yield get_client.return_value
 
 
 @pytest.mark.django_db
@@ -30,7 +47,7 @@ class TestStatisticsView:
         assert response.status_code == 400
         assert "error" in response.json()
 
-    # Testuje správný požadavek na statistiku – mockuje odpověď OpenAIHandleru
+    # Testuje správný požadavek na statistiku – vrátí úlohu, výsledek je po zpracování workerem v úloze
     @patch("chatbot.views.OpenAIHandler.run_prompt")
     def test_valid_stat_id(self, mock_run_prompt, authenticated_client, user_with_client):
         mock_run_prompt.return_value = {
@@ -39,14 +56,49 @@ class TestStatisticsView:
             "class": "assistant"
         }
         client_id = user_with_client.client.first().id
+        payload = {"client": client_id, "stat_id": "topProducts"}
+        response = authenticated_client.post(reverse("chatbot_statistics"), payload)
+        assert response.status_code == 202
+        job_id = response.json()["jobId"]
+
+        # Opakovaný požadavek nezakládá další úlohu
+        assert authenticated_client.post(reverse("chatbot_statistics"), payload).json()["jobId"] == job_id
+
+        job_service.run_pending()
+
+        data = authenticated_client.get(f"/api/jobs/{job_id}/").json()
+        assert data["status"] == "DONE"
+        assert data["result"]["content"] == "Mocked statistic response"
+        assert data["result"]["element"] == "div"
+        mock_run_prompt.assert_called_once()
+
+        # Vygenerovaná statistika je ve sdílené cache klienta – další požadavek ji vrátí hned
+        response = authenticated_client.post(reverse("chatbot_statistics"), payload)
+        assert response.status_code == 200
+        assert response.json()["content"] == "Mocked statistic response"
+
+    # Pevný report se spočítá přímo z databáze – bez asistenta a bez úlohy ve frontě
+    @patch("chatbot.views.OpenAIHandler.run_prompt")
+    def test_native_report(self, mock_run_prompt, authenticated_client, user_with_client):
+        client = user_with_client.client.first()
+        product = Product.objects.create(name="Report produkt", sku="REP-1", client=client)
+        Batch.objects.create(product=product, batch_number="R1")
+
+        response = authenticated_client.post(reverse("chatbot_statistics"), {"client": client.id, "stat_id": "lowStock"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["type"] == "table"
+        assert data["rows"] == [{"name": "Report produkt", "sku": "REP-1", "amount_cached": 0, "minimum": 10}]
+
         response = authenticated_client.post(reverse("chatbot_statistics"), {
-            "client": client_id,
-            "stat_id": "stockSummary"
+            "client": client.id, "stat_id": "operationStats", "render": "png"
         })
-        assert response.status_code == 200
         data = response.json()
-        assert data["content"] == "Mocked statistic response"
-        assert data["element"] == "div"
+        assert data["type"] == "chart"
+        assert [series["name"] for series in data["series"]] == ["Příjem", "Výdej"]
+        assert data["image"]["src"].startswith("data:image/png;base64,")
+        mock_run_prompt.assert_not_called()
+        assert not Job.objects.exists()
 
 
 @pytest.mark.django_db
@@ -84,4 +136,40 @@ class TestChatbotView:
         assert response.status_code == 200
         data = response.json()
         assert data["content"] == "Mocked chatbot response"
-        assert data["element"] == "div"
\ No newline at end of file
+        assert data["element"] == "div"
+
+    # Nahraný CSV soubor se předá asistentovi s původními hlavičkami, `.xls` se odmítne
+    @patch("chatbot.views.OpenAIHandler.run_prompt")
+    def test_file_prompt(self, mock_run_prompt, authenticated_client, user_with_client):
+        mock_run_prompt.return_value = {"element": "div", "content": "OK", "class": "assistant"}
+        client_id = user_with_client.client.first().id
+        file = SimpleUploadedFile("data.csv", "Název,Množství\nMléko,3\n".encode())
+        response = authenticated_client.post(reverse("chatbot"), {"client": client_id, "file": file})
+        assert response.status_code == 200
+        prompt = mock_run_prompt.call_args.kwargs["prompt"]
+        assert prompt == 'Nahraný soubor obsahuje následující data: [{"Název": "Mléko", "Množství": "3"}]'
+
+        file = SimpleUploadedFile("data.xls", b"\xd0\xcf\x11\xe0")
+        response = authenticated_client.post(reverse("chatbot"), {"client": client_id, "file": file})
+        assert response.status_code == 400
+        assert "CSV a XLSX" in response.json()["error"]
+        mock_run_prompt.assert_called_once()
+
+    # Streamovaný endpoint posílá události jako SSE
+    @patch("chatbot.views.OpenAIHandler.stream_prompt")
+    def test_stream_prompt(self, mock_stream_prompt, authenticated_client, user_with_client):
+        async def events(**kwargs):
+            yield {"event": "token", "data": {"text": "Ahoj"}}
+            yield {"event": "done", "data": {"element": "div", "content": "Ahoj", "class": "assistant"}}
+
+        mock_stream_prompt.side_effect = events
+        client_id = user_with_client.client.first().id
+        response = authenticated_client.post(reverse("chatbot_stream"), {
+            "client": client_id,
+            "prompt": "Ahoj"
+        })
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/event-stream"
+        body = b"".join(response).decode()
+        assert body.startswith('event: token\ndata: {"text": "Ahoj"}\n\n')
+        assert "event: done" in body
@@ -0,0 +1,82 @@
+import json
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Maximální velikost výstupu jednoho tool callu (tokeny modelu a bajty JSONu)
+MAX_OUTPUT_TOKENS = getattr(settings, 'CHATBOT_TOOL_OUTPUT_TOKENS', 6000)
+MAX_OUTPUT_BYTES = getattr(settings, 'CHATBOT_TOOL_OUTPUT_BYTES', 64 * 1024)
+
+# Rezerva na obálku výstupu (count, nextCursor, truncated)
+ENVELOPE_TOKENS = 50
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # Bez tabulky tokenizéru (např. offline) se počet tokenů jen odhadne z délky textu
+        logger.warning("Tokenizér tiktoken není dostupný, počet tokenů se odhaduje.")
+        return None
+
+
+def count_tokens(text):
+    """
+    Počet tokenů textu (tiktoken, případně odhad ~4 znaky na token).
+
+    :param text: Text výstupu
+    :return: int
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def dumps(value):
+    """
+    Kompaktní JSON (bez mezer, s diakritikou, data a Decimal jako text).
+    """
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def fit_rows(rows, max_tokens=MAX_OUTPUT_TOKENS, max_bytes=MAX_OUTPUT_BYTES):
+    """
+    Vezme řádky, dokud se vejdou do rozpočtu tokenů i bajtů.
+
+    :param rows: Iterovatelné řádky (dict)
+    :param max_tokens: Rozpočet tokenů
+    :param max_bytes: Rozpočet bajtů
+    :return: Tuple (vybrané řádky, zda byl výstup zkrácen)
+    """
+    selected = []
+    tokens = ENVELOPE_TOKENS
+    size = 0
+    for row in rows:
+        encoded = dumps(row)
+        size += len(encoded.encode()) + 1
+        tokens += count_tokens(encoded)
+        if selected and (tokens > max_tokens or size > max_bytes):
+            return selected, True
+        selected.append(row)
+    return selected, False
+
+
+def tool_output(call_id, payload):
+    """
+    Výstup tool callu pro asistenta – kompaktní JSON.
+
+    :param call_id: ID volání nástroje
+    :param payload: Data výstupu
+    :return: dict {'tool_call_id', 'output'}
+    """
+    return {
+        'tool_call_id': call_id,
+        'output': dumps(payload),
+    }
@@ -1,252 +1,44 @@
+import io
 import json
 import logging
-import time
-from base64 import b64encode
 
-import pandas as pd
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.core.cache import cache
-from django.http import JsonResponse
-from openai import AzureOpenAI, OpenAI
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.parsers import MultiPartParser, JSONParser
 from rest_framework.views import APIView
-from chatbot.assistant_threads.models import ChatBotAssistantThread, OPEANAI_MODEL
-from chatbot.assistantDataCreator import get_function
+from chatbot.openai_handler import OpenAIHandler
 from client.models import Client
+from dashboard.services import cache_service, report_service
+from imports.services.parser import iter_rows
+from jobs.services import job_service
+from utils.views import AsyncAPIView
 
 logger = logging.getLogger(__name__)
 
 API_KEY = settings.OPENAI_API_KEY
 
 
-# OpenAI handler a statistiky pomocí definovaných promptů
-class OpenAIHandler:
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = OPEANAI_MODEL[0]
-
-    # Vrátí existující vlákno nebo vytvoří nové
-    def get_or_create_thread(self, user, client, stat_id=None):
-        filters = {"user": user, "client": client, "model": self.model}
-        if stat_id:
-            filters["stat_id"] = stat_id
-
-        thread = ChatBotAssistantThread.objects.filter(**filters).first()
-
-        if not thread:
-            thread_obj = self.client.beta.threads.create()
-            thread = ChatBotAssistantThread.objects.create(
-                user=user,
-                client=client,
-                stat_id=stat_id,
-                thread_id=thread_obj.id,
-                model=self.model
-            )
-        return thread
-
-    # Resetuje konverzační vlákno (použije nové ID)
-    def reset_thread(self, client, user, stat=None):
-        stock_thread = ChatBotAssistantThread.objects.filter(
-            user=user,
-            client=client,
-            stat_id=stat,
-            model=self.model
-        ).order_by("-token_count").first()
-
-        if stock_thread:
-            stock_thread.token_count = 0
-            stock_thread.thread_id = self.client.beta.threads.create().id
-            stock_thread.save(update_fields=['thread_id', 'token_count'])
-
-    # Zruší aktivní runy (čekající nebo probíhající)
-    def cancel_active_runs(self, thread_id, timeout=10):
-        runs = self.client.beta.threads.runs.list(thread_id=thread_id).data
-        active = [r for r in runs if r.status in ["queued", "in_progress", "requires_action"]]
-
-        for run in active:
-            logger.info(f"Ruším run {run.id} se statusem {run.status}")
-            try:
-                self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
-            except Exception as e:
-                if "Cannot cancel run" not in str(e):
-                    raise
-
-            for i in range(timeout * 2):
-                status = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id).status
-                if status in ["cancelled", "completed", "failed"]:
-                    break
-                time.sleep(0.5)
-
-            final_status = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id).status
-            if final_status not in ["cancelled", "completed", "failed"]:
-                raise Exception(f"Nelze pokračovat – run {run.id} má stále status: {final_status}")
-
-    # Pošle uživatelský prompt do vlákna
-    def send_prompt(self, thread_id, prompt):
-        self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=prompt
-        )
-
-    # Spustí běh asistenta nad threadem
-    def create_run(self, assistant_id, thread_id):
-        return self.client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id
-        )
-
-    # Čeká na dokončení běhu (polling se zpožděním)
-    def wait_for_completion(self, thread_id, run_id, client_id, user, timeout=90):
-        for i in range(timeout):
-            status = self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
-
-            if status.status == "completed":
-                return True
-            elif status.status == "failed":
-                raise Exception(status.last_error.message)
-            elif status.status == "requires_action":
-                calls = status.required_action.submit_tool_outputs.tool_calls
-                self._handle_tool_calls(calls, client_id, run_id, user, thread_id)
-
-            # Exponential backoff pro méně časté dotazy
-            sleep_time = 1 if i < 10 else min(5, (i // 10))
-            time.sleep(sleep_time)
-        raise Exception("Timeout při čekání na dokončení runu.")
-
-    # Zpracuje výzvy na funkce (tool calls)
-    def _handle_tool_calls(self, calls, client_id, run, user, thread_id):
-        results = []
-        for call in calls:
-            try:
-                function_name = call.function.name
-                parameters = json.loads(call.function.arguments)
-                function, model, serializer = get_function(function_name)
-                result = function(call.id, parameters, client_id, model, serializer, user)
-                results.append(result)
-            except Exception as e:
-                results.append({"tool_call_id": call.id, "output": str(e)})
-
-        self.client.beta.threads.runs.submit_tool_outputs(
-            thread_id=thread_id,
-            run_id=run,
-            tool_outputs=results
-        )
-
-    # Získá odpověď z vlákna (text nebo obrázek)
-    def get_response(self, thread_id):
-        messages = self.client.beta.threads.messages.list(thread_id=thread_id)
-        if not messages.data:
-            raise Exception("Vlákno neobsahuje žádné odpovědi.")
-
-        latest = messages.data[0]
-        if not latest.content:
-            raise Exception("Poslední zpráva neobsahuje žádný obsah.")
-
-        content = latest.content[0]
-
-        # Obrázek
-        if content.type == "image_file":
-            file_id = content.image_file.file_id
-            image_response = self.client.files.with_raw_response.retrieve_content(file_id)
-            encoded = b64encode(image_response.content)
-            return {
-                "element": "img",
-                "src": f"data:image/jpeg;base64,{encoded.decode()}",
-                "alt": file_id
-            }
-
-        # Text
-        return {
-            "element": "div",
-            "content": content.text.value,
-            "class": "assistant"
-        }
-
-    # Vrací historii zpráv ve vlákně
-    def get_thread_messages(self, user, client, model):
-        thread = ChatBotAssistantThread.objects.filter(
-            user=user,
-            client=client,
-            stat_id__isnull=True,
-            model=model
-        ).order_by("-token_count").first()
-
-        if not thread:
-            thread_obj = self.client.beta.threads.create()
-            thread = ChatBotAssistantThread.objects.create(
-                user=user,
-                client=client,
-                stat_id=None,
-                model=model,
-                thread_id=thread_obj.id,
-            )
-
-        return self.client.beta.threads.messages.list(thread_id=thread.thread_id)
-
-    # Hlavní metoda pro spuštění promptu
-    def run_prompt(self, user, client, prompt, assistant_id, stat_id=None):
-        lock_key = f"stat_lock_{user.id}_{client.id}_{stat_id}"
-        if cache.get(lock_key):
-            raise Exception("Statistika již běží, zkus to za chvíli.")
-
-        cache.set(lock_key, True, timeout=90)
-
-        try:
-            thread = self.get_or_create_thread(user, client, stat_id)
-            self.cancel_active_runs(thread.thread_id)
-            self.send_prompt(thread.thread_id, prompt)
-            run = self.create_run(assistant_id, thread.thread_id)
-            self.wait_for_completion(thread.thread_id, run.id, client.id, user)
-            return self.get_response(thread.thread_id)
-        finally:
-            cache.delete(lock_key)
+def statistics_cache_name(stat_id):
+    # Statistika je společná všem uživatelům klienta (záznam ve sdílené cache klienta)
+    return f"statistics:{stat_id}"
 
 
 class StatisticsView(APIView):
-    # Předdefinované prompty pro jednotlivé statistiky
+    # Předdefinované prompty pro statistiky generované asistentem
+    # (pevné reporty počítá přímo `dashboard.services.report_service`)
     STAT_PROMPTS = {
-        "stockSummary": (
-            "Vygeneruj aktuální přehled stavu zásob na skladě. "
-            "Rozděl zásoby podle produktů a jejich šarží. "
-            "U každého záznamu uveď název produktu, označení šarže, aktuální množství a jednotku. "
-            "Zobraz výstup **pouze jako tabulku**. Nepoužívej grafy."
-        ),
-
-        "expiringSoon": (
-            "Zobraz produkty, kterým končí expirace během následujících 30 dnů. "
-            "Uveď název produktu, šarži a datum expirace. "
-            "Zobraz **pouze tabulku**. Nepoužívej žádný text ani graf."
-        ),
-
-        "operationStats": (
-            "Zobraz počet příjmů a výdejů za poslední 3 měsíce. "
-            "Rozděl data po týdnech a vykresli **čárový graf se dvěma liniemi** – příjem a výdej. "
-            "Osa X: týdny, osa Y: počet operací. Bez dalších textů."
-        ),
-
-        "userEfficiency": (
-            "Vyhodnoť efektivitu uživatelů za posledních 30 dní podle počtu provedených operací. "
-            "Zobraz **sloupcový graf**, kde každý sloupec reprezentuje jednoho uživatele. "
-            "Bez popisků nebo shrnutí."
-        ),
-
         "activityTimeline": (
             "Zobraz změny ve skladu za posledních 7 dní – nové operace, úpravy zásob, přesuny a smazání. "
             "Seřaď změny chronologicky a rozděl podle typu. "
             "Výstup zobraz **pouze jako tabulku** nebo seznam. Nepoužívej grafy ani textová shrnutí."
         ),
 
-        "lowStock": (
-            "Identifikuj produkty, jejichž množství kleslo pod minimální limit. "
-            "Uveď název produktu, aktuální množství, minimální limit a jednotku. "
-            "Zobraz výstup **striktně jako tabulku**. Nepřidávej žádné poznámky."
-        ),
-
         "topProducts": (
             "Zobraz produkty s nejvyšším počtem výdejů za posledních 30 dní. "
             "Seřaď sestupně podle počtu výdejů. "
-            "Výstup zobraz **pouze jako sloupcový graf**. Nepřidávej text."
+            "Výstup zobraz **pouze jako sloupcový graf**. Nepřidávej text. "
+            "Data načti funkcí getTopOutboundProducts (days=30)."
         ),
 
         "monthlyOverview": (
@@ -258,32 +50,23 @@ class StatisticsView(APIView):
         "demandForecast": (
             "Na základě historické spotřeby odhadni očekávanou spotřebu jednotlivých produktů na příští měsíc. "
             "Zobraz jako **čárový graf** – každý produkt samostatně, pokud je to proveditelné. "
-            "Pokud je produktů příliš, zobraz jen top 10 podle spotřeby."
+            "Pokud je produktů příliš, zobraz jen top 10 podle spotřeby. "
+            "Historickou spotřebu načti funkcí getTopOutboundProducts (days=90, limit=10)."
         ),
 
         "expiringForecast": (
             "Odhadni počet jednotek, které pravděpodobně expirují během následujícího měsíce. "
             "Rozděl po týdnech a zobraz **výhradně jako sloupcový graf**. "
-            "X-osa = týdny, Y-osa = počet expirací. Bez doprovodného textu."
+            "X-osa = týdny, Y-osa = počet expirací. Bez doprovodného textu. "
+            "Data načti funkcí getExpirationsPerWeek (weeks=5)."
         ),
 
         "staffUtilization": (
             "Zhodnoť využití pracovníků na základě počtu provedených operací za posledních 30 dní. "
             "Odhadni procentuální vytížení jednotlivých pracovníků. "
-            "Zobraz jako **kruhový nebo sloupcový graf** bez jakéhokoliv textového shrnutí."
-        ),
-
-        "warehouseHeatmap": (
-            "Vytvoř vizuální heatmapu skladu podle zaplněnosti skladových pozic. "
-            "Zobraz **výhradně jako graf heatmap**, kde intenzita barvy odpovídá zaplnění. "
-            "Nepoužívej žádný doplňující text, kromě popisku, který blok je která pozice (název pozice)."
+            "Zobraz jako **kruhový nebo sloupcový graf** bez jakéhokoliv textového shrnutí. "
+            "Data načti funkcí getUserOperationCounts (days=30)."
         ),
-
-        "productMovement": (
-            "Zobraz tok produktů za poslední 2 týdny – kolik bylo přijato a kolik vydáno. "
-            "Zobraz jako **čárový nebo sloupcový graf se dvěma sériemi**: příjem a výdej. "
-            "Bez jakýchkoli komentářů nebo shrnutí."
-        )
     }
     ASSISTANT_KEY = 'asst_aa2kW75H12y8OKAg3jcvcYmk'
 
@@ -297,8 +80,7 @@ class StatisticsView(APIView):
         if not client_id or not stat_id:
             return JsonResponse({"error": "Chybí client nebo stat_id."}, status=400)
 
-        prompt = self.STAT_PROMPTS.get(stat_id)
-        if not prompt:
+        if stat_id not in report_service.REPORTS and stat_id not in self.STAT_PROMPTS:
             return JsonResponse({"error": "Neznámé stat_id."}, status=400)
 
         try:
@@ -306,28 +88,28 @@ class StatisticsView(APIView):
         except ValueError as e:
             return JsonResponse({"error": str(e)}, status=404)
 
-        # Ověření cache
-        cache_key = f"stat_cache_{user.id}_{client.id}_{stat_id}"
-        cached_response = cache.get(cache_key)
-        if cached_response:
-            return JsonResponse(cached_response)
-
-        try:
-            # Spuštění OpenAI promptu a uložení do cache
-            handler = OpenAIHandler()
-            response = handler.run_prompt(user=user, client=client, prompt=prompt, stat_id=stat_id, assistant_id=self.ASSISTANT_KEY)
-            cache.set(cache_key, response, timeout=60 * 5)  # cache na 5 minut
-            return JsonResponse(response)
-        except Exception as e:
-            logging.exception("Chyba ve statistice")
-            return JsonResponse({"error": str(e)}, status=500)
-
-class ChatbotView(APIView):
+        # Pevné reporty se počítají přímo nad databází – bez asistenta, hned v odpovědi.
+        # S `render=png` se přidá i vykreslený obrázek.
+        if stat_id in report_service.REPORTS:
+            image = request.data.get("render") == "png"
+            return JsonResponse(report_service.cached_report(stat_id, client.id, image=image))
+
+        # Generování běží ve frontě úloh – vrací se ID úlohy, výsledek je na /api/jobs/{id}/.
+        # Opakovaný požadavek na stejnou statistiku vrátí už rozběhnutou úlohu.
+        # Zastaralá statistika (změna dat klienta) se vrátí hned a přegeneruje se na pozadí.
+        entry = cache_service.get_entry(client.id, statistics_cache_name(stat_id))
+        if entry is None or not entry[1]:
+            job = job_service.enqueue("chatbot.statistics", user=user, client=client, unique=True, stat_id=stat_id)
+        if entry is not None:
+            return JsonResponse(entry[0])
+        return JsonResponse({"jobId": job.id, "status": job.status}, status=202)
+
+class ChatbotView(AsyncAPIView):
     parser_classes = [MultiPartParser, JSONParser]
     ASSISTANT_KEY = 'asst_ym2hrOmYeS2LfXOkP53HdCEn'
 
-    # Obsluha konverzace s chatbotem
-    def post(self, request):
+    # Obsluha konverzace s chatbotem (asynchronně – čekání na asistenta neblokuje worker)
+    async def post(self, request):
         try:
             # Získání klienta a promptu
             user = request.user
@@ -338,21 +120,20 @@ class ChatbotView(APIView):
             if not client_id:
                 return JsonResponse({"error": "Client ID není vyplněn."}, status=400)
 
-            try:
-                client = get_client_or_404(client_id)
-            except ValueError as e:
-                return JsonResponse({"error": str(e)}, status=404)
+            client = await Client.objects.filter(id=client_id).afirst()
+            if not client:
+                return JsonResponse({"error": "Klient neexistuje."}, status=404)
 
             handler = OpenAIHandler()
 
             # Reset konverzace
             if request.data.get("reset"):
-                handler.reset_thread(client, user)
+                await handler.reset_thread(client, user)
                 return JsonResponse({"message": "Vlákno bylo resetováno."})
 
             # Získání historie zpráv
             if request.data.get("history"):
-                raw_messages = handler.get_thread_messages(user, client, handler.model)
+                raw_messages = await handler.get_thread_messages(user, client, handler.model)
                 messages = []
 
                 for msg in raw_messages.data:
@@ -373,12 +154,7 @@ class ChatbotView(APIView):
             # Načtení dat ze souboru
             if file:
                 try:
-                    if file.name.endswith(".csv"):
-                        df = pd.read_csv(file)
-                    else:
-                        df = pd.read_excel(file)
-                    file_json = df.to_json(orient="records")
-                    prompt = f"Nahraný soubor obsahuje následující data: {file_json}"
+                    prompt = await _file_prompt(file)
                 except Exception as e:
                     return JsonResponse({"error": f"Chyba při zpracování souboru: {str(e)}"}, status=400)
 
@@ -387,7 +163,7 @@ class ChatbotView(APIView):
                 return JsonResponse({"error": "Chybí vstupní prompt."}, status=400)
 
             # Odeslání promptu do OpenAI a vrácení odpovědi
-            response = handler.run_prompt(
+            response = await handler.run_prompt(
                 user=user,
                 client=client,
                 prompt=prompt,
@@ -399,9 +175,79 @@ class ChatbotView(APIView):
             logging.getLogger("django").error(f"Chyba v ChatbotView: {str(e)}")
             return JsonResponse({"error": str(e)}, status=500)
 
+
+class ChatbotStreamView(AsyncAPIView):
+    """
+    Streamovaná odpověď chatbota jako Server-Sent Events (`text/event-stream`).
+
+    Události: `status` (run začal), `token` (část textu odpovědi), `tool` (asistent načítá data),
+    `message` (obrázek), `done` (celá odpověď ve tvaru jako `/api/chatbot`) a `error`.
+    Spojení drží async worker, první bajty odcházejí hned po přijetí požadavku.
+    """
+    parser_classes = [MultiPartParser, JSONParser]
+
+    async def post(self, request):
+        user = request.user
+        client_id = request.data.get("client")
+        prompt = request.data.get("input_chat") or request.data.get("prompt")
+        file = request.FILES.get("file")
+
+        if not client_id:
+            return JsonResponse({"error": "Client ID není vyplněn."}, status=400)
+
+        client = await Client.objects.filter(id=client_id).afirst()
+        if not client:
+            return JsonResponse({"error": "Klient neexistuje."}, status=404)
+
+        if file:
+            try:
+                prompt = await _file_prompt(file)
+            except Exception as e:
+                return JsonResponse({"error": f"Chyba při zpracování souboru: {str(e)}"}, status=400)
+
+        if not prompt:
+            return JsonResponse({"error": "Chybí vstupní prompt."}, status=400)
+
+        events = OpenAIHandler().stream_prompt(
+            user=user,
+            client=client,
+            prompt=prompt,
+            assistant_id=ChatbotView.ASSISTANT_KEY
+        )
+        response = StreamingHttpResponse(_sse(events), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx nesmí odpověď bufferovat
+        return response
+
+
+async def _sse(events):
+    # Převede události handleru do formátu Server-Sent Events
+    async for event in events:
+        data = json.dumps(event["data"], ensure_ascii=False)
+        yield f"event: {event['event']}\ndata: {data}\n\n"
+
+
+async def _file_prompt(file):
+    # Parsování mimo event loop; starý binární `.xls` se odmítne (vrací se 400)
+    file_json = await sync_to_async(_file_json, thread_sensitive=False)(file)
+    return f"Nahraný soubor obsahuje následující data: {file_json}"
+
+
+def _file_json(file):
+    # Řádky se serializují jeden po druhém (bez DataFrame i seznamu řádků), hlavičky zůstávají jako v souboru
+    output = io.StringIO()
+    output.write("[")
+    for index, (_, row) in enumerate(iter_rows(file, file.name, normalize=False)):
+        if index:
+            output.write(", ")
+        output.write(json.dumps(row, default=str, ensure_ascii=False))
+    output.write("]")
+    return output.getvalue()
+
+
 # Pomocná funkce pro získání klienta nebo vyhození chyby
 def get_client_or_404(client_id):
     client = Client.objects.filter(id=client_id).first()
     if not client:
         raise ValueError("Klient neexistuje.")
-    return client
\ No newline at end of file
+    return client
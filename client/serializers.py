@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from client.models import Client
+from search.services import search_service
 
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -15,4 +16,6 @@ class ClientBulkSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def create(self, validated_data):
-        return Client.objects.bulk_create([Client(**item) for item in validated_data])
\ No newline at end of file
+        clients = Client.objects.bulk_create([Client(**item) for item in validated_data])
+        search_service.schedule_instances(clients)
+        return clients
\ No newline at end of file
@@ -1,14 +1,12 @@
-from functools import reduce
-
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
 
 from client.models import Client
 from client.serializers import ClientSerializer
+from search.services import search_service
 from utils.pagination import CustomPageNumberPagination
 
 
@@ -120,22 +118,9 @@ class ClientViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        data_query = query.split(',')
-        if len(data_query) > 1:
-            data_query = [term.strip() for term in data_query if term.strip()]
-            query_filters = reduce(
-                lambda q, term: q | Q(name__icontains=term) | Q(email__icontains=term),
-                data_query,
-                Q()
-            )
-            clients = Client.objects.filter(query_filters).only('id')
-        else:
-            clients = Client.objects.filter(
-                Q(name__icontains=query) | Q(email__icontains=query)
-            )
-
-        if client_id:
-            clients = clients.filter(id=client_id)
+        terms = search_service.split_terms(query)
+        clients = Client.objects.filter(id__in=search_service.search('client', terms, client_id))
+        clients = search_service.rank(clients, 'client', terms)
 
         paginator = CustomPageNumberPagination()
         paginator.page_size = request.GET.get('page_size') or 10
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard.services.metrics_service import rebuild_client_metrics
+
+
+class Command(BaseCommand):
+    help = "Přepočítá materializované metriky dashboardu (ClientMetrics) pro všechny nebo vybrané klienty"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--client", type=int, action="append", dest="clients",
+                            help="ID klienta (lze zadat vícekrát), výchozí jsou všichni klienti")
+
+    def handle(self, *args, **options):
+        self.stdout.write("📊 Spouštím přepočet metrik dashboardu...")
+
+        with transaction.atomic():
+            count = rebuild_client_metrics(options.get("clients"))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Hotovo – metriky přepočítány pro {count} klientů."))
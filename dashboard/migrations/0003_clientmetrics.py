@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0001_initial'),
+        ('dashboard', '0002_userdashboardconfig_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operations_created', models.IntegerField(default=0)),
+                ('operations_box', models.IntegerField(default=0)),
+                ('operations_completed', models.IntegerField(default=0)),
+                ('operations_cancelled', models.IntegerField(default=0)),
+                ('completion_seconds', models.FloatField(default=0)),
+                ('completion_count', models.IntegerField(default=0)),
+                ('total_items', models.IntegerField(default=0)),
+                ('total_products', models.IntegerField(default=0)),
+                ('out_of_stock_count', models.IntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('expiring_soon_count', models.IntegerField(default=0)),
+                ('expiring_checked_on', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='client.client')),
+            ],
+        ),
+    ]
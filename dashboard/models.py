@@ -23,4 +23,42 @@ class UserDashboardConfig(models.Model):
 
     def get_widgets(self):
         """Vrátí uložené widgety uživatele."""
-        return self.config or {}
\ No newline at end of file
+        return self.config or {}
+
+class ClientMetrics(models.Model):
+    """
+    Materializované metriky dashboardu pro jednoho klienta.
+
+    Řádek udržují signály (změny operací, produktů a skladové knihy), dashboard tak
+    místo desítek COUNT/SUM dotazů čte jeden řádek. Plný přepočet: `rebuild_dashboard_metrics`.
+    """
+    client = models.OneToOneField('client.Client', on_delete=models.CASCADE, related_name="metrics")
+
+    # Počty operací podle stavu
+    operations_created = models.IntegerField(default=0)
+    operations_box = models.IntegerField(default=0)
+    operations_completed = models.IntegerField(default=0)
+    operations_cancelled = models.IntegerField(default=0)
+
+    # Součet doby dokončení (v sekundách) a počet dokončených operací s dobou
+    completion_seconds = models.FloatField(default=0)
+    completion_count = models.IntegerField(default=0)
+
+    # Zásoby
+    total_items = models.IntegerField(default=0)
+    total_products = models.IntegerField(default=0)
+    out_of_stock_count = models.IntegerField(default=0)
+    low_stock_count = models.IntegerField(default=0)
+
+    # Šarže s blížící se expirací – závisí na dni, proto se přepočítává jednou denně
+    expiring_soon_count = models.IntegerField(default=0)
+    expiring_checked_on = models.DateField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Metriky klienta {self.client_id}'
+
+    @property
+    def operations_total(self):
+        return self.operations_created + self.operations_box + self.operations_completed + self.operations_cancelled
@@ -0,0 +1,190 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+from utils.transaction_buffer import TransactionBuffer
+
+logger = logging.getLogger(__name__)
+
+# Přepočty zastaralých záznamů na pozadí (SWR_CACHE_ASYNC = True)
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='swr-refresh')
+
+# Jak dlouho (s) smí jeden proces držet zámek přepočtu a jak dlouho na jeho výsledek čekají ostatní
+LOCK_TIMEOUT = 60
+WAIT_TIMEOUT = 10
+WAIT_INTERVAL = 0.1
+
+# Nepoužívané záznamy z cache po čase vypadnou
+ENTRY_TIMEOUT = 60 * 60 * 24
+
+
+def _key(client_id, name):
+    return f"swr:{client_id}:{name}"
+
+
+def _generation_key(client_id):
+    return f"swr_generation:{client_id}"
+
+
+def _lock_key(key):
+    return f"{key}:lock"
+
+
+def _max_age():
+    return getattr(settings, 'SWR_CACHE_MAX_AGE', 60 * 60)
+
+
+def generation(client_id):
+    """
+    Aktuální generace dat klienta – mění se při každé změně zásob nebo operací.
+    Záznam spočítaný pro jinou generaci je zastaralý.
+
+    :param client_id: ID klienta
+    :return: str
+    """
+    key = _generation_key(client_id)
+    value = cache.get(key)
+    if value is None:
+        # Generace vypadla z cache – nová hodnota zneplatní všechny dosavadní záznamy klienta
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def invalidate_clients(client_ids):
+    """
+    Zneplatní cache klientů. Uvnitř transakce až po commitu (přepočet nesmí vidět data
+    před commitem a uložit je jako aktuální), změny jedné transakce se sloučí.
+
+    :param client_ids: ID klientů
+    """
+    client_ids = {client_id for client_id in client_ids if client_id}
+    if not client_ids:
+        return
+    if not connection.in_atomic_block:
+        _bump(client_ids)
+        return
+    _transaction_pending.get().update(client_ids)
+
+
+def _bump(client_ids):
+    cache.set_many({_generation_key(client_id): uuid.uuid4().hex for client_id in client_ids}, timeout=None)
+
+
+# Klienti zneplatnění uvnitř transakce – po savepointech, vrácený savepoint se zahodí
+_transaction_pending = TransactionBuffer(set, _bump)
+
+
+def get_entry(client_id, name, max_age=None):
+    """
+    Načte záznam z cache bez přepočtu.
+
+    :param client_id: ID klienta
+    :param name: Název záznamu (např. 'report:lowStock')
+    :param max_age: Stáří (s), po kterém je záznam zastaralý i bez změny dat
+    :return: Tuple (hodnota, zda je aktuální), případně None
+    """
+    entry = cache.get(_key(client_id, name))
+    if entry is None:
+        return None
+    max_age = _max_age() if max_age is None else max_age
+    fresh = entry['generation'] == generation(client_id) and time.time() - entry['computed_at'] < max_age
+    return entry['value'], fresh
+
+
+def store(client_id, name, compute):
+    """
+    Spočítá a uloží záznam. Generace se čte před výpočtem – pokud se data během výpočtu
+    změní, záznam se hned považuje za zastaralý.
+
+    :param client_id: ID klienta
+    :param name: Název záznamu
+    :param compute: Funkce bez argumentů vracející hodnotu
+    :return: Spočítaná hodnota
+    """
+    current = generation(client_id)
+    value = compute()
+    cache.set(_key(client_id, name), {
+        'value': value,
+        'generation': current,
+        'computed_at': time.time(),
+    }, timeout=ENTRY_TIMEOUT)
+    return value
+
+
+def refresh(client_id, name, compute):
+    """
+    Přepočítá záznam, pokud ho zrovna nepřepočítává jiný proces (zámek ve sdílené cache).
+
+    :return: True, pokud se přepočet provedl
+    """
+    lock_key = _lock_key(_key(client_id, name))
+    if not cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+        return False
+    try:
+        store(client_id, name, compute)
+    finally:
+        cache.delete(lock_key)
+    return True
+
+
+def _refresh_in_background(client_id, name, compute):
+    # Běží ve vlákně z `_refresh_executor`; spojení se po dotazech uklidí jako po požadavku
+    try:
+        refresh(client_id, name, compute)
+    except Exception:
+        logger.exception("Přepočet záznamu cache %s selhal.", _key(client_id, name))
+    finally:
+        close_old_connections()
+
+
+def schedule_refresh(client_id, name, compute):
+    """
+    Naplánuje přepočet zastaralého záznamu – na pozadí, nebo hned (SWR_CACHE_ASYNC = False).
+    """
+    if getattr(settings, 'SWR_CACHE_ASYNC', True):
+        _refresh_executor.submit(_refresh_in_background, client_id, name, compute)
+    else:
+        refresh(client_id, name, compute)
+
+
+def get_or_compute(client_id, name, compute, max_age=None):
+    """
+    Stale-while-revalidate: aktuální záznam vrátí hned, zastaralý vrátí také hned a přepočítá
+    ho na pozadí. Chybějící záznam spočítá jen jeden proces, ostatní počkají na jeho výsledek.
+
+    :param client_id: ID klienta
+    :param name: Název záznamu (data nesmí záviset na uživateli)
+    :param compute: Funkce bez argumentů vracející hodnotu (serializovatelnou pro cache)
+    :param max_age: Stáří (s), po kterém je záznam zastaralý i bez změny dat
+    :return: Hodnota
+    """
+    entry = get_entry(client_id, name, max_age)
+    if entry is not None:
+        value, fresh = entry
+        if not fresh:
+            schedule_refresh(client_id, name, compute)
+        return value
+
+    key = _key(client_id, name)
+    lock_key = _lock_key(key)
+    if cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+        try:
+            return store(client_id, name, compute)
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+
+    # Přepočet v jiném procesu trvá příliš dlouho – spočítá se bez uložení
+    return compute()
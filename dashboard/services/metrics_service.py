@@ -0,0 +1,307 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from batch.services import expiry_service
+from client.models import Client
+from dashboard.models import ClientMetrics
+from operation.models import Operation
+from product.models import Product
+
+# Produkt s nižší zásobou se počítá mezi „nízký stav zásob“
+LOW_STOCK_THRESHOLD = 10
+
+# Šarže expirující do tohoto počtu dní se počítají jako „brzy expirující“
+EXPIRING_SOON_DAYS = 30
+
+# Sloupec metrik pro jednotlivé stavy operace
+STATUS_FIELDS = {
+    'CREATED': 'operations_created',
+    'BOX': 'operations_box',
+    'COMPLETED': 'operations_completed',
+    'CANCELLED': 'operations_cancelled',
+}
+
+# Sčítané sloupce (pro souhrn přes více klientů)
+SUMMED_FIELDS = [
+    *STATUS_FIELDS.values(),
+    'completion_seconds', 'completion_count',
+    'total_items', 'total_products', 'out_of_stock_count', 'low_stock_count',
+    'expiring_soon_count',
+]
+
+
+def stock_bucket(amount):
+    """
+    Zařadí množství do kategorie zásob.
+
+    :param amount: Aktuální množství produktu
+    :return: 'out_of_stock_count', 'low_stock_count' nebo None
+    """
+    if amount == 0:
+        return 'out_of_stock_count'
+    if 0 < amount < LOW_STOCK_THRESHOLD:
+        return 'low_stock_count'
+    return None
+
+
+def get_summary(client_ids=None):
+    """
+    Vrací metriky pro zadané klienty (sečtené), případně pro všechny klienty.
+    Chybějící řádky se dopočítají, zastaralý počet expirujících šarží se obnoví.
+
+    :param client_ids: Seznam ID klientů nebo None pro všechny
+    :return: Slovník {sloupec: hodnota} se sloupci z `SUMMED_FIELDS` a `operations_total`
+    """
+    metrics = ClientMetrics.objects.all()
+    clients = Client.objects.all()
+    if client_ids is not None:
+        client_ids = [int(client_id) for client_id in client_ids]
+        metrics = metrics.filter(client_id__in=client_ids)
+        clients = clients.filter(id__in=client_ids)
+
+    missing = list(clients.filter(metrics__isnull=True).values_list('id', flat=True))
+    if missing:
+        rebuild_client_metrics(missing)
+
+    today = timezone.now().date()
+    stale = list(metrics.exclude(expiring_checked_on=today).values_list('client_id', flat=True))
+    if stale:
+        refresh_expiring(stale)
+
+    summary = metrics.aggregate(**{field: Sum(field) for field in SUMMED_FIELDS})
+    summary = {field: value or 0 for field, value in summary.items()}
+    summary['operations_total'] = sum(summary[field] for field in STATUS_FIELDS.values())
+    return summary
+
+
+def rebuild_client_metrics(client_ids=None):
+    """
+    Plný přepočet metrik – několik agregačních dotazů pro všechny klienty najednou
+    a hromadný upsert řádků.
+
+    :param client_ids: (volitelné) Omezení na vybrané klienty
+    :return: Počet přepočítaných klientů
+    """
+    clients = Client.objects.all()
+    if client_ids is not None:
+        clients = clients.filter(id__in=client_ids)
+    rows = {client_id: ClientMetrics(client_id=client_id) for client_id in clients.values_list('id', flat=True)}
+    if not rows:
+        return 0
+
+    operations = Operation.objects.filter(client_id__in=rows.keys())
+    for row in operations.values('client_id', 'status').annotate(count=Count('id')):
+        field = STATUS_FIELDS.get(row['status'])
+        if field:
+            setattr(rows[row['client_id']], field, row['count'])
+
+    for client_id, (seconds, count) in _completion_totals(rows.keys()).items():
+        rows[client_id].completion_seconds = seconds
+        rows[client_id].completion_count = count
+
+    products = (
+        Product.objects.filter(client_id__in=rows.keys())
+        .values('client_id')
+        .annotate(
+            total_items=Sum('amount_cached'),
+            total_products=Count('id'),
+            out_of_stock_count=Count('id', filter=Q(amount_cached=0)),
+            low_stock_count=Count('id', filter=Q(amount_cached__gt=0, amount_cached__lt=LOW_STOCK_THRESHOLD)),
+        )
+    )
+    for row in products:
+        metrics = rows[row['client_id']]
+        metrics.total_items = row['total_items'] or 0
+        metrics.total_products = row['total_products']
+        metrics.out_of_stock_count = row['out_of_stock_count']
+        metrics.low_stock_count = row['low_stock_count']
+
+    today = timezone.now().date()
+    for client_id, count in _expiring_counts(rows.keys()).items():
+        rows[client_id].expiring_soon_count = count
+    for metrics in rows.values():
+        metrics.expiring_checked_on = today
+
+    update_fields = [*SUMMED_FIELDS, 'expiring_checked_on', 'updated_at']
+    ClientMetrics.objects.bulk_create(
+        rows.values(), batch_size=1000, update_conflicts=True, unique_fields=['client'], update_fields=update_fields,
+    )
+    return len(rows)
+
+
+def _completion_totals(client_ids):
+    """
+    Součet doby dokončení a počet dokončených operací po klientech (jeden agregační dotaz).
+
+    :param client_ids: ID klientů
+    :return: Slovník {client_id: (sekundy, počet)}
+    """
+    completed = (
+        Operation.objects.filter(client_id__in=client_ids, status='COMPLETED',
+                                 created_at__isnull=False, updated_at__isnull=False)
+        .values('client_id')
+        .annotate(duration=Sum(F('updated_at') - F('created_at')), count=Count('id'))
+    )
+    return {
+        row['client_id']: (row['duration'].total_seconds() if row['duration'] else 0, row['count'])
+        for row in completed
+    }
+
+
+def refresh_expiring(client_ids):
+    """
+    Přepočítá počet brzy expirujících šarží (hodnota závisí na dni, nejde ji udržovat přírůstkově).
+
+    :param client_ids: ID klientů
+    """
+    today = timezone.now().date()
+    counts = _expiring_counts(client_ids)
+    rows = list(ClientMetrics.objects.filter(client_id__in=client_ids))
+    for metrics in rows:
+        metrics.expiring_soon_count = counts.get(metrics.client_id, 0)
+        metrics.expiring_checked_on = today
+    ClientMetrics.objects.bulk_update(rows, ['expiring_soon_count', 'expiring_checked_on'])
+
+
+def _expiring_counts(client_ids):
+    # Rozsahový dotaz nad indexem expirací – jen šarže se zásobou
+    return expiry_service.count_per_client(client_ids, EXPIRING_SOON_DAYS)
+
+
+def _increment(client_id, deltas, **values):
+    """
+    Přičte rozdíly k řádku metrik klienta. Pokud řádek ještě neexistuje, přepočítá ho celý
+    (stav po změně je už v databázi, takže přepočet změnu obsahuje).
+
+    :param client_id: ID klienta
+    :param deltas: Slovník {sloupec: rozdíl}
+    :param values: Další sloupce nastavené stejným dotazem
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = ClientMetrics.objects.filter(client_id=client_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}, **values, updated_at=timezone.now()
+    )
+    if not updated:
+        rebuild_client_metrics([client_id])
+
+
+def apply_stock_deltas(product_deltas):
+    """
+    Promítne změnu čítačů produktů do metrik – jeden dotaz na nové stavy, z nich a rozdílů
+    se odvodí přechody mezi kategoriemi (vyprodáno / nízký stav).
+
+    :param product_deltas: Slovník {product_id: rozdíl množství}
+    :return: ID dotčených klientů
+    """
+    product_deltas = {product_id: delta for product_id, delta in product_deltas.items() if delta}
+    if not product_deltas:
+        return set()
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for product_id, client_id, amount in Product.objects.filter(
+            id__in=product_deltas.keys()).values_list('id', 'client_id', 'amount_cached'):
+        delta = product_deltas[product_id]
+        client_deltas = deltas[client_id]
+        client_deltas['total_items'] += delta
+
+        before, after = stock_bucket(amount - delta), stock_bucket(amount)
+        if before != after:
+            if before:
+                client_deltas[before] -= 1
+            if after:
+                client_deltas[after] += 1
+
+    # Změna zásoby může šarži přidat do expirujících nebo ji z nich vyřadit – počet se přepočte při čtení
+    for client_id, client_deltas in deltas.items():
+        _increment(client_id, client_deltas, expiring_checked_on=None)
+    return set(deltas)
+
+
+def apply_product_created(product):
+    """
+    Započítá nový produkt (včetně jeho počátečního množství).
+    """
+    deltas = {'total_products': 1, 'total_items': product.amount_cached}
+    bucket = stock_bucket(product.amount_cached)
+    if bucket:
+        deltas[bucket] = 1
+    _increment(product.client_id, deltas)
+
+
+def apply_operation_saved(operation, previous_status, created):
+    """
+    Promítne vytvoření operace nebo změnu jejího stavu do počtů podle stavu a do součtu
+    doby dokončení.
+
+    :param operation: Uložená operace
+    :param previous_status: Stav před uložením (None u nové operace)
+    :param created: True, pokud byla operace právě vytvořena
+    """
+    if not created and previous_status == operation.status:
+        return
+
+    deltas = defaultdict(int)
+    if not created and previous_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[previous_status]] -= 1
+    if operation.status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[operation.status]] += 1
+    if operation.status == 'COMPLETED' and operation.created_at and operation.updated_at:
+        deltas['completion_seconds'] += (operation.updated_at - operation.created_at).total_seconds()
+        deltas['completion_count'] += 1
+
+    _increment(operation.client_id, deltas)
+
+
+def apply_status_changes(changes):
+    """
+    Promítne přechody stavů operací provedené hromadným UPDATE (bez `save()`) – rozdíly
+    se sečtou po klientech, na klienta jeden UPDATE.
+
+    :param changes: Seznam (operace po přechodu, předchozí stav)
+    :return: ID dotčených klientů
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for operation, previous_status in changes:
+        client_deltas = deltas[operation.client_id]
+        if previous_status in STATUS_FIELDS:
+            client_deltas[STATUS_FIELDS[previous_status]] -= 1
+        if operation.status in STATUS_FIELDS:
+            client_deltas[STATUS_FIELDS[operation.status]] += 1
+        if operation.status == 'COMPLETED' and operation.created_at and operation.updated_at:
+            client_deltas['completion_seconds'] += (operation.updated_at - operation.created_at).total_seconds()
+            client_deltas['completion_count'] += 1
+
+    for client_id, client_deltas in deltas.items():
+        _increment(client_id, client_deltas)
+    return set(deltas)
+
+
+def apply_operation_removed(operation):
+    """
+    Odečte smazanou operaci z metrik. Doba dokončení se u dokončené operace přepočítá ze
+    zbylých operací klienta – `updated_at` se mohl od dokončení změnit (další úpravy),
+    takže odečtení podle něj by součet posunulo.
+    """
+    deltas = defaultdict(int)
+    if operation.status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[operation.status]] -= 1
+    values = {}
+    if operation.status == 'COMPLETED':
+        seconds, count = _completion_totals([operation.client_id]).get(operation.client_id, (0, 0))
+        values = {'completion_seconds': seconds, 'completion_count': count}
+    _increment(operation.client_id, deltas, **values)
+
+
+def invalidate_expiring(product_id):
+    """
+    Označí počet expirujících šarží klienta produktu jako zastaralý (přepočte se při dalším čtení).
+
+    :param product_id: ID produktu, jehož šarže se změnila
+    """
+    ClientMetrics.objects.filter(
+        client_id__in=Product.objects.filter(id=product_id).values('client_id')
+    ).update(expiring_checked_on=None)
@@ -0,0 +1,222 @@
+import io
+from base64 import b64encode
+
+from batch.models import Batch
+from batch.services import expiry_service
+from dashboard.services import cache_service, statistics_service
+from dashboard.services.metrics_service import EXPIRING_SOON_DAYS, LOW_STOCK_THRESHOLD
+from product.models import Product
+
+# Horní mez počtu řádků tabulkového reportu
+MAX_TABLE_ROWS = 1000
+
+
+def _table(title, columns, rows):
+    """
+    Tabulkový report.
+
+    :param title: Nadpis reportu
+    :param columns: Seznam (klíč, popisek) sloupců
+    :param rows: Seznam řádků (dict podle klíčů sloupců)
+    :return: dict
+    """
+    return {
+        'type': 'table',
+        'title': title,
+        'columns': [{'key': key, 'label': label} for key, label in columns],
+        'rows': list(rows[:MAX_TABLE_ROWS]),
+    }
+
+
+def _chart(title, chart, labels, series, x_label, y_label):
+    """
+    Graf – popisky osy X a série hodnot (každá série je jedna linie / barva sloupců).
+
+    :param chart: 'line' nebo 'bar'
+    :param series: Seznam (název, hodnoty)
+    :return: dict
+    """
+    return {
+        'type': 'chart',
+        'title': title,
+        'chart': chart,
+        'labels': [str(label) for label in labels],
+        'series': [{'name': name, 'data': list(data)} for name, data in series],
+        'xLabel': x_label,
+        'yLabel': y_label,
+    }
+
+
+def stock_summary(client_id):
+    rows = (
+        Batch.objects.filter(product__client_id=client_id, amount_cached__gt=0)
+        .order_by('product__name', 'batch_number')
+        .values('product__name', 'product__sku', 'batch_number', 'expiration_date', 'amount_cached')
+    )
+    return _table("Stav zásob", [
+        ('product__name', "Produkt"),
+        ('product__sku', "SKU"),
+        ('batch_number', "Šarže"),
+        ('expiration_date', "Expirace"),
+        ('amount_cached', "Množství"),
+    ], rows)
+
+
+def expiring_soon(client_id):
+    rows = (
+        expiry_service.feed([client_id], EXPIRING_SOON_DAYS, include_expired=False)
+        .values('product__name', 'batch_number', 'expiration_date', 'amount_cached')
+    )
+    return _table(f"Expirace do {EXPIRING_SOON_DAYS} dní", [
+        ('product__name', "Produkt"),
+        ('batch_number', "Šarže"),
+        ('expiration_date', "Expirace"),
+        ('amount_cached', "Množství"),
+    ], rows)
+
+
+def low_stock(client_id):
+    rows = (
+        Product.objects.filter(client_id=client_id, amount_cached__lt=LOW_STOCK_THRESHOLD)
+        .order_by('amount_cached', 'name')
+        .values('name', 'sku', 'amount_cached')
+    )
+    return _table("Nízký stav zásob", [
+        ('name', "Produkt"),
+        ('sku', "SKU"),
+        ('amount_cached', "Množství"),
+        ('minimum', "Minimum"),
+    ], [{**row, 'minimum': LOW_STOCK_THRESHOLD} for row in rows[:MAX_TABLE_ROWS]])
+
+
+def operation_stats(client_id):
+    rows = statistics_service.operations_per_week(client_id, weeks=13)
+    return _chart(
+        "Příjmy a výdeje po týdnech", 'line',
+        [row['week'] for row in rows],
+        [("Příjem", [row['in'] for row in rows]), ("Výdej", [row['out'] for row in rows])],
+        "Týden", "Počet operací",
+    )
+
+
+def product_movement(client_id):
+    rows = statistics_service.movements_per_day(client_id, days=14)
+    return _chart(
+        "Tok produktů za 14 dní", 'bar',
+        [row['day'] for row in rows],
+        [("Příjem", [row['in'] for row in rows]), ("Výdej", [row['out'] for row in rows])],
+        "Den", "Množství",
+    )
+
+
+def user_efficiency(client_id):
+    rows = statistics_service.operations_per_user(client_id, days=30)
+    return _chart(
+        "Operace uživatelů za 30 dní", 'bar',
+        [row['user'] or row['email'] or "–" for row in rows],
+        [("Operace", [row['total'] for row in rows])],
+        "Uživatel", "Počet operací",
+    )
+
+
+def warehouse_heatmap(client_id):
+    rows = statistics_service.boxes_per_position(client_id)
+    return _chart(
+        "Obsazenost skladových pozic", 'bar',
+        [f"{row['position']} ({row['warehouse']})" for row in rows],
+        [("Krabice", [row['boxes'] for row in rows])],
+        "Pozice", "Počet krabic",
+    )
+
+
+# Statistiky počítané přímo nad databází (bez asistenta) podle stat_id
+REPORTS = {
+    'stockSummary': stock_summary,
+    'expiringSoon': expiring_soon,
+    'lowStock': low_stock,
+    'operationStats': operation_stats,
+    'productMovement': product_movement,
+    'userEfficiency': user_efficiency,
+    'warehouseHeatmap': warehouse_heatmap,
+}
+
+
+def build_report(stat_id, client_id):
+    """
+    Sestaví report pro klienta.
+
+    :param stat_id: ID statistiky (klíč `REPORTS`)
+    :param client_id: ID klienta
+    :return: dict s 'type' 'table' (columns, rows) nebo 'chart' (chart, labels, series)
+    """
+    return {'stat_id': stat_id, **REPORTS[stat_id](client_id)}
+
+
+def cached_report(stat_id, client_id, image=False):
+    """
+    Report ze sdílené cache klienta (stale-while-revalidate, zneplatňuje se změnami zásob a operací).
+
+    :param stat_id: ID statistiky (klíč `REPORTS`)
+    :param client_id: ID klienta
+    :param image: Přidat vykreslený obrázek (`image_element`)
+    :return: dict
+    """
+    def compute():
+        report = build_report(stat_id, client_id)
+        if image:
+            report['image'] = image_element(report)
+        return report
+
+    return cache_service.get_or_compute(client_id, f"report:{stat_id}:{'png' if image else 'json'}", compute)
+
+
+def render_png(report):
+    """
+    Vykreslí report do PNG (tabulka nebo graf) pomocí matplotlib.
+
+    :param report: Výstup `build_report`
+    :return: bytes
+    """
+    # Import až při vykreslení – matplotlib je těžký a většina požadavků obrázek nechce.
+    # Figure bez pyplot nepotřebuje GUI backend ani globální stav (bezpečné ve vláknech).
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    axes = figure.subplots()
+    axes.set_title(report['title'])
+
+    if report['type'] == 'table':
+        axes.axis('off')
+        keys = [column['key'] for column in report['columns']]
+        cells = [[str(row.get(key, '')) for key in keys] for row in report['rows']] or [['–'] * len(keys)]
+        axes.table(cellText=cells, colLabels=[column['label'] for column in report['columns']], loc='upper center')
+    else:
+        positions = range(len(report['labels']))
+        width = 0.8 / max(len(report['series']), 1)
+        for index, series in enumerate(report['series']):
+            if report['chart'] == 'line':
+                axes.plot(positions, series['data'], marker='o', label=series['name'])
+            else:
+                axes.bar([position + index * width for position in positions], series['data'], width,
+                         label=series['name'])
+        axes.set_xticks(list(positions), report['labels'], rotation=45, ha='right')
+        axes.set_xlabel(report['xLabel'])
+        axes.set_ylabel(report['yLabel'])
+        if len(report['series']) > 1:
+            axes.legend()
+
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def image_element(report):
+    """
+    Report vykreslený jako element obrázku (stejný tvar jako obrázky od asistenta).
+    """
+    return {
+        'element': 'img',
+        'src': f"data:image/png;base64,{b64encode(render_png(report)).decode()}",
+        'alt': report['title'],
+    }
@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from batch.services import expiry_service
+from operation.models import Operation
+from stock.models import StockMovement
+from stock.services import location_service
+
+# Horní mez období a počtu řádků (agregace mají vracet malé výsledky)
+MAX_WEEKS = 104
+MAX_DAYS = 365
+MAX_LIMIT = 100
+
+
+def _clamp(value, maximum):
+    return max(1, min(int(value), maximum))
+
+
+def _active_operations(client_id):
+    return Operation.objects.filter(client_id=client_id).exclude(status='CANCELLED')
+
+
+def operations_per_week(client_id, weeks=12):
+    """
+    Počet příjmů a výdejů po týdnech (bez zrušených operací).
+
+    :param client_id: ID klienta
+    :param weeks: Počet posledních týdnů
+    :return: Seznam {"week", "in", "out"} od nejstaršího týdne
+    """
+    since = timezone.now() - timedelta(weeks=_clamp(weeks, MAX_WEEKS))
+    rows = (
+        _active_operations(client_id).filter(created_at__gte=since)
+        .annotate(week=TruncWeek('created_at'))
+        .values('week')
+        .annotate(**{'in': Count('id', filter=Q(type='IN')), 'out': Count('id', filter=Q(type='OUT'))})
+        .order_by('week')
+    )
+    return [{'week': row['week'].date(), 'in': row['in'], 'out': row['out']} for row in rows]
+
+
+def top_outbound_products(client_id, days=30, limit=10):
+    """
+    Produkty s největším vyskladněným množstvím za období – součet výdejů ze skladové knihy.
+
+    :param client_id: ID klienta
+    :param days: Počet posledních dní
+    :param limit: Počet produktů
+    :return: Seznam {"product_id", "sku", "name", "quantity"} sestupně podle množství
+    """
+    since = timezone.now() - timedelta(days=_clamp(days, MAX_DAYS))
+    rows = (
+        StockMovement.objects.filter(product__client_id=client_id, operation__type='OUT', timestamp__gte=since)
+        .values('product_id', 'product__sku', 'product__name')
+        .annotate(quantity=-Sum('delta'))
+        .filter(quantity__gt=0)
+        .order_by('-quantity', 'product__sku')[:_clamp(limit, MAX_LIMIT)]
+    )
+    return [
+        {'product_id': row['product_id'], 'sku': row['product__sku'], 'name': row['product__name'],
+         'quantity': row['quantity']}
+        for row in rows
+    ]
+
+
+def expirations_per_week(client_id, weeks=8):
+    """
+    Šarže se zásobou, které expirují v následujících týdnech (rozsahový dotaz nad indexem expirací).
+
+    :param client_id: ID klienta
+    :param weeks: Počet následujících týdnů
+    :return: Seznam {"week", "batches", "quantity"} od nejbližšího týdne
+    """
+    rows = expiry_service.buckets(client_id, days=_clamp(weeks, MAX_WEEKS) * 7, bucket='week')
+    return [{'week': row['date'], 'batches': row['batches'], 'quantity': row['quantity']} for row in rows]
+
+
+def boxes_per_position(client_id, limit=50):
+    """
+    Počet krabic se zbožím klienta a množství na jednotlivých pozicích (podklad pro heatmapu)
+    ze zásob v krabicích.
+
+    :param client_id: ID klienta
+    :param limit: Počet pozic
+    :return: Seznam {"position", "warehouse", "boxes", "quantity"} sestupně podle počtu krabic
+    """
+    rows = location_service.occupancy([client_id], limit=_clamp(limit, MAX_LIMIT))
+    return [
+        {'position': row['position'], 'warehouse': row['warehouse'], 'boxes': row['boxes'],
+         'quantity': row['quantity']}
+        for row in rows
+    ]
+
+
+def operations_per_user(client_id, days=30):
+    """
+    Počet operací jednotlivých uživatelů za období (bez zrušených operací).
+
+    :param client_id: ID klienta
+    :param days: Počet posledních dní
+    :return: Seznam {"user", "email", "in", "out", "total"} sestupně podle počtu operací
+    """
+    since = timezone.now() - timedelta(days=_clamp(days, MAX_DAYS))
+    rows = (
+        _active_operations(client_id).filter(created_at__gte=since)
+        .values('user_id', 'user__name', 'user__email')
+        .annotate(**{
+            'in': Count('id', filter=Q(type='IN')),
+            'out': Count('id', filter=Q(type='OUT')),
+            'total': Count('id'),
+        })
+        .order_by('-total', 'user__name')
+    )
+    return [
+        {'user': row['user__name'], 'email': row['user__email'], 'in': row['in'], 'out': row['out'],
+         'total': row['total']}
+        for row in rows
+    ]
+
+
+def movements_per_day(client_id, days=14):
+    """
+    Přijaté a vydané množství po dnech ze skladové knihy (přebalení mezi krabicemi se nepočítá).
+
+    :param client_id: ID klienta
+    :param days: Počet posledních dní
+    :return: Seznam {"day", "in", "out"} od nejstaršího dne
+    """
+    since = timezone.now() - timedelta(days=_clamp(days, MAX_DAYS))
+    rows = (
+        StockMovement.objects.filter(product__client_id=client_id, operation__type__in=('IN', 'OUT'),
+                                     timestamp__gte=since)
+        .annotate(day=TruncDate('timestamp'))
+        .values('day')
+        .annotate(**{
+            'in': Sum('delta', filter=Q(operation__type='IN')),
+            'out': Sum('delta', filter=Q(operation__type='OUT')),
+        })
+        .order_by('day')
+    )
+    return [{'day': row['day'], 'in': row['in'] or 0, 'out': -(row['out'] or 0)} for row in rows]
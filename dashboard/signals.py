@@ -0,0 +1,74 @@
+# dashboard/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from batch.models import Batch
+from dashboard.services import cache_service, metrics_service
+from operation.models import Operation
+from operation.signals import status_changed
+from product.models import Product
+from stock.signals import stock_changed
+
+
+@receiver(stock_changed)
+def update_stock_metrics(sender, product_deltas, **kwargs):
+    """
+    Promítne změnu zásob ze skladové knihy do metrik dashboardu a zneplatní cache statistik.
+    """
+    cache_service.invalidate_clients(metrics_service.apply_stock_deltas(product_deltas))
+
+
+@receiver(post_save, sender=Operation)
+def update_operation_metrics(sender, instance, created, **kwargs):
+    """
+    Započítá novou operaci nebo změnu jejího stavu.
+    """
+    metrics_service.apply_operation_saved(instance, getattr(instance, '_previous_status', None), created)
+    cache_service.invalidate_clients([instance.client_id])
+
+
+@receiver(status_changed)
+def update_status_metrics(sender, changes, **kwargs):
+    """
+    Započítá přechody stavů provedené bez uložení instance (`transition_service`).
+    """
+    cache_service.invalidate_clients(metrics_service.apply_status_changes(changes))
+
+
+@receiver(post_delete, sender=Operation)
+def remove_operation_metrics(sender, instance, **kwargs):
+    """
+    Odečte smazanou operaci.
+    """
+    metrics_service.apply_operation_removed(instance)
+    cache_service.invalidate_clients([instance.client_id])
+
+
+@receiver(post_save, sender=Product)
+def update_product_metrics(sender, instance, created, **kwargs):
+    """
+    Započítá nový produkt.
+    """
+    if created:
+        metrics_service.apply_product_created(instance)
+    cache_service.invalidate_clients([instance.client_id])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_metrics(sender, instance, **kwargs):
+    """
+    Smazání produktu (včetně kaskády šarží a skupin) se promítne plným přepočtem klienta.
+    """
+    metrics_service.rebuild_client_metrics([instance.client_id])
+    cache_service.invalidate_clients([instance.client_id])
+
+
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+def invalidate_expiring_metrics(sender, instance, **kwargs):
+    """
+    Změna šarže může změnit počet brzy expirujících šarží – přepočte se při dalším čtení.
+    """
+    metrics_service.invalidate_expiring(instance.product_id)
+    # Při kaskádovém mazání produktu už produkt neexistuje – cache zneplatní smazání produktu
+    cache_service.invalidate_clients(Product.objects.filter(id=instance.product_id).values_list('client_id', flat=True))
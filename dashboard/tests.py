@@ -123,4 +123,136 @@ class TestDashboardViews:
         api_client.force_authenticate(user=user)
         res = api_client.get(f"/api/dashboard/efficiency/?clientId={client.id}")
         assert res.status_code == status.HTTP_200_OK
-        assert res.data["efficiency"] == 0
\ No newline at end of file
+        assert res.data["efficiency"] == 0
+
+
+@pytest.mark.django_db
+class TestClientMetrics:
+
+    # Přírůstkově udržované metriky odpovídají plnému přepočtu
+    def test_incremental_metrics_match_rebuild(self, authenticated_client_with_data):
+        from django.core.management import call_command
+        from dashboard.models import ClientMetrics
+        from operation.services.operation_service import add_group_to_out_operation
+
+        _, client, user = authenticated_client_with_data
+        out = Operation.objects.create(client=client, type="OUT", number="OUT-M1", user=user)
+        add_group_to_out_operation(out, Product.objects.get(sku="SKU123").id, 5)
+        out.status = "BOX"
+        out.save()
+
+        fields = ["operations_created", "operations_box", "operations_completed", "total_items",
+                  "total_products", "out_of_stock_count", "low_stock_count", "completion_count"]
+        incremental = ClientMetrics.objects.filter(client=client).values(*fields).get()
+        call_command("rebuild_dashboard_metrics", client=[client.id])
+        rebuilt = ClientMetrics.objects.filter(client=client).values(*fields).get()
+
+        assert incremental == rebuilt
+        assert rebuilt["operations_box"] == 1
+        assert rebuilt["low_stock_count"] == 1
+
+    # Smazání dokončené operace neodečítá dobu dokončení podle pozdějšího `updated_at`
+    def test_removed_operation_completion_time(self, client_factory):
+        from dashboard.models import ClientMetrics
+
+        client = client_factory()
+        kept = Operation.objects.create(client=client, type="IN", number="DONE-1", status="BOX")
+        removed = Operation.objects.create(client=client, type="IN", number="DONE-2", status="BOX")
+        for operation in (kept, removed):
+            operation.status = "COMPLETED"
+            operation.save()
+
+        # Úprava po dokončení posune `updated_at`
+        Operation.objects.filter(id=removed.id).update(updated_at=timezone.now() + timedelta(hours=5))
+        Operation.objects.get(id=removed.id).delete()
+
+        metrics = ClientMetrics.objects.get(client=client)
+        assert metrics.completion_count == 1
+        assert metrics.completion_seconds == pytest.approx((kept.updated_at - kept.created_at).total_seconds())
+
+    # Statistiky bez filtru období čtou jen řádek metrik
+    def test_stats_read_metrics_row(self, authenticated_client_with_data, django_assert_max_num_queries):
+        api_client, client, _ = authenticated_client_with_data
+        api_client.get(f"/api/dashboard/stats/?clientId={client.id}")
+
+        with django_assert_max_num_queries(4):
+            res = api_client.get(f"/api/dashboard/stats/?clientId={client.id}")
+        assert res.data["totalOperations"] == 1
+        assert res.data["completedOperations"] == 1
+
+
+@pytest.mark.django_db
+class TestReports:
+
+    # Tok produktů se sčítá ze skladové knihy – příjem a výdej v kusech po dnech
+    def test_product_movement_report(self, client_factory):
+        from dashboard.services import report_service
+        from operation.services.operation_service import (
+            add_group_to_in_operation, add_group_to_out_operation, create_new_box
+        )
+
+        client = client_factory()
+        product = Product.objects.create(name="Tok", sku="FLOW-1", client=client)
+        incoming = Operation.objects.create(client=client, type="IN", number="IN-FLOW")
+        add_group_to_in_operation(incoming, product.id, "F1", create_new_box("FLOW-BOX").id, 12)
+        outgoing = Operation.objects.create(client=client, type="OUT", number="OUT-FLOW")
+        add_group_to_out_operation(outgoing, product.id, 5, "F1")
+
+        report = report_service.build_report("productMovement", client.id)
+        assert report["labels"] == [str(timezone.now().date())]
+        assert report["series"] == [{"name": "Příjem", "data": [12]}, {"name": "Výdej", "data": [5]}]
+        assert report_service.render_png(report).startswith(b"\x89PNG")
+
+
+@pytest.mark.django_db
+class TestStatisticsCache:
+
+    # Zastaralý záznam se vrátí hned a přepočítá se; změna dat se projeví až po commitu
+    def test_stale_while_revalidate(self, client_factory, settings, django_capture_on_commit_callbacks):
+        from dashboard.services import cache_service
+
+        settings.SWR_CACHE_ASYNC = False
+        client = client_factory()
+        values = iter([1, 2])
+
+        assert cache_service.get_or_compute(client.id, "test", lambda: next(values)) == 1
+        assert cache_service.get_or_compute(client.id, "test", lambda: next(values)) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            cache_service.invalidate_clients([client.id])
+            assert cache_service.get_entry(client.id, "test") == (1, True)
+
+        assert cache_service.get_or_compute(client.id, "test", lambda: next(values)) == 1
+        assert cache_service.get_entry(client.id, "test") == (2, True)
+
+    # Zneplatnění z vráceného savepointu se neprovede, z vnější transakce ano
+    def test_rolled_back_savepoint_keeps_cache(self, client_factory, django_capture_on_commit_callbacks):
+        from django.db import transaction
+        from dashboard.services import cache_service
+
+        client, other = client_factory(), client_factory(name="Jiný")
+        before = cache_service.generation(client.id), cache_service.generation(other.id)
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            cache_service.invalidate_clients([other.id])
+            with pytest.raises(RuntimeError), transaction.atomic():
+                cache_service.invalidate_clients([client.id])
+                raise RuntimeError()
+
+        assert cache_service.generation(client.id) == before[0]
+        assert cache_service.generation(other.id) != before[1]
+
+    # Nová operace klienta zneplatní jeho reporty, jiných klientů se netýká
+    def test_operation_invalidates_client_reports(self, client_factory, django_capture_on_commit_callbacks):
+        from dashboard.services import report_service
+        from dashboard.services.cache_service import get_entry
+
+        client, other = client_factory(), client_factory(name="Jiný")
+        report_service.cached_report("operationStats", client.id)
+        report_service.cached_report("operationStats", other.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Operation.objects.create(client=client, type="IN", number="IN-CACHE")
+
+        assert get_entry(client.id, "report:operationStats:json")[1] is False
+        assert get_entry(other.id, "report:operationStats:json")[1] is True
@@ -2,7 +2,6 @@ from datetime import timedelta, datetime
 from django.db.models import Q
 
 from django.db.models.functions import TruncDay, TruncDate
-from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.utils.timezone import make_aware, now
 from drf_yasg import openapi
@@ -18,8 +17,13 @@ from product.models import Product
 from operation.models import Operation
 from history.models import History
 from .models import UserDashboardConfig
+from batch.services import expiry_service
+from .services import cache_service, metrics_service
+from .services.metrics_service import LOW_STOCK_THRESHOLD, EXPIRING_SOON_DAYS
 from datetime import timedelta
-from django.utils import timezone
+
+# Počet šarží vypsaných v přehledu u brzy expirujících (celý výpis má vlastní endpoint)
+EXPIRING_PREVIEW_LIMIT = 10
 
 @swagger_auto_schema(method='get', operation_description="Vrací konfiguraci dashboardu (widgety a layout) pro aktuálního uživatele.", manual_parameters=[
     openapi.Parameter('stats', openapi.IN_QUERY, description="Vrací konfiguraci statistik místo hlavního dashboardu", type=openapi.TYPE_BOOLEAN)
@@ -78,37 +82,37 @@ def dashboard_overview(request):
     """
     client_id = request.query_params.get("clientId")
 
-    products = Product.objects.filter(client_id=client_id) if client_id else Product.objects.all()
-    products = products.only("id", "sku", "name", "amount_cached")
-
-    total_items = products.aggregate(total=Sum("amount_cached"))["total"] or 0
+    # Počty a součty z materializovaných metrik (jeden řádek na klienta)
+    metrics = metrics_service.get_summary([client_id] if client_id else None)
+    total_items = metrics["total_items"]
     total_value = total_items  # Zatím bez ceny
-    total_products = products.count()
+    total_products = metrics["total_products"]
+    out_of_stock_count = metrics["out_of_stock_count"]
+    low_stock_count = metrics["low_stock_count"]
 
-    # Filtrování pomocí amount_cached
-    out_of_stock = products.filter(amount_cached=0)
-    low_stock = products.filter(amount_cached__gt=0, amount_cached__lt=10)
-
-    out_of_stock_count = out_of_stock.count()
-    out_of_stock_value = ",".join(out_of_stock.values_list("sku", flat=True))
+    products = Product.objects.filter(client_id=client_id) if client_id else Product.objects.all()
 
-    low_stock_count = low_stock.count()
-    low_stock_value = ",".join(low_stock.values_list("sku", flat=True))
+    # Seznamy SKU – jeden dotaz pro vyprodané i málo zásobené produkty, jen pokud nějaké jsou
+    out_of_stock_value = low_stock_value = ""
+    if out_of_stock_count or low_stock_count:
+        low = list(products.filter(amount_cached__gte=0, amount_cached__lt=LOW_STOCK_THRESHOLD)
+                   .values_list("sku", "amount_cached"))
+        out_of_stock_value = ",".join(sku for sku, amount in low if amount == 0)
+        low_stock_value = ",".join(sku for sku, amount in low if amount > 0)
 
     # Šarže s blížící se expirací
-    expiring_soon_threshold = 30
-    now = timezone.now().date()
-    expiring_batches = Batch.objects.filter(
-        expiration_date__isnull=False,
-        expiration_date__lte=now + timedelta(days=expiring_soon_threshold),
-        product__client_id=client_id
-    )
-
-    expiring_soon_count = expiring_batches.count()
-    expiring_soon_value = ",".join(expiring_batches.values_list("batch_number", flat=True))
+    expiring_soon_value = ""
+    expiring_soon_count = metrics["expiring_soon_count"] if client_id else 0
+    if expiring_soon_count:
+        # Jen nejdříve expirující šarže se zásobou – celý výpis je na /api/batches/expiring/
+        expiring_batches = expiry_service.feed([client_id], EXPIRING_SOON_DAYS)[:EXPIRING_PREVIEW_LIMIT]
+        expiring_soon_value = ",".join(batch.batch_number for batch in expiring_batches)
 
     # Nejzásobenější produkt
-    most_stocked_product = products.order_by("-amount_cached").first()
+    most_stocked_product = (
+        products.only("id", "name", "amount_cached").order_by("-amount_cached").first()
+        if total_products else None
+    )
     most_stock_data = {
         "id": most_stocked_product.id,
         "name": most_stocked_product.name,
@@ -368,34 +372,45 @@ def dashboard_stats(request):
     to_date = request.GET.get("filters[to_date]")
     client_id = request.query_params.get("clientId")
 
-    operations_query = Operation.objects.all()
-    if client_id:
-        operations_query = operations_query.filter(client_id=client_id)
-    else:
-        client_ids = request.user.client.all().values_list('id', flat=True)
-        operations_query = operations_query.filter(client_id__in=client_ids)
+    client_ids = [client_id] if client_id else list(request.user.client.all().values_list('id', flat=True))
 
-    # 📆 Filtr podle období
-    if from_date or to_date:
-        if from_date:
-            from_date = parse_date(from_date)
-            operations_query = operations_query.filter(updated_at__gte=from_date)
-        if to_date:
-            to_date = parse_date(to_date)
-            operations_query = operations_query.filter(updated_at__lte=to_date)
-    elif year or month or day:
-        if year:
-            operations_query = operations_query.filter(updated_at__year=year)
-        if month:
-            operations_query = operations_query.filter(updated_at__month=month)
-        if day:
-            operations_query = operations_query.filter(updated_at__day=day)
-
-    # 📊 Počet operací podle stavu
-    total_operations = operations_query.count()
-    completed_operations = operations_query.filter(status='COMPLETED').count()
-    cancelled_operations = operations_query.filter(status='CANCELLED').count()
-    in_progress_operations = operations_query.filter(status__in=['CREATED', 'BOX']).count()
+    if not (from_date or to_date or year or month or day):
+        # 📊 Bez filtru období – počty podle stavu z materializovaných metrik
+        metrics = metrics_service.get_summary(client_ids)
+        total_operations = metrics['operations_total']
+        completed_operations = metrics['operations_completed']
+        cancelled_operations = metrics['operations_cancelled']
+        in_progress_operations = metrics['operations_created'] + metrics['operations_box']
+    else:
+        operations_query = Operation.objects.filter(client_id__in=client_ids)
+
+        # 📆 Filtr podle období
+        if from_date or to_date:
+            if from_date:
+                from_date = parse_date(from_date)
+                operations_query = operations_query.filter(updated_at__gte=from_date)
+            if to_date:
+                to_date = parse_date(to_date)
+                operations_query = operations_query.filter(updated_at__lte=to_date)
+        else:
+            if year:
+                operations_query = operations_query.filter(updated_at__year=year)
+            if month:
+                operations_query = operations_query.filter(updated_at__month=month)
+            if day:
+                operations_query = operations_query.filter(updated_at__day=day)
+
+        # 📊 Počet operací podle stavu – jeden agregační dotaz
+        counts = operations_query.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='COMPLETED')),
+            cancelled=Count('id', filter=Q(status='CANCELLED')),
+            in_progress=Count('id', filter=Q(status__in=['CREATED', 'BOX'])),
+        )
+        total_operations = counts['total']
+        completed_operations = counts['completed']
+        cancelled_operations = counts['cancelled']
+        in_progress_operations = counts['in_progress']
 
     return Response({
         'totalOperations': total_operations,
@@ -438,32 +453,25 @@ def dashboard_efficiency(request):
     :param request: HTTP GET s volitelným 'clientId'
     :return: Response s procentuálními hodnotami efektivity
     """
-    now_time = now()
-    week_ago = now_time - timedelta(days=7)
+    week_ago = now() - timedelta(days=7)
     client_id = request.query_params.get("clientId")
-    operations = Operation.objects.all()
-    if client_id:
-        operations = operations.filter(client_id=client_id)
-    else:
-        client_ids = request.user.client.all().values_list('id', flat=True)
-        operations = operations.filter(client_id__in=client_ids)
+    client_ids = [client_id] if client_id else list(request.user.client.all().values_list('id', flat=True))
 
     # 📊 Celkové operace
-    total_operations = operations.count()
-    completed_operations = operations.filter(status='COMPLETED').count()
+    metrics = metrics_service.get_summary(client_ids)
+    total_operations = metrics['operations_total']
+    completed_operations = metrics['operations_completed']
     efficiency = (completed_operations / total_operations * 100) if total_operations > 0 else 0
 
-    # 📊 Efektivita za poslední týden
-    total_week = operations.filter(created_at__gte=week_ago).count()
-    completed_week = operations.filter(status='COMPLETED', created_at__gte=week_ago).count()
-    weekly_efficiency = (completed_week / total_week * 100) if total_week > 0 else 0
+    # 📊 Efektivita za poslední týden – jeden agregační dotaz
+    week = Operation.objects.filter(client_id__in=client_ids, created_at__gte=week_ago).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+    )
+    weekly_efficiency = (week['completed'] / week['total'] * 100) if week['total'] > 0 else 0
 
     # 📊 Průměrná historická efektivita
-    all_efficiencies = operations.values("status").annotate(count=Count("id"))
-    avg_efficiency = sum([
-        (op["count"] / total_operations * 100)
-        for op in all_efficiencies if op["status"] == "COMPLETED"
-    ]) if total_operations > 0 else 0
+    avg_efficiency = efficiency
 
     return Response({
         'efficiency': efficiency,
@@ -551,8 +559,15 @@ def dashboard_extended_stats(request):
     :param request: HTTP GET s volitelným 'clientId'
     :return: Response s třemi typy dat: trend, průměrná doba a top uživatelé
     """
-    # 📊 Trend operací za poslední týden pro každého uživatele
     client_id = request.query_params.get("clientId")
+    if client_id:
+        # Statistiky klienta ze sdílené cache – zneplatní je změna operací nebo zásob klienta
+        return Response(cache_service.get_or_compute(client_id, "extended_stats", lambda: _extended_stats(client_id)))
+    return Response(_extended_stats(None))
+
+
+def _extended_stats(client_id):
+    # 📊 Trend operací za poslední týden pro každého uživatele
     operations = Operation.objects.all()
     if client_id:
         operations = operations.filter(client_id=client_id)
@@ -566,16 +581,12 @@ def dashboard_extended_stats(request):
         .order_by("day", "user__name")
     )
 
-    # ⏳ Průměrná doba dokončení operací
-    completed_ops = operations.filter(status="COMPLETED")
-    total_duration = 0
-    count = 0
-    for op in completed_ops:
-        if op.created_at and op.updated_at:
-            duration = (op.updated_at - op.created_at).total_seconds() / 60
-            total_duration += duration
-            count += 1
-    avg_completion_time = total_duration / count if count > 0 else 0
+    # ⏳ Průměrná doba dokončení operací (součet a počet udržují metriky dashboardu)
+    metrics = metrics_service.get_summary([client_id] if client_id else None)
+    avg_completion_time = (
+        metrics["completion_seconds"] / metrics["completion_count"] / 60
+        if metrics["completion_count"] > 0 else 0
+    )
 
     # 👥 Nejaktivnější skladníci
     top_users = (
@@ -584,8 +595,8 @@ def dashboard_extended_stats(request):
         .order_by("-op_count")[:5]
     )
 
-    return Response({
+    return {
         "trend": list(trend_data),
         "avgCompletionTime": avg_completion_time,
         "topUsers": list(top_users),
-    })
\ No newline at end of file
+    }
\ No newline at end of file
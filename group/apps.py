@@ -4,6 +4,3 @@ from django.apps import AppConfig
 class GroupConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'group'
-
-    def ready(self):
-        import group.signals
\ No newline at end of file
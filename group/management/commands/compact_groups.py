@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from group.services.compaction_service import CHUNK_SIZE, compact
+from jobs.services import job_service
+
+
+class Command(BaseCommand):
+    help = "Sloučí skupiny se stejnou šarží, krabicí, příznakem rescanned a stejnými operacemi do jedné"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--client", type=int, action="append", dest="clients",
+                            help="ID klienta (lze zadat vícekrát), výchozí jsou všichni klienti")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                            help="Počet šarží zpracovaných v jedné transakci")
+        parser.add_argument("--background", action="store_true", help="Jen zařadí slučování do fronty úloh")
+
+    def handle(self, *args, **options):
+        if options["background"]:
+            job = job_service.enqueue("group.compact", unique=True, client_ids=options.get("clients"))
+            self.stdout.write(self.style.SUCCESS(f"✅ Slučování zařazeno do fronty jako úloha #{job.id}."))
+            return
+
+        self.stdout.write("🧩 Spouštím slučování skupin...")
+        result = compact(options.get("clients"), chunk_size=max(1, options["chunk_size"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Hotovo – u {result['clients']} klientů odstraněno {result['removed']} skupin."))
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from batch.models import Batch
 from box.models import Box
 from group.models import Group
+from search.services import search_service
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -64,7 +65,9 @@ class GroupSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         if isinstance(validated_data, list):
-            return Group.objects.bulk_create([Group(**batch) for batch in validated_data])
+            groups = Group.objects.bulk_create([Group(**batch) for batch in validated_data])
+            search_service.schedule_instances(groups)
+            return groups
         return super().create(validated_data)
 
 
@@ -90,7 +93,9 @@ class GroupBulkSerializer(serializers.ModelSerializer):
         fields = ["batch_id", "box_id", "quantity"]
 
     def create(self, validated_data):
-        return Group.objects.bulk_create([Group(**item) for item in validated_data])
+        groups = Group.objects.bulk_create([Group(**item) for item in validated_data])
+        search_service.schedule_instances(groups)
+        return groups
 
 
 class GroupListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,155 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from batch.models import Batch
+from client.models import Client
+from group.models import Group
+from history.models import History
+from history.services import history_writer
+from operation.models import Operation
+from operation.services import summary_service
+from search.services import search_service
+from stock.models import StockMovement
+from stock.services.ledger_service import operation_sign, record_movements
+from utils.bulk_delete import delete_rows
+
+# Počet šarží zpracovaných v jedné transakci – zámky skupin se drží jen krátce
+CHUNK_SIZE = 5
+
+
+def merge_batches(batch_ids, user=None):
+    """
+    Sloučí skupiny šarží, které mají stejnou krabici, příznak `rescanned` a stejné operace,
+    do jedné skupiny (s nejnižším ID). Počet dotazů nezávisí na počtu skupin.
+
+    Zamyká jen skupiny, které právě nikdo jiný nezamkl (`skip_locked`) – skupiny rozpracované
+    souběžným požadavkem se přeskočí a sloučí se při dalším běhu. Alokace výdeje, která na
+    zamčené skupiny narazí, počká na konec transakce (`allocation_service.allocate`).
+
+    Zásoby se nemění: skladová kniha zapíše dvojici pohybů (výdej sloučené skupiny, příjem
+    do ponechané), takže čítače produktů, šarží i krabic zůstanou stejné.
+
+    :param batch_ids: ID šarží
+    :param user: (volitelné) Uživatel pro historii
+    :return: Množina ID odstraněných skupin
+    """
+    with transaction.atomic():
+        return _merge(batch_ids, user)
+
+
+def _merge(batch_ids, user):
+    groups = list(
+        Group.objects.filter(batch_id__in=list(batch_ids))
+        .select_for_update(skip_locked=True, of=('self',))
+        .values('id', 'batch_id', 'box_id', 'rescanned', 'quantity', product_id=F('batch__product_id'))
+        .order_by('id')
+    )
+    if len(groups) < 2:
+        return set()
+
+    through = Operation.groups.through
+    memberships = defaultdict(list)
+    for group_id, operation_id, operation_type in through.objects.filter(
+            group_id__in=[group['id'] for group in groups]).values_list('group_id', 'operation_id', 'operation__type'):
+        memberships[group_id].append((operation_id, operation_type))
+
+    buckets = defaultdict(list)
+    for group in groups:
+        key = (group['batch_id'], group['box_id'], group['rescanned'],
+               frozenset(operation_id for operation_id, _ in memberships[group['id']]))
+        buckets[key].append(group)
+
+    survivors = []
+    removed = []
+    movements = []
+    history = []
+    for bucket in buckets.values():
+        if len(bucket) < 2:
+            continue
+        survivor, *merged = bucket
+        for group in merged:
+            removed.append(group['id'])
+            for operation_id, operation_type in memberships[group['id']]:
+                sign = operation_sign(operation_type)
+                movements.append(_movement(group, operation_id, -sign * group['quantity']))
+                movements.append(_movement(survivor, operation_id, sign * group['quantity']))
+            history.append(History(type="group", related_id=group['id'], user=user,
+                                   description=f"Skupina s množstvím {group['quantity']} "
+                                               f"sloučena do skupiny {survivor['id']}"))
+        quantity = survivor['quantity'] + sum(group['quantity'] for group in merged)
+        history.append(History(type="group", related_id=survivor['id'], user=user,
+                               description=f"Změněno množství z {survivor['quantity']} na {quantity} "
+                                           f"(sloučeno {len(merged)} skupin)"))
+        survivors.append(Group(id=survivor['id'], quantity=quantity))
+
+    if not removed:
+        return set()
+
+    through.objects.filter(group_id__in=removed).delete()
+    # Mazání bez signálů jednotlivých instancí – pohyby a historie se zapisují hromadně
+    delete_rows(Group, removed)
+    Group.objects.bulk_update(survivors, ['quantity'], batch_size=1000)
+    record_movements(movements)
+    history_writer.record_many(history)
+    search_service.schedule('group', [*removed, *(group.id for group in survivors)])
+    summary_service.refresh_operation_summaries(
+        operation_id for group in survivors for operation_id, _ in memberships[group.id]
+    )
+
+    return set(removed)
+
+
+def _movement(group, operation_id, delta):
+    return StockMovement(product_id=group['product_id'], batch_id=group['batch_id'], box_id=group['box_id'],
+                         group_id=group['id'], operation_id=operation_id, delta=delta)
+
+
+def compact_client(client_id, chunk_size=CHUNK_SIZE):
+    """
+    Sloučí roztříštěné skupiny klienta po dávkách šarží (každá dávka ve vlastní krátké transakci,
+    takže běží vedle běžného provozu). Zpracují se jen šarže s více skupinami.
+
+    :param client_id: ID klienta
+    :param chunk_size: Počet šarží v jedné transakci
+    :return: Počet odstraněných skupin
+    """
+    batches = (
+        Batch.objects.filter(product__client_id=client_id)
+        .annotate(group_count=Count('groups'))
+        .filter(group_count__gt=1)
+        .order_by('id')
+    )
+
+    removed = 0
+    last_id = 0
+    while True:
+        batch_ids = list(batches.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+        if not batch_ids:
+            return removed
+        removed += len(merge_batches(batch_ids))
+        last_id = batch_ids[-1]
+
+
+def compact(client_ids=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Sloučí roztříštěné skupiny všech nebo vybraných klientů (po klientech).
+
+    :param client_ids: (volitelné) Omezení na vybrané klienty
+    :param chunk_size: Počet šarží v jedné transakci
+    :param progress: (volitelné) Callback `progress(procenta, zpráva)` pro úlohu na pozadí
+    :return: Slovník {"clients", "removed"}
+    """
+    clients = Client.objects.order_by('id')
+    if client_ids is not None:
+        clients = clients.filter(id__in=client_ids)
+    client_ids = list(clients.values_list('id', flat=True))
+
+    removed = 0
+    for index, client_id in enumerate(client_ids, start=1):
+        removed += compact_client(client_id, chunk_size=chunk_size)
+        if progress:
+            progress(int(index * 100 / len(client_ids)), f"Klient {client_id}: odstraněno {removed} skupin.")
+
+    return {"clients": len(client_ids), "removed": removed}
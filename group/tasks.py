@@ -0,0 +1,10 @@
+from group.services.compaction_service import compact
+from jobs.registry import task
+
+
+@task('group.compact', max_attempts=2)
+def compact_groups_task(job, client_ids=None):
+    """
+    Slučování roztříštěných skupin na pozadí (po klientech a dávkách šarží).
+    """
+    return compact(client_ids, progress=job.report_progress)
@@ -1,6 +1,9 @@
+from io import StringIO
+
 import pytest
 from rest_framework import status
 from rest_framework.test import APIClient
+from django.db import connection
 from django.urls import reverse
 
 from operation.models import Operation
@@ -121,4 +124,84 @@ class TestGroupViewSet:
     # Testuje volání `remove_from_box` s neexistujícím ID group – očekává se 404
     def test_remove_from_box_not_found(self, authenticated_group_client):
         response = authenticated_group_client.post("/api/groups/99999/remove_from_box/")
-        assert response.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+class TestGroupCompaction:
+
+    # Testuje sloučení skupin se stejnou šarží, krabicí a operacemi – zásoba se nezmění
+    def test_compact_merges_identical_groups(self, client_factory):
+        from django.core.management import call_command
+        from stock.models import LocationStock
+
+        client = client_factory()
+        product = Product.objects.create(name="Kompakce", sku="CMP1", client=client)
+        batch = Batch.objects.create(product=product, batch_number="CMP-B1")
+        box = Box.objects.create(ean="CMP-BOX")
+        inbound = Operation.objects.create(type='IN', number="CMP-IN", client=client)
+        out = Operation.objects.create(type='OUT', number="CMP-OUT", client=client)
+
+        same = [Group.objects.create(batch=batch, box=box, quantity=quantity) for quantity in (3, 4, 5)]
+        other_box = Group.objects.create(batch=batch, quantity=2)
+        shipped = Group.objects.create(batch=batch, box=box, quantity=1)
+        inbound.groups.add(*same, other_box, shipped)
+        out.groups.add(shipped)
+
+        call_command("compact_groups", "--client", str(client.id), stdout=StringIO())
+
+        survivor = Group.objects.get(id=same[0].id)
+        assert survivor.quantity == 12
+        assert not Group.objects.filter(id__in=[same[1].id, same[2].id]).exists()
+        assert set(inbound.groups.values_list("id", flat=True)) == {survivor.id, other_box.id, shipped.id}
+
+        product.refresh_from_db()
+        inbound.refresh_from_db()
+        assert product.amount == 14
+        assert inbound.groups_amount == 3
+        assert LocationStock.objects.get(box=box, batch=batch).quantity == 12
+
+
+# Souběh přes vlákna a skutečné zámky řádků (`skip_locked`) umí jen PostgreSQL
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason="Vyžaduje zámky řádků PostgreSQL")
+@pytest.mark.django_db(transaction=True)
+class TestGroupCompactionConcurrency:
+
+    # Alokace výdeje během slučování počká na zámky skupin místo hlášení nedostatku zásob
+    def test_allocation_waits_for_compaction(self, client_factory):
+        import threading
+        import time
+        from django.db import connection, transaction
+        from group.services import compaction_service
+        from operation.services import allocation_service
+
+        client = client_factory()
+        product = Product.objects.create(name="Souběh", sku="CMP2", client=client)
+        batch = Batch.objects.create(product=product, batch_number="CMP-B2")
+        box = Box.objects.create(ean="CMP-BOX-2")
+        inbound = Operation.objects.create(type='IN', number="CMP-IN-2", client=client)
+        inbound.groups.add(*[Group.objects.create(batch=batch, box=box, quantity=2) for _ in range(3)])
+
+        locked, errors = threading.Event(), []
+
+        def compact():
+            try:
+                with transaction.atomic():
+                    compaction_service.merge_batches([batch.id])
+                    locked.set()
+                    time.sleep(0.5)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                locked.set()
+                connection.close()
+
+        worker = threading.Thread(target=compact)
+        worker.start()
+        assert locked.wait(5)
+        with transaction.atomic():
+            plan = allocation_service.allocate(product.id, 5)
+        worker.join()
+
+        assert not errors
+        assert [(row["group"].quantity, row["quantity"]) for row in plan] == [(6, 5)]
+        assert Group.objects.filter(batch=batch).count() == 1
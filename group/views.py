@@ -1,15 +1,13 @@
-from functools import reduce
-
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
 
 from group.models import Group
 from group.serializers import GroupSerializer, GroupListSerializer
+from search.services import search_service
 from utils.pagination import CustomPageNumberPagination
 
 
@@ -138,31 +136,9 @@ class GroupViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        data_query = query.split(',')
-        if len(data_query) > 1:
-            data_query = [term.strip() for term in data_query if term.strip()]
-            query_filters = reduce(
-                lambda q, term: q |
-                                Q(id__icontains=term) |
-                                Q(batch__batch_number__icontains=term) |
-                                Q(batch__product__sku__icontains=term) |
-                                Q(batch__product__name__icontains=term) |
-                                Q(box__ean__icontains=term),
-                data_query,
-                Q()
-            )
-            groups = Group.objects.filter(query_filters).only("id")
-        else:
-            groups = Group.objects.filter(
-                Q(id__icontains=query) |
-                Q(batch__product__sku__icontains=query) |
-                Q(batch__product__name__icontains=query) |
-                Q(batch__batch_number__icontains=query) |
-                Q(box__ean__icontains=query)
-            )
-
-        if client_id:
-            groups = groups.filter(batch__product__client_id=client_id)
+        terms = search_service.split_terms(query)
+        groups = Group.objects.filter(id__in=search_service.search('group', terms, client_id))
+        groups = search_service.rank(groups, 'group', terms)
 
         paginator = CustomPageNumberPagination()
         paginator.page_size = request.GET.get('page_size') or 10
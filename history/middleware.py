@@ -0,0 +1,15 @@
+from history.services import history_writer
+
+
+class HistoryBufferMiddleware:
+    """
+    Sbírá záznamy historie zapsané během požadavku (mimo transakce) a ukládá je
+    jedním hromadným INSERTem po zpracování požadavku.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with history_writer.buffered():
+            return self.get_response(request)
@@ -1,13 +1,18 @@
 from rest_framework import serializers
 
-import operation
-import product
-from batch.models import Batch
-from group.models import Group
 from history.models import History
-from operation.models import Operation
-from position.models import Position
-from product.models import Product
+from history.services.label_resolver import HistoryLabelResolver
+
+
+class HistoryListSerializer(serializers.ListSerializer):
+    """
+    Seznam záznamů historie – popisky souvisejících objektů načte předem po typech.
+    """
+
+    def to_representation(self, data):
+        rows = list(data.all() if hasattr(data, 'all') else data)
+        HistoryLabelResolver.for_request(self.context.get('request')).prefetch(rows)
+        return super().to_representation(rows)
 
 
 class HistorySerializer(serializers.ModelSerializer):
@@ -17,25 +22,10 @@ class HistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = History
         fields = ['id', 'type', 'description', 'timestamp', 'user_name', 'data', 'related_id']
+        list_serializer_class = HistoryListSerializer
 
     def get_user_name(self, obj):
         return obj.user.name if obj.user else None
 
     def get_data(self, obj):
-        models_map = {
-            'operation': (Operation, 'number'),
-            'product': (Product, 'name'),
-            'batch': (Batch, 'batch_number'),
-            'group': (Group, '__str__'),
-            'position': (Position, 'code'),
-        }
-
-        model_class, attr = models_map[obj.type]
-        try:
-            instance = model_class.objects.get(pk=obj.related_id)
-        except model_class.DoesNotExist:
-            return None
-
-        if attr == '__str__':
-            return str(instance)
-        return getattr(instance, attr)
\ No newline at end of file
+        return HistoryLabelResolver.for_request(self.context.get('request')).label(obj)
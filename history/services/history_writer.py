@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, close_old_connections
+
+from history.models import History
+from utils.transaction_buffer import TransactionBuffer
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+# Fronta a worker pro out-of-band zápis (HISTORY_ASYNC = True)
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def record(type, related_id, description, user=None):
+    """
+    Zařadí záznam historie do bufferu. Zápis proběhne hromadně – po commitu transakce,
+    na konci požadavku, případně ho převezme worker na pozadí.
+
+    :param type: Kategorie změny (operation, product, batch, group, position)
+    :param related_id: ID objektu, na který se záznam vztahuje
+    :param description: Popis změny
+    :param user: (volitelné) Kdo změnu provedl
+    """
+    record_many([History(type=type, related_id=related_id, description=description, user=user)])
+
+
+def record_many(rows):
+    """
+    Zařadí více (neuložených) záznamů historie do bufferu.
+
+    :param rows: Seznam instancí History
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    if connection.in_atomic_block:
+        _transaction_rows.get().extend(rows)
+        return
+
+    request_buffer = getattr(_state, 'request_buffer', None)
+    if request_buffer is not None:
+        request_buffer.extend(rows)
+        return
+
+    _write(rows)
+
+
+@contextmanager
+def buffered():
+    """
+    Buffer záznamů mimo transakci – vše zapsané uvnitř bloku se uloží jedním INSERTem na konci.
+    Používá `HistoryBufferMiddleware` pro celý požadavek.
+    """
+    outer = getattr(_state, 'request_buffer', None)
+    _state.request_buffer = buffer = []
+    try:
+        yield buffer
+    finally:
+        _state.request_buffer = outer
+        if outer is not None:
+            outer.extend(buffer)
+        else:
+            _write(buffer)
+
+
+def flush_queue():
+    """
+    Počká, až worker zapíše všechny záznamy z fronty (pro testy a řízené ukončení).
+    """
+    _queue.join()
+
+
+def _flush_committed(rows):
+    """
+    Po commitu předá záznamy bufferu požadavku, případně je rovnou zapíše.
+    """
+    request_buffer = getattr(_state, 'request_buffer', None)
+    if request_buffer is not None:
+        request_buffer.extend(rows)
+    else:
+        _write(rows)
+
+
+# Záznamy zapsané uvnitř transakce – po savepointech, vrácený savepoint se zahodí
+_transaction_rows = TransactionBuffer(list, _flush_committed)
+
+
+def _write(rows):
+    """
+    Uloží záznamy – synchronně jedním `bulk_create`, nebo je předá workeru na pozadí.
+    """
+    if not rows:
+        return
+
+    if getattr(settings, 'HISTORY_ASYNC', False):
+        _ensure_worker()
+        _queue.put(list(rows))
+        return
+
+    History.objects.bulk_create(rows, batch_size=1000)
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_consume, name='history-writer', daemon=True)
+            _worker.start()
+
+
+def _consume():
+    """
+    Smyčka workeru – slučuje dávky z fronty do jednoho `bulk_create`.
+    """
+    while True:
+        batches = [_queue.get()]
+        while True:
+            try:
+                batches.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            close_old_connections()
+            History.objects.bulk_create([row for batch in batches for row in batch], batch_size=1000)
+        except Exception:
+            logger.exception("Zápis historie se nezdařil (%s dávek).", len(batches))
+        finally:
+            for _ in batches:
+                _queue.task_done()
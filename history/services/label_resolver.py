@@ -0,0 +1,89 @@
+from collections import defaultdict
+
+from batch.models import Batch
+from group.models import Group
+from operation.models import Operation
+from position.models import Position
+from product.models import Product
+
+
+def _group_labels(ids):
+    """
+    Popisky skupin ve tvaru `Group.__str__` – jeden dotaz s joinem na šarži a produkt.
+    """
+    groups = Group.objects.filter(id__in=ids).values_list('id', 'quantity', 'batch__product__name')
+    return {group_id: f'{quantity} x {product_name}' for group_id, quantity, product_name in groups}
+
+
+def _field_labels(model, field):
+    """
+    Vrací funkci, která načte popisky (hodnotu pole) pro seznam ID jedním `in_bulk` dotazem.
+    """
+    def load(ids):
+        return {pk: getattr(instance, field) for pk, instance in model.objects.only(field).in_bulk(ids).items()}
+    return load
+
+
+# Načítání popisků podle typu záznamu historie
+LABEL_LOADERS = {
+    'operation': _field_labels(Operation, 'number'),
+    'product': _field_labels(Product, 'name'),
+    'batch': _field_labels(Batch, 'batch_number'),
+    'group': _group_labels,
+    'position': _field_labels(Position, 'code'),
+}
+
+
+class HistoryLabelResolver:
+    """
+    Dávkové načítání popisků objektů, na které odkazují záznamy historie.
+
+    Záznamy se seskupí podle typu a popisky se načtou jedním dotazem na typ. Výsledky
+    zůstávají v cache resolveru, takže opakované dotazy v rámci požadavku nic nestojí.
+    """
+
+    def __init__(self):
+        self._labels = defaultdict(dict)
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Vrací resolver sdílený v rámci jednoho požadavku (bez požadavku nový).
+
+        :param request: HTTP požadavek nebo None
+        :return: Instance HistoryLabelResolver
+        """
+        if request is None:
+            return cls()
+        resolver = getattr(request, '_history_label_resolver', None)
+        if resolver is None:
+            resolver = cls()
+            request._history_label_resolver = resolver
+        return resolver
+
+    def prefetch(self, rows):
+        """
+        Načte popisky pro všechny záznamy, které ještě nejsou v cache.
+
+        :param rows: Iterovatelné záznamy History
+        """
+        missing = defaultdict(set)
+        for row in rows:
+            if row.type in LABEL_LOADERS and row.related_id not in self._labels[row.type]:
+                missing[row.type].add(row.related_id)
+
+        for type, ids in missing.items():
+            labels = LABEL_LOADERS[type](ids)
+            # Neexistující objekty si pamatujeme jako None, aby se znovu nedotazovaly
+            self._labels[type].update({related_id: labels.get(related_id) for related_id in ids})
+
+    def label(self, row):
+        """
+        Vrací popisek objektu pro jeden záznam (při chybějící cache ho dotáhne).
+
+        :param row: Záznam History
+        :return: Popisek nebo None, pokud objekt neexistuje
+        """
+        if row.related_id not in self._labels[row.type]:
+            self.prefetch([row])
+        return self._labels[row.type].get(row.related_id)
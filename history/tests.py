@@ -1,6 +1,9 @@
 import pytest
+from django.db import transaction
 from rest_framework import status
 from history.models import History
+from history.services import history_writer
+from product.models import Product
 from user.models import User
 
 
@@ -73,4 +76,121 @@ class TestHistoryTypeEndpoints:
         response = authenticated_history_client.get("/api/history/group/?related_id=5")
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data["results"]) == 1
-        assert response.data["results"][0]["related_id"] == 5
\ No newline at end of file
+        assert response.data["results"][0]["related_id"] == 5
+
+
+@pytest.mark.django_db
+class TestHistoryWriter:
+
+    # Záznamy z transakce se zapíšou až po commitu, a to jedním INSERTem
+    def test_buffered_until_commit(self, django_capture_on_commit_callbacks, django_assert_num_queries):
+        with django_capture_on_commit_callbacks() as callbacks:
+            with transaction.atomic():
+                history_writer.record("product", 1, "První")
+                history_writer.record("product", 2, "Druhý")
+            assert not History.objects.exists()
+
+        assert len(callbacks) == 1
+        with django_assert_num_queries(1):
+            callbacks[0]()
+        assert History.objects.count() == 2
+
+    # Při vrácení transakce se záznamy zahodí
+    def test_rollback_discards_rows(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError), transaction.atomic():
+                history_writer.record("product", 1, "Vráceno")
+                raise RuntimeError()
+            with transaction.atomic():
+                history_writer.record("product", 2, "Uloženo")
+
+        assert list(History.objects.values_list("description", flat=True)) == ["Uloženo"]
+
+    # Vrácený vnořený savepoint zahodí jen své záznamy – vnější transakce se zapíše
+    def test_nested_rollback_discards_inner_rows(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                history_writer.record("product", 1, "outer")
+                with pytest.raises(RuntimeError), transaction.atomic():
+                    history_writer.record("product", 2, "inner-rolled-back")
+                    raise RuntimeError()
+                with transaction.atomic():
+                    history_writer.record("product", 3, "inner-released")
+
+        assert sorted(History.objects.values_list("description", flat=True)) == ["inner-released", "outer"]
+
+    # Změna načteného produktu se porovná se snímkem – bez dalšího SELECTu
+    def test_tracked_snapshot_without_requery(self, client_factory, django_capture_on_commit_callbacks,
+                                              django_assert_num_queries):
+        with django_capture_on_commit_callbacks(execute=True):
+            Product.objects.create(name="Původní", sku="HIST-1", client=client_factory())
+            product = Product.objects.get(sku="HIST-1")
+            product.name = "Nový"
+            # UPDATE produktu + dohledání operací pro přepočet souhrnů a šarží/skupin pro vyhledávací
+            # index (žádný SELECT produktu)
+            with django_assert_num_queries(4):
+                product.save()
+
+        assert History.objects.filter(
+            type="product", related_id=product.id,
+            description="Změněn název produktu z Původní na Nový").exists()
+
+
+@pytest.mark.django_db
+class TestHistoryLabels:
+
+    # Počet dotazů výpisu nezávisí na počtu záznamů – popisky se načítají po typech
+    def test_list_constant_query_count(self, authenticated_history_client, history_user,
+                                       django_assert_max_num_queries):
+        client = history_user.client.first()
+        products = [Product.objects.create(name=f"P{i}", sku=f"HIST-L{i}", client=client) for i in range(20)]
+        History.objects.bulk_create(
+            [History(type="product", related_id=p.id, description="x", user=history_user) for p in products] +
+            [History(type="operation", related_id=999, description="y", user=history_user)]
+        )
+
+        with django_assert_max_num_queries(6):
+            response = authenticated_history_client.get("/api/history/?page_size=50")
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data["results"] if isinstance(response.data, dict) else response.data
+        labels = {row["related_id"]: row["data"] for row in results}
+        assert labels[products[0].id] == "P0"
+        assert labels[999] is None
+
+
+@pytest.mark.django_db
+class TestHistoryKeysetPagination:
+
+    # Kurzorové stránkování projde všechny záznamy bez duplicit a bez COUNT(*)
+    def test_cursor_walks_all_rows(self, authenticated_history_client, history_user):
+        History.objects.bulk_create(
+            [History(type="product", related_id=i, description=f"r{i}", user=history_user) for i in range(25)]
+        )
+
+        seen, cursor = [], ""
+        while cursor is not None:
+            response = authenticated_history_client.get("/api/history/product/", {"cursor": cursor, "page_size": 10})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data["count"] is None
+            seen += [row["id"] for row in response.data["results"]]
+            cursor = response.data["cursor"]
+
+        assert len(seen) == len(set(seen)) == 25
+
+        response = authenticated_history_client.get("/api/history/product/", {"cursor": "", "count": "exact"})
+        assert response.data["count"] == 25
+
+    # `no_page=1` vrací streamované JSON pole
+    def test_no_page_streams(self, authenticated_history_client, sample_history_data):
+        import json
+
+        response = authenticated_history_client.get("/api/history/product/?no_page=1")
+        assert response.status_code == status.HTTP_200_OK
+        rows = json.loads(b"".join(response.streaming_content))
+        assert [row["type"] for row in rows] == ["product"]
+
+    # Neplatný kurzor vrací 404
+    def test_invalid_cursor(self, authenticated_history_client):
+        response = authenticated_history_client.get("/api/history/?cursor=%%%")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,49 @@
+from django.db.models.base import DEFERRED
+
+
+class TrackedFieldsMixin:
+    """
+    Mixin pro modely, které zapisují historii změn.
+
+    Při načtení z databáze si instance uloží hodnoty polí z `tracked_fields`, takže
+    `save()` může porovnat starý a nový stav bez dalšího `objects.get(pk=...)`.
+    """
+    # Sledovaná pole (attname, tj. u cizích klíčů např. `box_id`)
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked_snapshot = {
+            name: value
+            for name, value in zip(field_names, values)
+            if name in cls.tracked_fields and value is not DEFERRED
+        }
+        return instance
+
+    def tracked_previous(self):
+        """
+        Vrací hodnoty sledovaných polí tak, jak byly naposledy načteny nebo uloženy.
+        Chybějící pole (odložená nebo instance vytvořená bez načtení) se dotáhnou jedním dotazem.
+
+        :return: Slovník {attname: předchozí hodnota}
+        """
+        snapshot = dict(getattr(self, '_tracked_snapshot', {}))
+        missing = [name for name in self.tracked_fields if name not in snapshot]
+        if missing and self.pk:
+            snapshot.update(type(self)._base_manager.filter(pk=self.pk).values(*missing).get())
+        return snapshot
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        snapshot = getattr(self, '_tracked_snapshot', {})
+        for name in self.tracked_fields:
+            if fields is None or name in fields or name.removesuffix('_id') in fields:
+                snapshot[name] = getattr(self, name)
+        self._tracked_snapshot = snapshot
+
+    def refresh_tracked_snapshot(self):
+        """
+        Po uložení nastaví aktuální hodnoty jako nový výchozí stav pro další porovnání.
+        """
+        self._tracked_snapshot = {name: getattr(self, name) for name in self.tracked_fields}
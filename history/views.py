@@ -7,20 +7,22 @@ from rest_framework import viewsets, status
 
 from history.models import History
 from history.serializers import HistorySerializer
-from django.db.models import Q
-from functools import reduce
-from operator import or_
+from search.services import search_service
 
-from utils.pagination import CustomPageNumberPagination
+from utils.export import EXPORT_CHUNK_SIZE, export_response
+from utils.pagination import KeysetPagination, StreamingListMixin
 
 
-class HistoryViewSet(viewsets.ModelViewSet):
+class HistoryViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet pro práci s historií záznamů v systému.
     Umožňuje základní CRUD operace a také filtrování historie podle typu objektu.
+    Výpisy podporují kurzorové stránkování (`?cursor=`) a streamovaný export (`?no_page=1`).
     """
-    queryset = History.objects.all()
+    queryset = History.objects.select_related("user")
     serializer_class = HistorySerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-id')
 
     @swagger_auto_schema(
         operation_description="Vrací seznam všech záznamů historie.",
@@ -87,23 +89,10 @@ class HistoryViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        query_terms = [term.strip() for term in query.split(",") if term.strip()]
-
-        search_query = reduce(or_, [
-            Q(description__icontains=term) |
-            Q(related_id__icontains=term) |
-            Q(type__icontains=term)
-            for term in query_terms
-        ])
+        search_query = search_service.history_filter(search_service.split_terms(query))
 
         history = History.objects.filter(search_query).select_related("user")
-
-        paginator = CustomPageNumberPagination()
-        paginator.page_size = request.GET.get("page_size", 10)
-        paginated_data = paginator.paginate_queryset(history, request)
-
-        serializer = self.get_serializer(paginated_data, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return self.paginate_or_stream(history)
 
     def _get_paginated_response_by_type(self, request, type_value):
         """
@@ -114,17 +103,39 @@ class HistoryViewSet(viewsets.ModelViewSet):
         :return: Paginovaná odpověď se záznamy historie daného typu
         """
         related_id = request.GET.get("related_id", None)
-        queryset = History.objects.filter(type=type_value)
+        queryset = History.objects.filter(type=type_value).select_related("user")
 
         if related_id is not None:
             queryset = queryset.filter(related_id=related_id)
 
-        paginator = CustomPageNumberPagination()
-        paginator.page_size = request.GET.get("page_size", 10)
-        paginated_data = paginator.paginate_queryset(queryset, request)
+        return self.paginate_or_stream(queryset)
 
-        serializer = self.get_serializer(paginated_data, many=True)
-        return paginator.get_paginated_response(serializer.data)
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter("file_type", openapi.IN_QUERY, description="Formát (csv, xlsx)", type=openapi.TYPE_STRING),
+            openapi.Parameter("type", openapi.IN_QUERY, description="Typ záznamu", type=openapi.TYPE_STRING),
+            openapi.Parameter("related_id", openapi.IN_QUERY, description="ID související entity",
+                              type=openapi.TYPE_STRING),
+        ],
+        operation_description="Export historie jako CSV nebo XLSX – streamovaně.",
+    )
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Export historie (volitelně podle typu a related_id). Záznamy se čtou server-side kurzorem
+        a odesílají průběžně, paměť nezávisí na počtu řádků.
+        """
+        queryset = History.objects.order_by("-timestamp", "-id")
+        if request.GET.get("type"):
+            queryset = queryset.filter(type=request.GET["type"])
+        if request.GET.get("related_id"):
+            queryset = queryset.filter(related_id=request.GET["related_id"])
+
+        rows = queryset.values_list(
+            "timestamp", "type", "related_id", "description", "user__email"
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        header = ("Čas", "Typ", "ID objektu", "Popis", "Uživatel")
+        return export_response(request, "historie", header, rows)
 
     @staticmethod
     def _swagger_history_by_type(description):
@@ -0,0 +1,44 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from client.models import Client
+from imports.services.import_service import CHUNK_SIZE, IMPORTERS, import_file
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Hromadný import produktů, šarží nebo příjemky ze souboru CSV/XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(IMPORTERS), help="Typ importu")
+        parser.add_argument("path", help="Cesta k souboru (.csv nebo .xlsx)")
+        parser.add_argument("--client", type=int, required=True, help="ID klienta")
+        parser.add_argument("--user", help="Email uživatele pro historii")
+        parser.add_argument("--number", help="Číslo příjemky (jen pro import příjemky)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Počet řádků v dávce")
+        parser.add_argument("--report", help="Cesta pro CSV report chyb")
+
+    def handle(self, *args, **options):
+        client = Client.objects.filter(id=options["client"]).first()
+        if client is None:
+            raise CommandError(f"Klient s ID {options['client']} neexistuje.")
+        user = User.objects.filter(email=options["user"]).first() if options.get("user") else None
+
+        extra = {"number": options.get("number")} if options["kind"] == "inbound" else {}
+
+        self.stdout.write(f"📥 Importuji {options['path']}...")
+        with open(options["path"], "rb") as file:
+            report = import_file(options["kind"], file, options["path"], client, user=user,
+                                 chunk_size=options["chunk_size"], **extra)
+
+        if options.get("report") and report.errors:
+            with open(options["report"], "w", newline="", encoding="utf-8") as output:
+                writer = csv.writer(output)
+                writer.writerow(["row", "message"])
+                writer.writerows((error["row"], error["message"]) for error in report.errors)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Hotovo – {report.total_rows} řádků, vytvořeno {report.created_count}, "
+            f"aktualizováno {report.updated_count}, chyb {report.error_count}."
+        ))
@@ -0,0 +1,48 @@
+from django.db import models
+
+
+class ImportJob(models.Model):
+    """
+    Hromadný import ze souboru (CSV/XLSX) zpracovávaný mimo webový požadavek.
+
+    Zdrojový soubor je uložen v databázi (`source`), aby ho mohl zpracovat libovolný
+    worker fronty úloh, a po dokončení se uvolní. Výsledek obsahuje počty a chyby po řádcích.
+    """
+    KIND_CHOICES = [
+        ('products', 'Produkty'),
+        ('batches', 'Šarže'),
+        ('inbound', 'Příjemka'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Čeká'),
+        ('RUNNING', 'Běží'),
+        ('DONE', 'Hotovo'),
+        ('FAILED', 'Chyba'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    client = models.ForeignKey('client.Client', on_delete=models.CASCADE, related_name='import_jobs')
+    user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    source = models.BinaryField(blank=True, default=b'')
+    options = models.JSONField(default=dict, blank=True)  # např. číslo a popis příjemky
+
+    total_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # [{"row": číslo řádku, "message": text}]
+    message = models.TextField(blank=True, default='')  # Chyba, která zastavila celý import
+    operation = models.ForeignKey('operation.Operation', on_delete=models.SET_NULL, null=True, blank=True)
+    job = models.ForeignKey('jobs.Job', on_delete=models.SET_NULL, null=True, blank=True)  # Úloha ve frontě
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.file_name} ({self.status})'
@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+from imports.models import ImportJob
+from imports.services.parser import is_supported
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'status', 'client', 'file_name', 'total_rows', 'created_count', 'updated_count',
+            'error_count', 'errors', 'message', 'operation', 'job', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class ImportUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    kind = serializers.ChoiceField(choices=ImportJob.KIND_CHOICES)
+    clientId = serializers.IntegerField()
+    number = serializers.CharField(required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_file(self, file):
+        if not is_supported(file.name):
+            raise serializers.ValidationError("Podporované formáty jsou CSV a XLSX.")
+        return file
+
+    def validate_clientId(self, client_id):
+        user = self.context['request'].user
+        if not user.client.filter(id=client_id).exists():
+            raise serializers.ValidationError("Klient neexistuje nebo k němu nemáte přístup.")
+        return client_id
@@ -0,0 +1,362 @@
+import io
+import logging
+from datetime import date, datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from batch.models import Batch
+from dashboard.services import metrics_service
+from group.models import Group
+from history.models import History
+from history.services import history_writer
+from imports.models import ImportJob
+from imports.services.parser import iter_chunks, iter_rows
+from jobs.services import job_service
+from operation.models import Operation
+from operation.services import summary_service
+from operation.services.operation_service import bulk_add_groups_to_in_operation
+from product.models import Product
+from search.services import search_service
+
+logger = logging.getLogger(__name__)
+
+# Počet řádků zpracovaných v jedné dávce (jedna sada dotazů a jedna transakce)
+CHUNK_SIZE = 2000
+
+# Kolik chyb se ukládá do reportu (počet se počítá vždy celý)
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    """
+    Průběžný výsledek importu – počty a chyby po řádcích.
+    """
+
+    def __init__(self):
+        self.total_rows = 0
+        self.created_count = 0
+        self.updated_count = 0
+        self.error_count = 0
+        self.errors = []
+        self.operation = None
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "message": message})
+
+
+def _text(row, column):
+    value = row.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def parse_date(value):
+    """
+    Převede hodnotu ze souboru na datum (ISO `2025-01-31`, český `31.01.2025` nebo datum z XLSX).
+
+    :param value: Hodnota buňky
+    :return: date nebo None pro prázdnou hodnotu
+    :raises ValueError: Neplatný formát
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for date_format in ('%Y-%m-%d', '%d.%m.%Y', '%d. %m. %Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Neplatné datum {value}.")
+
+
+def import_products(chunks, client, report, user=None):
+    """
+    Import produktů – upsert podle SKU (`INSERT ... ON CONFLICT (sku) DO UPDATE`).
+
+    Každá dávka se ověří najednou: povinná pole, duplicity v souboru a vlastnictví SKU
+    (jeden dotaz). Popis se přepisuje jen tehdy, když ho soubor obsahuje.
+    """
+    seen = set()
+    for chunk in chunks:
+        rows = []
+        for number, row in chunk:
+            report.total_rows += 1
+            sku, name = _text(row, 'sku'), _text(row, 'name')
+            if not sku:
+                report.error(number, "Chybí SKU.")
+            elif not name:
+                report.error(number, f"Chybí název produktu {sku}.")
+            elif len(sku) > 100 or len(name) > 255:
+                report.error(number, f"Příliš dlouhé SKU nebo název produktu {sku}.")
+            elif sku in seen:
+                report.error(number, f"Duplicitní SKU {sku} v souboru.")
+            else:
+                seen.add(sku)
+                rows.append((number, sku, name, _text(row, 'description')))
+        if not rows:
+            continue
+
+        existing = {
+            sku: (client_id, name, description)
+            for sku, client_id, name, description in Product.objects.filter(
+                sku__in=[sku for _, sku, _, _ in rows]).values_list('sku', 'client_id', 'name', 'description')
+        }
+        owners = {sku: values[0] for sku, values in existing.items()}
+        products = []
+        for number, sku, name, description in rows:
+            if owners.get(sku, client.id) != client.id:
+                report.error(number, f"SKU {sku} patří jinému klientovi.")
+                continue
+            products.append(Product(sku=sku, name=name, description=description, client=client))
+        if not products:
+            continue
+
+        update_fields = ['name', 'description'] if 'description' in chunk[0][1] else ['name']
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products, batch_size=1000, update_conflicts=True, unique_fields=['sku'], update_fields=update_fields,
+            )
+            saved = Product.objects.filter(sku__in=[product.sku for product in products]).values_list(
+                'id', 'sku', 'name', 'description')
+            created = [(product_id, name) for product_id, sku, name, _ in saved if sku not in owners]
+            updated_ids = [product_id for product_id, sku, _, _ in saved if sku in owners]
+
+            history = [
+                History(type='product', related_id=product_id, user=user, description=f"Vytvořen produkt {name}")
+                for product_id, name in created
+            ]
+            renamed_ids = []
+            for product_id, sku, name, description in saved:
+                if sku not in existing:
+                    continue
+                _, previous_name, previous_description = existing[sku]
+                if previous_name != name:
+                    renamed_ids.append(product_id)
+                    history.append(History(type='product', related_id=product_id, user=user,
+                                           description=f"Změněn název produktu z {previous_name} na {name}"))
+                if 'description' in update_fields and previous_description != description:
+                    history.append(History(type='product', related_id=product_id, user=user,
+                                           description=f"Změněn popis produktu {name}"))
+            history_writer.record_many(history)
+
+            search_service.schedule('product', [product_id for product_id, _, _, _ in saved])
+            if updated_ids:
+                # Název produktu je i v dokumentech jeho šarží a skupin
+                search_service.schedule('batch', Batch.objects.filter(product_id__in=updated_ids).values_list('id', flat=True))
+                search_service.schedule('group', Group.objects.filter(
+                    batch__product_id__in=updated_ids).values_list('id', flat=True))
+            if renamed_ids:
+                # ... a v souhrnech operací s jeho skupinami
+                summary_service.refresh_operation_summaries(summary_service.operations_of_products(renamed_ids))
+
+        report.created_count += len(created)
+        report.updated_count += len(updated_ids)
+
+    metrics_service.rebuild_client_metrics([client.id])
+
+
+def import_batches(chunks, client, report, user=None):
+    """
+    Import šarží produktů klienta. Existující šarži (produkt + číslo) se jen aktualizuje expirace.
+    """
+    seen = set()
+    for chunk in chunks:
+        rows = []
+        for number, row in chunk:
+            report.total_rows += 1
+            sku, batch_number = _text(row, 'sku'), _text(row, 'batch_number')
+            if not sku or not batch_number:
+                report.error(number, "Chybí SKU nebo číslo šarže.")
+                continue
+            if (sku, batch_number) in seen:
+                report.error(number, f"Duplicitní šarže {batch_number} produktu {sku} v souboru.")
+                continue
+            try:
+                expiration_date = parse_date(row.get('expiration_date'))
+            except ValueError as e:
+                report.error(number, str(e))
+                continue
+            seen.add((sku, batch_number))
+            rows.append((number, sku, batch_number, expiration_date))
+        if not rows:
+            continue
+
+        products = dict(Product.objects.filter(
+            client=client, sku__in={sku for _, sku, _, _ in rows}).values_list('sku', 'id'))
+        existing = {
+            (batch.product_id, batch.batch_number): batch
+            for batch in Batch.objects.filter(
+                product_id__in=products.values(), batch_number__in={batch_number for _, _, batch_number, _ in rows}
+            ).order_by('-id')
+        }
+
+        new_batches, changed = [], []
+        for number, sku, batch_number, expiration_date in rows:
+            if sku not in products:
+                report.error(number, f"Produkt se SKU {sku} neexistuje.")
+                continue
+            batch = existing.get((products[sku], batch_number))
+            if batch is None:
+                new_batches.append(Batch(product_id=products[sku], batch_number=batch_number,
+                                         expiration_date=expiration_date))
+            elif expiration_date and batch.expiration_date != expiration_date:
+                batch.expiration_date = expiration_date
+                changed.append(batch)
+
+        with transaction.atomic():
+            Batch.objects.bulk_create(new_batches, batch_size=1000)
+            Batch.objects.bulk_update(changed, ['expiration_date'], batch_size=1000)
+            history_writer.record_many(
+                History(type='batch', related_id=batch.id, user=user,
+                        description=f"Vytvořena nová šarže {batch.batch_number}")
+                for batch in new_batches
+            )
+            search_service.schedule_instances([*new_batches, *changed])
+            search_service.schedule('group', Group.objects.filter(batch__in=changed).values_list('id', flat=True))
+
+        report.created_count += len(new_batches)
+        report.updated_count += len(changed)
+
+    metrics_service.refresh_expiring([client.id])
+
+
+def import_inbound(chunks, client, report, user=None, number=None, description=None):
+    """
+    Import příjemky – jedna operace typu IN, řádky se přidávají po dávkách přes
+    `bulk_add_groups_to_in_operation` (šarže, krabice, skupiny i skladová kniha hromadně).
+    """
+    seen = set()
+    for chunk in chunks:
+        rows = []
+        for row_number, row in chunk:
+            report.total_rows += 1
+            sku, batch_number = _text(row, 'sku'), _text(row, 'batch_number')
+            if not sku or not batch_number:
+                report.error(row_number, "Chybí SKU nebo číslo šarže.")
+                continue
+            try:
+                quantity = int(float(_text(row, 'quantity') or 0))
+                expiration_date = parse_date(row.get('expiration_date'))
+            except ValueError:
+                report.error(row_number, f"Neplatné množství nebo datum u šarže {batch_number}.")
+                continue
+            if quantity <= 0:
+                report.error(row_number, f"Neplatné množství {quantity} u šarže {batch_number}.")
+                continue
+            if (sku, batch_number) in seen:
+                report.error(row_number, f"Duplicitní šarže {batch_number} produktu {sku} v souboru.")
+                continue
+            seen.add((sku, batch_number))
+            rows.append((row_number, sku, batch_number, quantity, expiration_date, _text(row, 'box_ean')))
+        if not rows:
+            continue
+
+        products = Product.objects.filter(client=client, sku__in={row[1] for row in rows}).only('id', 'sku').in_bulk(
+            field_name='sku')
+        lines = []
+        for row_number, sku, batch_number, quantity, expiration_date, box_ean in rows:
+            if sku not in products:
+                report.error(row_number, f"Produkt se SKU {sku} neexistuje.")
+                continue
+            lines.append({
+                "product": products[sku],
+                "quantity": quantity,
+                "batch_number": batch_number,
+                "expiration_date": expiration_date,
+                "box_ean": box_ean,
+            })
+        if not lines:
+            continue
+
+        with transaction.atomic():
+            if report.operation is None:
+                report.operation = Operation.objects.create(
+                    type='IN', status='CREATED', user=user, client=client, number=number,
+                    description=description or '',
+                )
+            bulk_add_groups_to_in_operation(report.operation, lines, user=user)
+        report.created_count += len(lines)
+
+
+IMPORTERS = {
+    'products': import_products,
+    'batches': import_batches,
+    'inbound': import_inbound,
+}
+
+
+def _reporting(chunks, report, progress):
+    # Průběh se hlásí před každou další dávkou (celkový počet řádků předem neznáme)
+    for chunk in chunks:
+        progress(None, f"Zpracováno {report.total_rows} řádků, chyb {report.error_count}.")
+        yield chunk
+
+
+def import_file(kind, file, file_name, client, user=None, chunk_size=CHUNK_SIZE, progress=None, **options):
+    """
+    Naimportuje soubor po dávkách.
+
+    :param kind: Typ importu (klíč `IMPORTERS`)
+    :param file: Binární souborový objekt
+    :param file_name: Název souboru (CSV nebo XLSX podle přípony)
+    :param client: Klient, do kterého se importuje
+    :param user: (volitelné) Uživatel pro historii
+    :param chunk_size: Velikost dávky
+    :param progress: (volitelné) Callback `progress(procenta, zpráva)` pro úlohu na pozadí
+    :param options: Další parametry importu (u příjemky `number`, `description`)
+    :return: ImportReport
+    """
+    report = ImportReport()
+    chunks = iter_chunks(iter_rows(file, file_name), chunk_size)
+    if progress:
+        chunks = _reporting(chunks, report, progress)
+    IMPORTERS[kind](chunks, client, report, user=user, **options)
+    # Chyby z kontrol nad celou dávkou se přidávají až po chybách jednotlivých řádků
+    report.errors.sort(key=lambda error: error["row"])
+    return report
+
+
+def run_job(job_id, progress=None):
+    """
+    Zpracuje čekající ImportJob a uloží výsledek. Zdrojový soubor se po dokončení uvolní.
+
+    :param job_id: ID úlohy
+    :param progress: (volitelné) Callback pro hlášení průběhu
+    :return: ImportJob
+    """
+    updated = ImportJob.objects.filter(id=job_id, status='PENDING').update(status='RUNNING', started_at=timezone.now())
+    job = ImportJob.objects.select_related('client', 'user').get(id=job_id)
+    if not updated:
+        return job
+
+    try:
+        report = import_file(job.kind, io.BytesIO(bytes(job.source)), job.file_name, job.client, user=job.user,
+                             progress=progress, **job.options)
+    except Exception as e:
+        logger.exception("Import %s selhal.", job_id)
+        job.status, job.message = 'FAILED', str(e)
+    else:
+        job.status = 'DONE'
+        job.total_rows, job.created_count, job.updated_count = report.total_rows, report.created_count, report.updated_count
+        job.error_count, job.errors, job.operation = report.error_count, report.errors, report.operation
+
+    job.source = b''
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def start_job(job):
+    """
+    Zařadí zpracování importu do fronty úloh (webový worker na import nečeká).
+
+    :param job: Uložený ImportJob
+    """
+    job.job = job_service.enqueue('imports.run', user=job.user, client=job.client, import_job_id=job.id)
+    job.save(update_fields=['job'])
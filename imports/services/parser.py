@@ -0,0 +1,99 @@
+import csv
+import io
+from itertools import islice
+
+import openpyxl
+
+# Alternativní názvy sloupců (mj. hlavičky exportů z utils/export.py)
+COLUMN_ALIASES = {
+    'název': 'name',
+    'produkt': 'name',
+    'popis': 'description',
+    'šarže': 'batch_number',
+    'expirace': 'expiration_date',
+    'množství': 'quantity',
+    'ean': 'box_ean',
+    'ean krabice': 'box_ean',
+}
+
+# Přípony souborů, které parser umí číst (starý binární `.xls` openpyxl nepodporuje)
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xlsm')
+
+
+def is_supported(file_name):
+    """
+    Ověří, že soubor má podporovanou příponu (CSV nebo XLSX).
+
+    :param file_name: Název souboru
+    :return: True, pokud parser soubor umí číst
+    """
+    return file_name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def normalize_column(name):
+    """
+    Sjednotí název sloupce (malá písmena, bez mezer okolo, aliasy).
+    """
+    name = str(name or '').strip().lower()
+    return COLUMN_ALIASES.get(name, name)
+
+
+def iter_rows(file, file_name, normalize=True):
+    """
+    Čte soubor po řádcích – CSV přes `csv.reader`, XLSX přes openpyxl v režimu read-only.
+    Celý soubor se nikdy nenačítá do paměti jako tabulka.
+
+    :param file: Binární souborový objekt (převíjecí, kvůli XLSX)
+    :param file_name: Název souboru (podle přípony se volí formát)
+    :param normalize: (volitelné) Sjednotit názvy sloupců (`normalize_column`), jinak zůstanou hlavičky souboru
+    :return: Generátor dvojic (číslo řádku v souboru, slovník {sloupec: hodnota})
+    :raises ValueError: Nepodporovaný formát souboru
+    """
+    if not is_supported(file_name):
+        raise ValueError("Podporované formáty jsou CSV a XLSX.")
+    column = normalize_column if normalize else _raw_column
+    if file_name.lower().endswith(('.xlsx', '.xlsm')):
+        yield from _xlsx_rows(file, column)
+    else:
+        yield from _csv_rows(file, column)
+
+
+def _raw_column(name):
+    return '' if name is None else str(name)
+
+
+def _csv_rows(file, column):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    first_line = text.readline()
+    # Český Excel ukládá CSV se středníkem
+    delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+    header = [column(name) for name in next(csv.reader([first_line], delimiter=delimiter), [])]
+
+    for number, values in enumerate(csv.reader(text, delimiter=delimiter), start=2):
+        if any(value.strip() for value in values):
+            yield number, dict(zip(header, values))
+
+
+def _xlsx_rows(file, column):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [column(name) for name in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_chunks(rows, size):
+    """
+    Rozdělí řádky do dávek.
+
+    :param rows: Iterovatelné řádky
+    :param size: Velikost dávky
+    :return: Generátor seznamů řádků
+    """
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
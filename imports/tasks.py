@@ -0,0 +1,21 @@
+# imports/tasks.py
+from imports.services import import_service
+from jobs.registry import task
+
+
+@task('imports.run', max_attempts=1)
+def run_import(job, import_job_id):
+    """
+    Zpracuje nahraný import. Bez opakování – dávky se commitují průběžně, druhý běh by
+    importoval znovu už uložené řádky.
+    """
+    import_job = import_service.run_job(import_job_id, progress=job.report_progress)
+    if import_job.status == 'FAILED':
+        raise RuntimeError(import_job.message)
+    return {
+        "importJobId": import_job.id,
+        "totalRows": import_job.total_rows,
+        "created": import_job.created_count,
+        "updated": import_job.updated_count,
+        "errors": import_job.error_count,
+    }
@@ -0,0 +1,97 @@
+import io
+
+import openpyxl
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from history.models import History
+from imports.models import ImportJob
+from imports.services import import_service
+from jobs.services import job_service
+from operation.models import Operation
+from operation.services.operation_service import add_group_to_in_operation
+from product.models import Product
+from user.models import User
+
+
+# Fixture pro klienta s uživatelem a jedním existujícím produktem
+@pytest.fixture
+def import_client(client_factory):
+    client = client_factory(name="Import")
+    Product.objects.create(name="Starý název", sku="IMP-1", description="Popis", client=client)
+    return client
+
+
+@pytest.mark.django_db
+class TestImports:
+
+    # Upsert podle SKU, chyby po řádcích (cizí SKU, duplicita, chybějící název)
+    def test_import_products_command(self, import_client, client_factory, tmp_path, django_capture_on_commit_callbacks):
+        Product.objects.create(name="Cizí", sku="FOREIGN-1", client=client_factory(name="Jiný"))
+        inbound = Operation.objects.create(number="IMP-OP", type="IN", client=import_client)
+        add_group_to_in_operation(inbound, Product.objects.get(sku="IMP-1").id, "IMP-B", None, 2)
+        path = tmp_path / "produkty.csv"
+        path.write_text(
+            "SKU;Název\nIMP-1;Nový název\nIMP-2;Druhý\nIMP-2;Znovu\nFOREIGN-1;Převzetí\nIMP-3;\n",
+            encoding="utf-8",
+        )
+        report = tmp_path / "chyby.csv"
+
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command("import_data", "products", str(path), client=import_client.id, report=str(report))
+
+        product = Product.objects.get(sku="IMP-1")
+        assert product.name == "Nový název"
+        # Přejmenování se promítne do souhrnu operace a do historie
+        inbound.refresh_from_db()
+        assert inbound.groups_name == "2 x Nový název"
+        assert History.objects.filter(type="product", related_id=product.id,
+                                      description="Změněn název produktu z Starý název na Nový název").exists()
+        assert product.description == "Popis"
+        assert Product.objects.filter(sku="IMP-2", client=import_client).exists()
+        assert Product.objects.get(sku="FOREIGN-1").name == "Cizí"
+        assert [line.split(",")[0] for line in report.read_text(encoding="utf-8").splitlines()[1:]] == ["4", "5", "6"]
+
+    # Úloha importu příjemky z XLSX založí operaci a naskladní zboží
+    def test_inbound_job_from_xlsx(self, import_client):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["SKU", "Šarže", "Expirace", "Množství", "EAN krabice"])
+        sheet.append(["IMP-1", "B1", "31.12.2030", 5, "BOX-1"])
+        sheet.append(["IMP-1", "B2", None, 0, "BOX-2"])
+        sheet.append(["NEZNÁMÉ", "B3", None, 1, "BOX-3"])
+        content = io.BytesIO()
+        workbook.save(content)
+
+        job = ImportJob.objects.create(kind="inbound", client=import_client, file_name="prijem.xlsx",
+                                       source=content.getvalue(), options={"number": "IMP-IN-1"})
+        job = import_service.run_job(job.id)
+
+        assert job.status == "DONE"
+        assert (job.total_rows, job.created_count, job.error_count) == (3, 1, 2)
+        assert job.operation.number == "IMP-IN-1"
+        assert job.source == b""
+        assert Product.objects.get(sku="IMP-1").amount == 5
+
+    # Endpoint jen založí úlohu a hned vrátí její ID
+    def test_upload_returns_job(self, api_client, import_client):
+        user = User.objects.create(email="import@example.com", password="pass")
+        user.client.add(import_client)
+        api_client.force_authenticate(user=user)
+
+        upload = SimpleUploadedFile("produkty.csv", "sku,name\nIMP-9,Nahraný\n".encode(), content_type="text/csv")
+        response = api_client.post("/api/imports/", {"file": upload, "kind": "products", "clientId": import_client.id},
+                                   format="multipart")
+
+        assert response.status_code == 202
+        import_job = ImportJob.objects.get(id=response.data["id"])
+        assert import_job.status == "PENDING"
+        assert import_job.job.name == "imports.run"
+
+        job_service.run_pending()
+
+        import_job.refresh_from_db()
+        assert import_job.status == "DONE"
+        assert import_job.job.result["created"] == 1
+        assert Product.objects.filter(sku="IMP-9", client=import_client).exists()
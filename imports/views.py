@@ -0,0 +1,54 @@
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import mixins, status, viewsets
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from imports.models import ImportJob
+from imports.serializers import ImportJobSerializer, ImportUploadSerializer
+from imports.services import import_service
+from utils.pagination import CustomPageNumberPagination
+
+
+class ImportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ImportJobViewSet – hromadné importy produktů, šarží a příjemek ze souborů CSV/XLSX.
+
+    - `POST /imports/` nahraje soubor, založí úlohu a hned vrátí její ID (202); import běží na pozadí
+    - `GET /imports/` a `GET /imports/{id}/` vrací stav, počty a chyby po řádcích
+
+    Uživatel vidí jen importy svých klientů.
+    """
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    pagination_class = CustomPageNumberPagination
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(client__in=self.request.user.client.all()).defer('source')
+
+    @swagger_auto_schema(
+        operation_description="Nahraje soubor (CSV/XLSX) a založí úlohu importu. Vrací ID úlohy, import běží na pozadí.",
+        request_body=ImportUploadSerializer,
+        responses={202: ImportJobSerializer()}
+    )
+    def create(self, request, *args, **kwargs):
+        upload = ImportUploadSerializer(data=request.data, context={'request': request})
+        upload.is_valid(raise_exception=True)
+        data = upload.validated_data
+
+        options = {}
+        if data['kind'] == 'inbound':
+            options = {'number': data.get('number') or None, 'description': data.get('description', '')}
+
+        job = ImportJob.objects.create(
+            kind=data['kind'],
+            client_id=data['clientId'],
+            user=request.user,
+            file_name=data['file'].name,
+            source=data['file'].read(),
+            options=options,
+        )
+        import_service.start_job(job)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,44 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.services import job_service
+
+
+class Command(BaseCommand):
+    help = "Worker fronty úloh na pozadí (lze spustit ve více instancích)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--burst", action="store_true", help="Zpracuje frontu a skončí")
+        parser.add_argument("--sleep", type=float, default=1.0, help="Pauza v sekundách, když je fronta prázdná")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = job_service.worker_name()
+        self.stdout.write(f"⚙️ Worker {worker} spuštěn.")
+
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            job = job_service.claim(worker)
+            if job is None:
+                if options["burst"]:
+                    break
+                job_service.requeue_stale()
+                time.sleep(options["sleep"])
+                continue
+
+            job = job_service.execute(job)
+            processed += 1
+            self.stdout.write(f"{job.name} #{job.pk}: {job.status}")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Worker skončil – zpracováno {processed} úloh."))
+
+    def stop(self, signum, frame):
+        # Rozpracovaná úloha se dokončí, další se už nebere
+        self.stopping = True
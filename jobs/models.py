@@ -0,0 +1,62 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Úloha na pozadí zpracovávaná workerem (`manage.py run_jobs`).
+
+    Tabulka slouží jako fronta – worker si úlohu zamkne přes `SELECT ... FOR UPDATE SKIP LOCKED`,
+    takže může běžet víc workerů vedle sebe. Výsledek (JSON) a průběh zůstávají uložené,
+    webový požadavek tak jen vrátí ID úlohy a klient se na stav doptává.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Čeká'),
+        ('RUNNING', 'Běží'),
+        ('DONE', 'Hotovo'),
+        ('FAILED', 'Chyba'),
+    ]
+
+    name = models.CharField(max_length=100)  # Registrovaný název úlohy (viz `jobs.registry`)
+    payload = models.JSONField(default=dict, blank=True)  # Parametry úlohy
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    client = models.ForeignKey('client.Client', on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+
+    progress = models.PositiveSmallIntegerField(null=True, blank=True)  # Procenta, pokud je úloha zná
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)  # Nejdřívější čas spuštění (odklad při opakování)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    def report_progress(self, progress=None, message=''):
+        """
+        Uloží průběh úlohy (a obnoví heartbeat, aby ji jiný worker nepovažoval za ztracenou).
+
+        :param progress: (volitelné) Procenta 0–100
+        :param message: (volitelné) Popis aktuálního kroku
+        """
+        self.progress = None if progress is None else max(0, min(100, int(progress)))
+        self.progress_message = message[:255]
+        self.heartbeat_at = timezone.now()
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress, progress_message=self.progress_message, heartbeat_at=self.heartbeat_at,
+        )
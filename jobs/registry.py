@@ -0,0 +1,18 @@
+# Registr úloh na pozadí – název úlohy -> (funkce, výchozí počet pokusů)
+TASKS = {}
+
+
+def task(name, max_attempts=3):
+    """
+    Dekorátor, který zaregistruje funkci jako úlohu na pozadí.
+
+    Funkce dostane instanci `Job` a parametry z `payload` jako keyword argumenty.
+    Vrácená hodnota (JSON) se uloží do `Job.result`.
+
+    :param name: Název úlohy (např. `stock.recalculate_amounts`)
+    :param max_attempts: Kolikrát se úloha po chybě zkusí spustit
+    """
+    def decorator(function):
+        TASKS[name] = (function, max_attempts)
+        return function
+    return decorator
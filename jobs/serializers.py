@@ -0,0 +1,13 @@
+from rest_framework import serializers
+
+from jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'status', 'client', 'progress', 'progress_message', 'result', 'error',
+            'attempts', 'max_attempts', 'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,149 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import TASKS
+
+logger = logging.getLogger(__name__)
+
+# Základ odkladu před dalším pokusem (1., 2., 3. opakování = 30 s, 60 s, 120 s)
+RETRY_DELAY = timedelta(seconds=30)
+
+# Po jaké době bez heartbeatu se běžící úloha považuje za ztracenou (spadlý worker)
+STALE_AFTER = timedelta(minutes=10)
+
+
+def worker_name():
+    """
+    Identifikace workeru uložená u zamčené úlohy (host:pid).
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(name, user=None, client=None, unique=False, max_attempts=None, **payload):
+    """
+    Zařadí úlohu do fronty. Worker ji zpracuje po commitu aktuální transakce.
+
+    :param name: Název registrované úlohy
+    :param user: (volitelné) Uživatel, který úlohu spustil (vidí její stav)
+    :param client: (volitelné) Klient, ke kterému úloha patří
+    :param unique: Pokud už stejná úloha (název, uživatel, klient, parametry) čeká nebo běží, vrátí se ta
+    :param max_attempts: (volitelné) Přepíše výchozí počet pokusů úlohy
+    :param payload: Parametry úlohy (musí jít převést do JSON)
+    :return: Job
+    """
+    if name not in TASKS:
+        raise ValueError(f"Neznámá úloha {name}.")
+
+    if unique:
+        existing = Job.objects.filter(
+            name=name, user=user, client=client, payload=payload, status__in=['PENDING', 'RUNNING']
+        ).order_by('id').first()
+        if existing:
+            return existing
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        user=user,
+        client=client,
+        max_attempts=max_attempts or TASKS[name][1],
+    )
+
+
+def claim(worker=None):
+    """
+    Zamkne a převezme nejstarší připravenou úlohu. Souběžní workeři zamčené řádky přeskočí
+    (`SKIP LOCKED`), takže si stejnou úlohu nikdy nevezmou dva.
+
+    :param worker: (volitelné) Identifikace workeru
+    :return: Job nebo None, pokud je fronta prázdná
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', run_at__lte=now)
+            .order_by('run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'RUNNING'
+        job.attempts += 1
+        job.locked_by = worker or worker_name()
+        job.started_at = job.heartbeat_at = now
+        job.save(update_fields=['status', 'attempts', 'locked_by', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def execute(job):
+    """
+    Spustí převzatou úlohu a uloží výsledek. Po chybě se úloha vrátí do fronty s odkladem,
+    dokud nevyčerpá pokusy; pak skončí jako FAILED.
+
+    :param job: Job ve stavu RUNNING (z `claim`)
+    :return: Job
+    """
+    entry = TASKS.get(job.name)
+    try:
+        if entry is None:
+            raise LookupError(f"Neznámá úloha {job.name}.")
+        result = entry[0](job, **job.payload)
+    except Exception as e:
+        logger.exception("Úloha %s #%s selhala (pokus %s/%s).", job.name, job.pk, job.attempts, job.max_attempts)
+        job.error = f'{type(e).__name__}: {e}'
+        if entry is not None and job.attempts < job.max_attempts:
+            job.status = 'PENDING'
+            job.run_at = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = 'FAILED'
+            job.finished_at = timezone.now()
+    else:
+        job.status, job.result, job.error = 'DONE', result, ''
+        job.progress = 100
+        job.finished_at = timezone.now()
+
+    job.locked_by = ''
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'run_at', 'locked_by', 'finished_at'])
+    return job
+
+
+def requeue_stale(now=None):
+    """
+    Vrátí do fronty úlohy, jejichž worker přestal posílat heartbeat (spadl nebo byl ukončen).
+    Úlohy bez zbývajících pokusů označí jako FAILED.
+
+    :return: Počet obnovených úloh
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='RUNNING', heartbeat_at__lt=now - STALE_AFTER)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='FAILED', error='Worker přestal odpovídat.', locked_by='', finished_at=now,
+    )
+    return stale.update(status='PENDING', locked_by='', run_at=now)
+
+
+def run_pending(worker=None, limit=None):
+    """
+    Zpracuje připravené úlohy, dokud fronta není prázdná (nebo do limitu).
+
+    :param worker: (volitelné) Identifikace workeru
+    :param limit: (volitelné) Maximální počet úloh
+    :return: Počet zpracovaných úloh
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        execute(job)
+        processed += 1
+    return processed
@@ -0,0 +1,66 @@
+import pytest
+
+from jobs.models import Job
+from jobs.registry import task
+from jobs.services import job_service
+
+calls = []
+
+
+@task('tests.add', max_attempts=1)
+def add_task(job, a, b):
+    job.report_progress(50, "Sčítám.")
+    calls.append((a, b))
+    return {"sum": a + b}
+
+
+@task('tests.flaky', max_attempts=2)
+def flaky_task(job):
+    raise RuntimeError("Služba nedostupná")
+
+
+@pytest.mark.django_db
+class TestJobs:
+
+    # Úloha se zpracuje workerem a výsledek se uloží; stejná čekající úloha se nezakládá znovu
+    def test_enqueue_and_run(self):
+        calls.clear()
+        job = job_service.enqueue('tests.add', unique=True, a=1, b=2)
+        assert job_service.enqueue('tests.add', unique=True, a=1, b=2).id == job.id
+        assert job_service.enqueue('tests.add', unique=True, a=2, b=2).id != job.id
+
+        assert job_service.run_pending() == 2
+
+        job.refresh_from_db()
+        assert job.status == 'DONE'
+        assert job.result == {"sum": 3}
+        assert (job.progress, job.progress_message, job.attempts) == (100, "Sčítám.", 1)
+        assert sorted(calls) == [(1, 2), (2, 2)]
+
+    # Chyba vrátí úlohu do fronty s odkladem, po vyčerpání pokusů skončí jako FAILED
+    def test_retry_then_fail(self):
+        job = job_service.enqueue('tests.flaky')
+
+        job_service.run_pending()
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == ('PENDING', 1)
+        assert "Služba nedostupná" in job.error
+        assert job_service.claim() is None  # odklad ještě neuplynul
+
+        Job.objects.filter(id=job.id).update(run_at=job.created_at)
+        job_service.run_pending()
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == ('FAILED', 2)
+        assert job.finished_at is not None
+
+    # Úloha spadlého workeru (bez heartbeatu) se vrátí do fronty
+    def test_requeue_stale(self):
+        job = job_service.enqueue('tests.add', a=1, b=1)
+        job.max_attempts = 2
+        job.save()
+        claimed = job_service.claim('spadly-worker')
+        assert claimed.id == job.id
+
+        assert job_service.requeue_stale(now=claimed.heartbeat_at + job_service.STALE_AFTER * 2) == 1
+        job.refresh_from_db()
+        assert (job.status, job.locked_by) == ('PENDING', '')
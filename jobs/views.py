@@ -0,0 +1,22 @@
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from jobs.models import Job
+from jobs.serializers import JobSerializer
+from utils.pagination import CustomPageNumberPagination
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    JobViewSet – stav a výsledky úloh na pozadí.
+
+    Endpointy, které spouští dlouhou práci (statistiky, importy, přepočty), vrací jen ID úlohy;
+    klient se pak doptává na `GET /jobs/{id}/` (stav, průběh, výsledek). Uživatel vidí jen své úlohy.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    pagination_class = CustomPageNumberPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:36
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    """
+    Naplní souhrnné sloupce existujících operací z jejich skupin.
+    """
+    Operation = apps.get_model('operation', 'Operation')
+    through = Operation.groups.through
+
+    groups = defaultdict(list)
+    rows = through.objects.order_by('operation_id', 'group_id').values_list(
+        'operation_id', 'group_id', 'group__quantity', 'group__batch__product__name', 'group__batch__product__sku'
+    )
+    for operation_id, group_id, quantity, product_name, sku in rows.iterator():
+        groups[operation_id].append((group_id, quantity, product_name, sku))
+
+    summaries = [
+        Operation(
+            id=operation_id,
+            groups_name=",".join(f"{quantity} x {name}" for _, quantity, name, _ in items),
+            groups_search=",".join(str(group_id) for group_id, _, _, _ in items),
+            product_search=",".join(str(sku) for _, _, _, sku in items),
+            groups_amount=len(items),
+            product_amount=sum(quantity for _, quantity, _, _ in items),
+        )
+        for operation_id, items in groups.items()
+    ]
+    Operation.objects.bulk_update(
+        summaries,
+        ['groups_name', 'groups_search', 'product_search', 'groups_amount', 'product_amount'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0009_remove_operation_shipping_extern_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='operation',
+            name='groups_amount',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='groups_name',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='groups_search',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='product_amount',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='operation',
+            name='product_search',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operation', '0010_operation_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='operation',
+            name='type',
+            field=models.CharField(choices=[('IN', 'Příjem'), ('OUT', 'Výdej')], max_length=10),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.db import models
 
-from history.models import History
+from history.services import history_writer
+from history.tracking import TrackedFieldsMixin
 
 
-class Operation(models.Model):
+class Operation(TrackedFieldsMixin, models.Model):
     VALID_TRANSITIONS = {
         'CREATED': ['BOX', 'CANCELLED'],
         'BOX': ['COMPLETED', 'CANCELLED'],
@@ -11,6 +12,12 @@ class Operation(models.Model):
         'CANCELLED': []
     }
 
+    # Pole, jejichž změny se zapisují do historie
+    tracked_fields = ('status', 'number', 'description', 'delivery_date', 'delivery_name', 'invoice_name')
+
+    # Souhrnné sloupce – běžné uložení operace je nepřepisuje
+    SUMMARY_FIELDS = ('groups_name', 'groups_search', 'product_search', 'groups_amount', 'product_amount')
+
     OPERATION_TYPE_CHOICES = [
         ('IN', 'Příjem'),
         ('OUT', 'Výdej'),
@@ -148,6 +155,13 @@ class Operation(models.Model):
 
     groups = models.ManyToManyField('group.Group', related_name='operations')
 
+    # Souhrn skupin pro výpisy operací (udržuje operation.services.summary_service)
+    groups_name = models.TextField(blank=True, default='')
+    groups_search = models.TextField(blank=True, default='')
+    product_search = models.TextField(blank=True, default='')
+    groups_amount = models.PositiveIntegerField(default=0)
+    product_amount = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return str(self.number)
 
@@ -155,33 +169,43 @@ class Operation(models.Model):
         """Sledování všech změn v operaci."""
         is_new = not self.pk
         user = kwargs.pop('user', None)  # Uživatele předáme jako parametr
+        self._previous_status = None
 
         if not is_new:
-            previous = Operation.objects.get(pk=self.pk)
+            previous = self.tracked_previous()
+            self._previous_status = previous['status']  # pro metriky dashboardu (dashboard.signals)
             changes = []
 
-            if previous.status != self.status and self.status not in self.VALID_TRANSITIONS[previous.status]:
-                raise ValueError(f"Neplatný přechod stavu z {previous.status} na {self.status}")
+            if previous['status'] != self.status and self.status not in self.VALID_TRANSITIONS[previous['status']]:
+                raise ValueError(f"Neplatný přechod stavu z {previous['status']} na {self.status}")
 
 
-            for field in ['status', 'number', 'description', 'delivery_date', 'delivery_name', 'invoice_name']:
-                old_value = getattr(previous, field)
+            for field in self.tracked_fields:
+                old_value = previous[field]
                 new_value = getattr(self, field)
                 if old_value != new_value:
                     changes.append(f"{field} změněno z '{old_value}' na '{new_value}'")
 
             if changes:
-                History.objects.create(
+                history_writer.record(
                     type="operation",
                     related_id=self.id,
                     user=user,
                     description="; ".join(changes)
                 )
 
+            # Souhrn skupin patří summary_service – běžné uložení ho nepřepisuje
+            if not kwargs.get('update_fields'):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.SUMMARY_FIELDS
+                ]
+
         super().save(*args, **kwargs)
+        self.refresh_tracked_snapshot()
 
         if is_new:
-            History.objects.create(
+            history_writer.record(
                 type="operation",
                 related_id=self.id,
                 user=user,
@@ -190,10 +214,10 @@ class Operation(models.Model):
 
     def delete(self, *args, **kwargs):
         user = kwargs.pop('user', None)  # Uživatele předáme jako parametr
-        History.objects.create(
+        history_writer.record(
             type="operation",
             related_id=self.id,
             user=user,
             description=f"Odstraněna operace {self.number}"
         )
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        super().delete(*args, **kwargs)
@@ -145,7 +145,7 @@ class OperationSerializer(GroupStatsMixin, serializers.ModelSerializer):
         return extract_invoice_data(obj.__dict__)
 
 
-class OperationListSerializer(GroupStatsMixin, serializers.ModelSerializer):
+class OperationListSerializer(serializers.ModelSerializer):
     """
     Zkrácený serializer pro výpis operací (např. v seznamu).
 
@@ -153,14 +153,10 @@ class OperationListSerializer(GroupStatsMixin, serializers.ModelSerializer):
         - počet grup
         - počet produktů
         - ID grup, číslo, typ, stav, čas aktualizace
+
+    Souhrny skupin se čtou z denormalizovaných sloupců operace, výpis tedy nesahá na tabulku skupin.
     """
-    groups_amount = serializers.SerializerMethodField()
-    product_amount = serializers.SerializerMethodField()
-    groups_id = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all(), source="groups", many=True,
-                                                   required=False)
-    groups_search = serializers.SerializerMethodField()
-    product_search = serializers.SerializerMethodField()
-    groups_name = serializers.SerializerMethodField()
+    groups_id = serializers.SerializerMethodField()
 
     class Meta:
         model = Operation
@@ -170,6 +166,9 @@ class OperationListSerializer(GroupStatsMixin, serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    def get_groups_id(self, obj):
+        return [int(group_id) for group_id in obj.groups_search.split(",") if group_id]
+
 
 class BaseOperationCreateSerializer(serializers.Serializer):
     """
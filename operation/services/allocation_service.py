@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from group.models import Group
+from history.models import History
+from history.services import history_writer
+from operation.models import Operation
+from operation.services import summary_service
+from product.models import Product
+from search.services import search_service
+from stock.services.ledger_service import build_movement, operation_sign, record_movements
+
+# Pořadí vychystávání podle strategie
+ALLOCATION_STRATEGIES = {
+    # First Expired, First Out – nejdřív expirující šarže, bez expirace až nakonec
+    'FEFO': (F('batch__expiration_date').asc(nulls_last=True), 'created_at', 'id'),
+    # First In, First Out – nejstarší skupiny
+    'FIFO': ('created_at', 'id'),
+    # Last In, First Out – nejnovější skupiny
+    'LIFO': ('-created_at', '-id'),
+}
+
+DEFAULT_STRATEGY = getattr(settings, 'STOCK_ALLOCATION_STRATEGY', 'FEFO')
+
+# Horní mez počtu skupin, které se při jedné alokaci projdou (a zamknou)
+DEFAULT_MAX_ROWS = getattr(settings, 'STOCK_ALLOCATION_MAX_ROWS', 1000)
+
+
+def available_groups(product_id, batch_number=None, expiration_date=None):
+    """
+    Vrací queryset skupin produktu, které ještě nejsou součástí žádné výdejky.
+
+    :param product_id: ID produktu
+    :param batch_number: (volitelné) číslo šarže
+    :param expiration_date: (volitelné) datum expirace
+    :return: Queryset skupin
+    """
+    groups = Group.objects.filter(batch__product_id=product_id).exclude(operations__type='OUT')
+
+    if batch_number:
+        groups = groups.filter(batch__batch_number=batch_number)
+    if expiration_date:
+        groups = groups.filter(batch__expiration_date=expiration_date)
+
+    return groups
+
+
+def allocate(product_id, quantity, batch_number=None, expiration_date=None, strategy=None, max_rows=None,
+             exclude_ids=None):
+    """
+    Sestaví alokační plán – vybere skupiny jedním seřazeným a zamčeným dotazem
+    (`SELECT ... FOR UPDATE SKIP LOCKED`, při nedostatku ještě jednou s čekáním na zámky).
+    Musí běžet uvnitř transakce.
+
+    :param product_id: ID produktu
+    :param quantity: Požadované množství
+    :param batch_number: (volitelné) Šarže
+    :param expiration_date: (volitelné) Expirace
+    :param strategy: Strategie vychystávání (FEFO, FIFO, LIFO)
+    :param max_rows: Maximální počet prohledaných skupin
+    :param exclude_ids: (volitelné) ID skupin už zařazených do jiného řádku plánu
+    :return: Seznam řádků plánu `{"group": Group, "quantity": int}`
+    :raises ValueError: Neznámá strategie nebo nedostatek zásob
+    """
+    strategy = (strategy or DEFAULT_STRATEGY).upper()
+    if strategy not in ALLOCATION_STRATEGIES:
+        raise ValueError(f"Neznámá strategie vychystávání {strategy}. Použijte {', '.join(ALLOCATION_STRATEGIES)}.")
+
+    quantity = int(quantity)
+    max_rows = max_rows or DEFAULT_MAX_ROWS
+
+    # Ověření existence produktu (vyhodí Product.DoesNotExist)
+    Product.objects.only('id').get(id=product_id)
+
+    groups = available_groups(product_id, batch_number, expiration_date)
+    if exclude_ids:
+        groups = groups.exclude(id__in=exclude_ids)
+
+    groups = groups.select_related('batch').order_by(*ALLOCATION_STRATEGIES[strategy])
+
+    # Skupiny zamčené souběžným požadavkem se napoprvé přeskočí; pokud zbytek nestačí (zámky drží
+    # např. slučování skupin), výběr se zopakuje s čekáním na zámky
+    for skip_locked in (True, False):
+        plan = []
+        allocated = 0
+        scanned = 0
+        for group in groups.select_for_update(skip_locked=skip_locked, of=('self',))[:max_rows]:
+            scanned += 1
+            take = min(group.quantity, quantity - allocated)
+            plan.append({"group": group, "quantity": take})
+            allocated += take
+            if allocated == quantity:
+                break
+        if allocated == quantity:
+            break
+
+    if not scanned:
+        raise ValueError(f"Nenalezena žádná dostupná groupa pro produkt {product_id} se šarží {batch_number}.")
+
+    if allocated < quantity:
+        if scanned >= max_rows:
+            raise ValueError(
+                f"Alokace produktu {product_id} překročila limit {max_rows} skupin. Požadováno {quantity}, "
+                f"nalezeno {allocated}.")
+        raise ValueError(
+            f"Nedostatečné zásoby pro produkt {product_id}. Požadováno {quantity}, dostupné {allocated}.")
+
+    return plan
+
+
+def apply_allocation_plan(operation, plan, user=None):
+    """
+    Hromadně zapíše alokační plán do výdejky.
+
+    Skupiny, ze kterých se bere jen část, se rozdělí – zbytek se přesune do nové skupiny,
+    která zůstane ve všech operacích původní skupiny. Vazby, pohyby skladové knihy
+    i záznamy historie se zapisují hromadně (jeden INSERT na tabulku).
+
+    :param operation: Výdejka
+    :param plan: Alokační plán z `allocate`
+    :param user: (volitelné) Uživatel pro historii
+    :return: Seznam skupin přidaných do výdejky
+    """
+    if not plan:
+        return []
+
+    through = Operation.groups.through
+    splits = [line for line in plan if line["quantity"] < line["group"].quantity]
+
+    with transaction.atomic():
+        movements = []
+        history = []
+
+        if splits:
+            split_ids = [line["group"].id for line in splits]
+            memberships = {}
+            for group_id, operation_id, operation_type in through.objects.filter(
+                    group_id__in=split_ids).values_list('group_id', 'operation_id', 'operation__type'):
+                memberships.setdefault(group_id, []).append((operation_id, operation_type))
+
+            remainders = Group.objects.bulk_create([
+                Group(
+                    batch_id=line["group"].batch_id,
+                    box_id=line["group"].box_id,
+                    quantity=line["group"].quantity - line["quantity"],
+                    rescanned=line["group"].rescanned,
+                )
+                for line in splits
+            ])
+
+            new_links = []
+            for line, remainder in zip(splits, remainders):
+                group = line["group"]
+                remainder.batch = group.batch
+                history.append(History(type="group", related_id=group.id, user=user,
+                                       description=f"Změněno množství z {group.quantity} na {line['quantity']}"))
+                history.append(History(type="group", related_id=remainder.id, user=user,
+                                       description=f"Vytvořena nová skupina s množstvím {remainder.quantity}"))
+
+                for operation_id, operation_type in memberships.get(group.id, []):
+                    new_links.append(through(operation_id=operation_id, group_id=remainder.id))
+                    # Zbytek přechází z původní skupiny do nové – čítače se nemění
+                    sign = operation_sign(operation_type)
+                    movements.append(build_movement(group, operation_id, -sign * remainder.quantity))
+                    movements.append(build_movement(remainder, operation_id, sign * remainder.quantity))
+
+                group.quantity = line["quantity"]
+
+            through.objects.bulk_create(new_links, batch_size=1000)
+            Group.objects.bulk_update([line["group"] for line in splits], ['quantity'], batch_size=1000)
+            search_service.schedule_instances(remainders)
+
+        selected_groups = [line["group"] for line in plan]
+        through.objects.bulk_create(
+            [through(operation_id=operation.id, group_id=group.id) for group in selected_groups],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        sign = operation_sign(operation.type)
+        movements.extend(build_movement(group, operation.id, sign * group.quantity) for group in selected_groups)
+
+        record_movements(movements)
+        history_writer.record_many(history)
+
+        # Vazby zapsané hromadně neodesílají m2m_changed – souhrny přepočítáme sami
+        affected = {operation.id}
+        if splits:
+            affected.update(operation_id for links in memberships.values() for operation_id, _ in links)
+        summary_service.refresh_operation_summaries(affected)
+
+    return selected_groups
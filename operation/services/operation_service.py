@@ -1,8 +1,7 @@
 from datetime import datetime
 
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Sum
 from django.shortcuts import get_object_or_404
 
 from batch.models import Batch
@@ -10,7 +9,13 @@ from box.models import Box
 from client.models import Client
 from group.models import Group
 from operation.models import Operation
+from operation.services import allocation_service, reversal_service, summary_service
+from packing.services import packing_service
+from history.models import History
+from history.services import history_writer
 from product.models import Product
+from search.services import search_service
+from stock.services.ledger_service import build_movement, operation_sign, record_movements
 
 
 def create_operation(user, operation_type, number, description, client_id, products, delivery_data=None, invoice_data=None):
@@ -36,6 +41,9 @@ def create_operation(user, operation_type, number, description, client_id, produ
         except ObjectDoesNotExist:
             raise ValueError(f"Klient s ID {client_id} neexistuje.")
 
+        # ✅ Všechny řádky ověříme předem – produkty jedním dotazem
+        lines = _resolve_product_lines(products)
+
         with transaction.atomic():
             operation = Operation.objects.create(
                 type=operation_type,
@@ -46,36 +54,10 @@ def create_operation(user, operation_type, number, description, client_id, produ
                 client=client
             )
 
-            for product_data in products:
-                try:
-                    product = product_data["product_id"]
-                    quantity = product_data["quantity"]
-                    batch_number = product_data.get("batch_name")
-                    expiration_date = product_data.get("expiration_date")
-                    box_ean = product_data.get("box_name")
-
-                    if operation_type == "IN":
-                        box = create_new_box(box_ean)
-                        add_group_to_in_operation(
-                            operation=operation,
-                            product_id=product.id,
-                            batch_number=batch_number or '',
-                            box_id=box.id if box else None,
-                            quantity=quantity,
-                            expiration_date=expiration_date
-                        )
-                    else:
-                        add_group_to_out_operation(
-                            operation=operation,
-                            product_id=product.id,
-                            batch_number=batch_number or '',
-                            quantity=quantity,
-                            expiration_date=expiration_date
-                        )
-                except ObjectDoesNotExist:
-                    raise ValueError(f"Produkt s ID {product_data['productId'].id} neexistuje.")
-                except Exception as e:
-                    raise Exception(e)
+            if operation_type == "IN":
+                bulk_add_groups_to_in_operation(operation, lines, user=user)
+            else:
+                bulk_add_groups_to_out_operation(operation, lines, user=user)
 
             if operation_type == 'OUT' and delivery_data and invoice_data:
                 set_delivery_data(operation, delivery_data)
@@ -89,6 +71,133 @@ def create_operation(user, operation_type, number, description, client_id, produ
     except Exception as e:
         return {"error": str(e)}
 
+
+def _resolve_product_lines(products):
+    """
+    Ověří všechny řádky operace předem a načte jejich produkty jedním dotazem (`id__in`).
+
+    :param products: Seznam řádků – `product_id` může být instance produktu nebo jeho ID
+    :return: Seznam normalizovaných řádků (slovníky s produktem, množstvím, šarží, expirací a boxem)
+    :raises ValueError: Neexistující produkt nebo neplatné množství
+    """
+    product_ids = {
+        getattr(product_data["product_id"], "id", product_data["product_id"])
+        for product_data in products
+    }
+    found = Product.objects.in_bulk(product_ids)
+
+    lines = []
+    for product_data in products:
+        product_id = getattr(product_data["product_id"], "id", product_data["product_id"])
+        if product_id not in found:
+            raise ValueError(f"Produkt s ID {product_id} neexistuje.")
+
+        quantity = int(product_data["quantity"])
+        if quantity <= 0:
+            raise ValueError(f"Neplatné množství {quantity} pro produkt {product_id}.")
+
+        expiration_date = product_data.get("expiration_date") or None
+        if isinstance(expiration_date, str):
+            expiration_date = datetime.fromisoformat(expiration_date).date()
+
+        lines.append({
+            "product": found[product_id],
+            "quantity": quantity,
+            "batch_number": product_data.get("batch_name") or '',
+            "expiration_date": expiration_date,
+            "box_ean": product_data.get("box_name") or '',
+        })
+    return lines
+
+
+def bulk_add_groups_to_in_operation(operation, lines, user=None):
+    """
+    Hromadně přidá řádky do příjemky – krabice, šarže, skupiny i vazby se zakládají
+    jedním `bulk_create` na tabulku, historie a pohyby skladové knihy se zapisují hromadně.
+
+    :param operation: Příjemka
+    :param lines: Řádky z `_resolve_product_lines`
+    :param user: (volitelné) Uživatel pro historii
+    :return: Seznam vytvořených skupin
+    """
+    if not lines:
+        return []
+
+    # ✅ Ověření duplicitních šarží (v řádcích i v již uložených skupinách operace)
+    seen = set(operation.groups.values_list('batch__product_id', 'batch__batch_number'))
+    for line in lines:
+        key = (line["product"].id, line["batch_number"])
+        if key in seen:
+            raise ValueError(f"Šarže {line['batch_number']} už byla do této příjemky přidána.")
+        seen.add(key)
+
+    # ✅ Existující šarže jedním dotazem, chybějící hromadně založíme
+    batches = {}
+    for batch in Batch.objects.filter(
+            product_id__in={line["product"].id for line in lines},
+            batch_number__in={line["batch_number"] for line in lines}).order_by('id'):
+        batches.setdefault((batch.product_id, batch.batch_number), batch)
+
+    new_batches = []
+    for line in lines:
+        key = (line["product"].id, line["batch_number"])
+        if key not in batches:
+            batches[key] = Batch(product=line["product"], batch_number=line["batch_number"],
+                                 expiration_date=line["expiration_date"])
+            new_batches.append(batches[key])
+    Batch.objects.bulk_create(new_batches, batch_size=1000)
+
+    boxes = Box.objects.bulk_create([Box(ean=line["box_ean"]) for line in lines], batch_size=1000)
+
+    groups = []
+    for line, box in zip(lines, boxes):
+        batch = batches[(line["product"].id, line["batch_number"])]
+        groups.append(Group(batch=batch, box=box, quantity=line["quantity"]))
+    groups = Group.objects.bulk_create(groups, batch_size=1000)
+
+    through = Operation.groups.through
+    through.objects.bulk_create(
+        [through(operation_id=operation.id, group_id=group.id) for group in groups], batch_size=1000
+    )
+
+    sign = operation_sign(operation.type)
+    record_movements([build_movement(group, operation.id, sign * group.quantity) for group in groups])
+    summary_service.refresh_operation_summaries([operation.id])
+    search_service.schedule_instances([*new_batches, *boxes, *groups])
+
+    history_writer.record_many(
+        [History(type='batch', related_id=batch.id, description=f"Vytvořena nová šarže {batch.batch_number}")
+         for batch in new_batches] +
+        [History(type='group', related_id=group.id, user=user,
+                 description=f"Vytvořena nová skupina s množstvím {group.quantity}")
+         for group in groups]
+    )
+    return groups
+
+
+def bulk_add_groups_to_out_operation(operation, lines, user=None, strategy=None):
+    """
+    Alokuje všechny řádky výdejky a výsledný plán zapíše najednou.
+
+    :param operation: Výdejka
+    :param lines: Řádky z `_resolve_product_lines`
+    :param user: (volitelné) Uživatel pro historii
+    :param strategy: (volitelné) Strategie vychystávání (FEFO, FIFO, LIFO)
+    :return: Seznam přidaných skupin
+    """
+    plan = []
+    planned_ids = set()
+    with transaction.atomic():
+        for line in lines:
+            line_plan = allocation_service.allocate(
+                line["product"].id, line["quantity"], line["batch_number"], line["expiration_date"],
+                strategy=strategy, exclude_ids=planned_ids,
+            )
+            planned_ids.update(item["group"].id for item in line_plan)
+            plan.extend(line_plan)
+        return allocation_service.apply_allocation_plan(operation, plan, user=user)
+
+
 ### 🔹 **Přidání skupiny do příjemky**
 def add_group_to_in_operation(operation, product_id, batch_number, box_id, quantity, expiration_date=None):
     """
@@ -137,79 +246,24 @@ def add_group_to_in_operation(operation, product_id, batch_number, box_id, quant
     product.refresh_from_db()
     return group
 
-def add_group_to_out_operation(operation, product_id, quantity, batch_number=None, expiration_date=None):
+def add_group_to_out_operation(operation, product_id, quantity, batch_number=None, expiration_date=None, strategy=None):
     """
-    Přidá existující skupinu (Group) do výdejky – případně ji rozdělí.
+    Přidá existující skupiny (Group) do výdejky – případně je rozdělí.
+
+    Výběr skupin provádí alokační engine (`allocation_service`) jedním seřazeným
+    a zamčeným dotazem, výsledný plán se zapíše hromadně.
 
     :param operation: Výdejka
     :param product_id: ID produktu
     :param quantity: Požadované množství
     :param batch_number: (volitelné) Šarže
     :param expiration_date: (volitelné) Expirace
+    :param strategy: (volitelné) Strategie vychystávání (FEFO, FIFO, LIFO)
     :return: Seznam přidaných nebo rozdělených skupin
     """
-    product = Product.objects.get(id=product_id)
-    quantity = int(quantity)
-
-    # Filtrujeme existující groups s tímto produktem, šarží a expirací (pokud jsou specifikovány)
-    existing_groups = Group.objects.filter(
-        batch__product=product
-    )
-
-    if batch_number:
-        existing_groups = existing_groups.filter(batch__batch_number=batch_number)
-    if expiration_date:
-        existing_groups = existing_groups.filter(batch__expiration_date=expiration_date)
-
-    existing_groups.annotate(total_quantity=Sum("quantity")).order_by("batch__expiration_date")
-
-    if not existing_groups:
-        raise ValueError(f"Nenalezena žádná dostupná groupa pro produkt {product_id} se šarží {batch_number}.")
-
-    total_available = sum(group.quantity for group in existing_groups)
-    if total_available < quantity:
-        raise ValueError(
-            f"Nedostatečné zásoby pro produkt {product_id}. Požadováno {quantity}, dostupné {total_available}.")
-
-    selected_groups = []
-    selected_quantity = 0
-
-    for group in existing_groups:
-        if selected_quantity + group.quantity < quantity:
-            selected_groups.append(group)
-            selected_quantity += group.quantity
-        elif selected_quantity + group.quantity == quantity:
-            selected_groups.append(group)
-            selected_quantity += group.quantity
-            break
-        else:
-            # Poslední groupa přesahuje požadované množství – rozdělíme ji
-            remaining_quantity = group.quantity - (quantity - selected_quantity)
-
-            # Vytvoříme novou `group`, která zůstane v původních operacích
-            new_group = Group.objects.create(
-                batch=group.batch,
-                box=group.box,
-                quantity=remaining_quantity
-            )
-
-            # Přiřadíme novou `group` do stejných operací jako původní `group`
-            new_group_operations = group.operations.all()
-            for existing_operation in new_group_operations:
-                existing_operation.groups.add(new_group)
-
-            # Upravit původní `group` pro výdejku
-            group.quantity = quantity - selected_quantity
-            selected_groups.append(group)
-            selected_quantity += group.quantity
-            group.save()
-            break
-
-        # Přidáme vybrané `groups` do výdejky
-    for group in selected_groups:
-        operation.groups.add(group)
-
-    return selected_groups
+    with transaction.atomic():
+        plan = allocation_service.allocate(product_id, quantity, batch_number, expiration_date, strategy=strategy)
+        return allocation_service.apply_allocation_plan(operation, plan)
 
 
 ### 🔹 **Funkce pro správu krabic**
@@ -302,38 +356,24 @@ def update_operation(operation, data):
     operation.save()
     return operation
 
-def remove_operation(operation):
+def remove_operation(operation, user=None):
     """
-    Smaže operaci pokud je to možné podle typu.
+    Smaže operaci a vrátí její pohyby zásob (`reversal_service.reverse_operation`).
 
     :param operation: Operace ke smazání
+    :param user: (volitelné) Uživatel pro historii
     :return: True pokud úspěšně smazána
-    :raises: Exception pokud nelze smazat
+    :raises ReversalConflict: Zboží příjemky je už použito v jiné operaci
     """
-    if operation.type == 'IN':
-        groups = operation.groups.all()
-        other_operations_exist = any(
-            group.operations.exclude(id=operation.id).exists() for group in groups
-        )
-        if not other_operations_exist:
-             batch_id = operation.groups.all().values_list('batch__id', flat=True)
-             batches = Batch.objects.filter(id__in=batch_id)
-             batches.delete()
-             operation.groups.all().delete()
-             operation.delete()
-             return True
-        else:
-            raise Exception('Operaci nelze smazat')
-
-    if operation.type == 'OUT':
-        operation.groups = None
-        operation.save()
-        operation.delete()
-        return True
+    reversal_service.reverse_operation(operation, user=user)
+    return True
 
 def add_product_to_box(operation_id, box_id, product_id, quantity):
     """
     Přidá produkt do krabice v rámci dané operace, případně rozdělí groupy.
+    Zápis je hromadný (`packing_service.pack_groups`); pro skenování po kusech slouží relace balení.
+    Během otevřené relace balení jde přidání přes ni (sken se hned zapíše), aby čítače relace
+    odpovídaly skupinám.
 
     :param operation_id: ID operace
     :param box_id: ID krabice
@@ -346,72 +386,26 @@ def add_product_to_box(operation_id, box_id, product_id, quantity):
         box = get_object_or_404(Box, id=box_id)
         product = get_object_or_404(Product, id=product_id)
 
-        # Najdeme všechny grupy s tímto produktem, které ještě nejsou rescanned
-        groups = operation.groups.filter(batch__product_id=product.id, rescanned=False).order_by('id')
-
-        total_available = sum(group.quantity for group in groups)
-
-        if quantity > total_available:
-            raise ValidationError(f"Požadované množství ({quantity}) převyšuje dostupné množství ({total_available}).")
-
-        if total_available < quantity:
-            raise ValueError(
-                f"Nedostatečné zásoby pro produkt {product.id}. Požadováno {quantity}, dostupné {total_available}.")
-
-        remaining_quantity = quantity
-        new_groups = []
-
-        for group in groups:
-            if remaining_quantity == 0:
-                break
-
-            if group.quantity <= remaining_quantity:
-                # Přesuneme celou grupu a označíme ji jako `rescanned`
-                group.box = box
-                group.rescanned = True
-                group.save()
-                remaining_quantity -= group.quantity
-                new_groups.append(group)
-
-            else:
-                # Rozdělíme grupu
-                new_group = Group.objects.create(
-                    batch=group.batch,
-                    box=box,
-                    quantity=remaining_quantity,
-                    rescanned=True
-                )
-                group.quantity -= remaining_quantity
-                group.save()
-                new_groups.append(new_group)
-                remaining_quantity = 0
-
-        # Přidáme grupy do operace
-        for group in new_groups:
-            operation.groups.add(group)
+        session = packing_service.open_session_for(operation.id)
+        if session is not None:
+            packing_service.scan(session, [{"product_id": product.id, "box_id": box.id, "quantity": quantity}],
+                                 flush=True)
+        else:
+            packing_service.pack_groups(operation, [(box.id, product.id, quantity)])
 
         return {"message": f"Produkt {product.name} přidán do krabice {box.ean} v počtu {quantity} ks."}
 
 def get_operation_product_summary(operation_id):
     """
     Vrátí seznam produktů v dané operaci a jejich množství (celkové a rescanned).
+    Během otevřené relace balení vrací její čítače (včetně dosud nezapsaných skenů).
 
     :param operation_id: ID operace
     :return: List slovníků se souhrnem podle produktu
     """
     operation = get_object_or_404(Operation, id=operation_id)
 
-    product_summary = {}
-
-    for group in operation.groups.all():
-        product_id = group.batch.product.id
-        product_name = group.batch.product.name
-
-        if product_id not in product_summary:
-            product_summary[product_id] = {"id": product_id, "name": product_name, "total_quantity": 0, "rescanned": 0}
-
-        product_summary[product_id]["total_quantity"] += group.quantity
-        if group.rescanned:
-            product_summary[product_id]["rescanned"] += group.quantity
-
-    return list(product_summary.values())
\ No newline at end of file
+    session = packing_service.open_session_for(operation.id)
+    if session is not None:
+        return list(session.products.values())
+    return list(packing_service.product_counters(operation.id).values())
\ No newline at end of file
@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models import F, Sum
+
+from batch.models import Batch
+from group.models import Group
+from group.services import compaction_service
+from history.models import History
+from history.services import history_writer
+from operation.models import Operation
+from search.services import search_service
+from stock.models import StockMovement
+from stock.services.ledger_service import operation_sign, record_movements
+from utils.bulk_delete import delete_rows
+
+
+class ReversalConflict(ValueError):
+    """
+    Příjemku nelze zrušit – část jejího zboží je už v jiných operacích (vydaná nebo rezervovaná).
+    """
+
+    def __init__(self, operation_id, consumed):
+        self.operation_id = operation_id
+        self.consumed = consumed
+        products = ", ".join(f"{row['name']} ({row['quantity']} ks)" for row in consumed)
+        super().__init__(f"Operaci nelze smazat – zboží je použito v jiných operacích: {products}")
+
+
+def consumed_products(operation_id):
+    """
+    Zboží příjemky, které je i v jiných operacích – jeden agregační dotaz přes vazby.
+
+    :param operation_id: ID operace
+    :return: Seznam {"product_id", "name", "quantity"}
+    """
+    through = Operation.groups.through
+    return list(
+        through.objects.filter(
+            group_id__in=through.objects.filter(operation_id=operation_id).values('group_id')
+        )
+        .exclude(operation_id=operation_id)
+        .values(product_id=F('group__batch__product_id'), name=F('group__batch__product__name'))
+        .annotate(quantity=Sum('group__quantity'))
+        .order_by('product_id')
+    )
+
+
+def reverse_operation(operation, user=None):
+    """
+    Zruší operaci a vrátí její pohyby zásob – počet dotazů nezávisí na počtu řádků operace.
+
+    Výdejka: vazby na skupiny se smažou jedním DELETE a skladová kniha zapíše vrácení kusů;
+    skupiny rozdělené při výdeji se pak sloučí zpět (`compaction_service.merge_batches`).
+    Příjemka: navíc se smažou její skupiny a šarže, které nemají jiné skupiny. Pokud je část
+    zboží už v jiné operaci, příjemka se nezruší (`ReversalConflict`).
+
+    Skupiny a šarže se mažou bez signálů jednotlivých instancí – skladovou knihu, historii
+    a vyhledávání zapíše služba hromadně.
+
+    :param operation: Operace ke zrušení
+    :param user: (volitelné) Uživatel pro historii
+    :return: Slovník s počty odpojených skupin a smazaných skupin a šarží
+    :raises ReversalConflict: Zboží příjemky je použito v jiné operaci
+    :raises ValueError: Neznámý typ operace
+    """
+    sign = operation_sign(operation.type)
+    if not sign:
+        raise ValueError(f"Operaci typu '{operation.type}' nelze zrušit.")
+
+    through = Operation.groups.through
+    with transaction.atomic():
+        groups = list(
+            Group.objects.filter(operations__id=operation.id)
+            .select_for_update(of=('self',))
+            .values('id', 'batch_id', 'box_id', 'quantity',
+                    product_id=F('batch__product_id'), batch_number=F('batch__batch_number'))
+            .order_by('id')
+        )
+        group_ids = [group['id'] for group in groups]
+
+        removed_groups = group_ids if operation.type == 'IN' else []
+        removed_batches = []
+        if removed_groups:
+            consumed = consumed_products(operation.id)
+            if consumed:
+                raise ReversalConflict(operation.id, consumed)
+            batch_ids = {group['batch_id'] for group in groups}
+            kept = set(
+                Group.objects.filter(batch_id__in=batch_ids).exclude(id__in=group_ids)
+                .values_list('batch_id', flat=True).distinct()
+            )
+            removed_batches = sorted(
+                {(group['batch_id'], group['batch_number']) for group in groups if group['batch_id'] not in kept}
+            )
+
+        through.objects.filter(operation_id=operation.id).delete()
+        record_movements([
+            StockMovement(product_id=group['product_id'], batch_id=group['batch_id'], box_id=group['box_id'],
+                          group_id=group['id'], operation_id=operation.id, delta=-sign * group['quantity'])
+            for group in groups
+        ])
+
+        history = []
+        if removed_groups:
+            # Mazání bez signálů jednotlivých instancí – pohyby už jsou zapsané, historii zapíšeme níže
+            delete_rows(Group, removed_groups)
+            delete_rows(Batch, [batch_id for batch_id, _ in removed_batches])
+
+            history += [
+                History(type="group", related_id=group['id'], user=user,
+                        description=f"Odstraněna skupina s množstvím {group['quantity']}")
+                for group in groups
+            ]
+            history += [
+                History(type="batch", related_id=batch_id, user=user, description=f"Odstraněna šarže {batch_number}")
+                for batch_id, batch_number in removed_batches
+            ]
+            search_service.schedule('group', removed_groups)
+            # Metriky expirujících šarží zneplatní už změna zásob (`stock_changed`)
+            search_service.schedule('batch', [batch_id for batch_id, _ in removed_batches])
+        else:
+            # Části skupin rozdělené při výdeji mají po odpojení zase stejné operace – sloučí se
+            compaction_service.merge_batches({group['batch_id'] for group in groups}, user=user)
+
+        history_writer.record_many(history)
+        operation.delete(user=user)
+
+    return {"groups": len(groups), "removed_groups": len(removed_groups), "removed_batches": len(removed_batches)}
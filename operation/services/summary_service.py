@@ -0,0 +1,90 @@
+from collections import defaultdict
+
+from operation.models import Operation
+
+# Po kolika operacích se souhrny přepočítávají a ukládají
+CHUNK_SIZE = 1000
+
+
+def refresh_operation_summaries(operation_ids):
+    """
+    Přepočítá souhrnné sloupce operací (názvy a ID skupin, SKU, počty) z jejich skupin.
+
+    Jeden dotaz přes vazby operace–skupina (s joinem na šarži a produkt) a jeden
+    hromadný UPDATE na dávku operací. `updated_at` ani historie se nemění.
+
+    :param operation_ids: ID operací
+    :return: Počet přepočítaných operací
+    """
+    operation_ids = sorted({operation_id for operation_id in operation_ids if operation_id})
+    for start in range(0, len(operation_ids), CHUNK_SIZE):
+        _refresh_chunk(operation_ids[start:start + CHUNK_SIZE])
+    return len(operation_ids)
+
+
+def _refresh_chunk(operation_ids):
+    rows = (
+        Operation.groups.through.objects
+        .filter(operation_id__in=operation_ids)
+        .order_by('operation_id', 'group_id')
+        .values_list('operation_id', 'group_id', 'group__quantity', 'group__batch__product__name',
+                     'group__batch__product__sku')
+    )
+
+    groups = defaultdict(list)
+    for operation_id, group_id, quantity, product_name, sku in rows:
+        groups[operation_id].append((group_id, quantity, product_name, sku))
+
+    summaries = []
+    for operation_id in operation_ids:
+        operation_groups = groups.get(operation_id, [])
+        summaries.append(Operation(
+            id=operation_id,
+            groups_name=",".join(f"{quantity} x {name}" for _, quantity, name, _ in operation_groups),
+            groups_search=",".join(str(group_id) for group_id, _, _, _ in operation_groups),
+            product_search=",".join(str(sku) for _, _, _, sku in operation_groups),
+            groups_amount=len(operation_groups),
+            product_amount=sum(quantity for _, quantity, _, _ in operation_groups),
+        ))
+
+    Operation.objects.bulk_update(summaries, Operation.SUMMARY_FIELDS)
+
+
+def operations_of_groups(group_ids):
+    """
+    Vrací ID operací, ve kterých jsou dané skupiny.
+
+    :param group_ids: ID skupin
+    :return: Seznam ID operací
+    """
+    return list(
+        Operation.groups.through.objects
+        .filter(group_id__in=group_ids)
+        .values_list('operation_id', flat=True)
+        .distinct()
+    )
+
+
+def operations_of_product(product_id):
+    """
+    Vrací ID operací, které obsahují skupiny daného produktu.
+
+    :param product_id: ID produktu
+    :return: Seznam ID operací
+    """
+    return operations_of_products([product_id])
+
+
+def operations_of_products(product_ids):
+    """
+    Vrací ID operací, které obsahují skupiny daných produktů (jeden dotaz).
+
+    :param product_ids: ID produktů
+    :return: Seznam ID operací
+    """
+    return list(
+        Operation.groups.through.objects
+        .filter(group__batch__product_id__in=product_ids)
+        .values_list('operation_id', flat=True)
+        .distinct()
+    )
@@ -0,0 +1,167 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from history.models import History
+from history.services import history_writer
+from operation.models import Operation
+from operation.signals import status_changed
+from packing.services import packing_service
+
+
+class TransitionConflict(ValueError):
+    """
+    Přechod stavu se neprovedl – operace neexistuje nebo není (už) ve stavu, ze kterého
+    je přechod povolený (např. ji mezitím změnil jiný požadavek).
+    """
+
+    def __init__(self, operation_id, status, current=None):
+        self.operation_id = operation_id
+        self.status = status
+        self.current = current
+        if current is None:
+            message = f"Operace {operation_id} neexistuje."
+        else:
+            message = f"Neplatný přechod stavu z {current} na {status}"
+        super().__init__(message)
+
+
+def sources(status):
+    """
+    Stavy, ze kterých je přechod do `status` povolený (`Operation.VALID_TRANSITIONS`).
+
+    :param status: Cílový stav
+    :return: Seznam stavů
+    """
+    if status not in Operation.VALID_TRANSITIONS:
+        raise ValueError(f"Neznámý stav operace '{status}'.")
+    return [source for source, targets in Operation.VALID_TRANSITIONS.items() if status in targets]
+
+
+def history_description(previous_status, status):
+    """
+    Popis změny stavu do historie (stejný formát jako při `Operation.save`).
+    """
+    return f"status změněno z '{previous_status}' na '{status}'"
+
+
+def transition(operation, status, user=None, client_ids=None):
+    """
+    Změní stav operace podmíněným UPDATE (`WHERE id = … AND status = předchozí stav`) –
+    bez načtení a přepsání celého řádku. Souběžná změna stavu se projeví jako konflikt.
+
+    Se známou instancí je předchozí stav její `status` (jeden UPDATE). Podle ID se zkouší
+    povolené předchozí stavy postupně, první úspěšný UPDATE určí předchozí stav.
+    Při opuštění stavu BOX se otevřená relace balení zapíše a uzavře.
+
+    :param operation: Instance operace nebo její ID
+    :param status: Cílový stav
+    :param user: (volitelné) Uživatel pro historii
+    :param client_ids: (volitelné) Jen operace těchto klientů (jinak se hlásí jako neexistující)
+    :return: Předchozí stav
+    :raises TransitionConflict: Žádný řádek neodpovídal (neexistuje nebo nepovolený přechod)
+    """
+    candidates = sources(status)
+    known = isinstance(operation, Operation)
+    operation_id = operation.pk if known else int(operation)
+    if known:
+        if operation.status not in candidates:
+            raise TransitionConflict(operation_id, status, operation.status)
+        candidates = [operation.status]
+
+    operations = Operation.objects.filter(pk=operation_id)
+    if client_ids is not None:
+        operations = operations.filter(client_id__in=client_ids)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for previous_status in candidates:
+            if operations.filter(status=previous_status).update(status=status, updated_at=now):
+                break
+        else:
+            current = operations.values_list('status', flat=True).first()
+            raise TransitionConflict(operation_id, status, current)
+
+        if previous_status == 'BOX':
+            # Rozbalené skeny se zapíšou do skupin ještě v této transakci
+            packing_service.close_open_sessions([operation_id])
+
+        if known:
+            operation.status = status
+            operation.updated_at = now
+            operation.refresh_tracked_snapshot()
+        else:
+            # Neměnná pole pro metriky dashboardu se dočtou až po úspěšném přechodu
+            operation = Operation(
+                id=operation_id, status=status, updated_at=now,
+                **operations.values('client_id', 'created_at').get()
+            )
+
+        history_writer.record(type="operation", related_id=operation_id, user=user,
+                              description=history_description(previous_status, status))
+        status_changed.send(sender=Operation, changes=[(operation, previous_status)])
+
+    return previous_status
+
+
+# Horní mez počtu operací v jednom hromadném přechodu
+MAX_BULK = 1000
+
+
+def bulk_transition(operation_ids, status, user=None, client_ids=None):
+    """
+    Hromadný přechod stavu. Stavy se ověří po množinách – jeden zamykací SELECT, pak jeden
+    UPDATE na každý předchozí stav; historie jedním INSERTem, metriky jedním UPDATE na klienta.
+    Otevřené relace balení operací, které opouštějí stav BOX, se zapíšou a uzavřou.
+
+    :param operation_ids: ID operací (nejvýš `MAX_BULK`)
+    :param status: Cílový stav
+    :param user: (volitelné) Uživatel pro historii
+    :param client_ids: (volitelné) Jen operace těchto klientů (ostatní se hlásí jako neexistující)
+    :return: Slovník {id: {"result": "ok" | "conflict" | "not_found", "previous_status" | "status"}}
+    """
+    allowed = set(sources(status))
+    operation_ids = list(dict.fromkeys(int(operation_id) for operation_id in operation_ids))
+    if len(operation_ids) > MAX_BULK:
+        raise ValueError(f"Najednou lze změnit nejvýš {MAX_BULK} operací.")
+
+    operations = Operation.objects.filter(id__in=operation_ids)
+    if client_ids is not None:
+        operations = operations.filter(client_id__in=client_ids)
+
+    results = {operation_id: {'result': 'not_found'} for operation_id in operation_ids}
+    now = timezone.now()
+    with transaction.atomic():
+        # Zámek řádků – mezi ověřením a UPDATE je nikdo nezmění
+        rows = list(
+            operations.select_for_update()
+            .order_by('id')
+            .values_list('id', 'status', 'client_id', 'created_at')
+        )
+
+        by_status = defaultdict(list)
+        for operation_id, current, client_id, created_at in rows:
+            if current in allowed:
+                by_status[current].append(Operation(id=operation_id, status=status, client_id=client_id,
+                                                    created_at=created_at, updated_at=now))
+            else:
+                results[operation_id] = {'result': 'conflict', 'status': current}
+
+        changes = []
+        history = []
+        for previous_status, changed in by_status.items():
+            Operation.objects.filter(id__in=[operation.id for operation in changed], status=previous_status) \
+                .update(status=status, updated_at=now)
+            for operation in changed:
+                results[operation.id] = {'result': 'ok', 'previous_status': previous_status}
+                changes.append((operation, previous_status))
+                history.append(History(type="operation", related_id=operation.id, user=user,
+                                       description=history_description(previous_status, status)))
+
+        packing_service.close_open_sessions(operation.id for operation in by_status.get('BOX', []))
+        history_writer.record_many(history)
+        if changes:
+            status_changed.send(sender=Operation, changes=changes)
+
+    return results
@@ -0,0 +1,67 @@
+# operation/signals.py
+from django.db.models.signals import m2m_changed, post_save, pre_delete, post_delete
+from django.dispatch import receiver, Signal
+
+from group.models import Group
+from operation.models import Operation
+from operation.services import summary_service
+from product.models import Product
+
+# Odesílá `transition_service` po přechodu stavu hromadným UPDATE (bez `post_save`) –
+# argument `changes` je seznam (operace po přechodu, předchozí stav)
+status_changed = Signal()
+
+
+@receiver(m2m_changed, sender=Operation.groups.through)
+def refresh_summary_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Přepočítá souhrny operací po připojení/odpojení skupin (z obou stran M2M vazby).
+    """
+    if action == 'pre_clear' and reverse:
+        # Po smazání vazeb už nepoznáme, kterých operací se týkaly
+        instance._summary_operation_ids = list(instance.operations.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        summary_service.refresh_operation_summaries([instance.id])
+    elif action == 'post_clear':
+        summary_service.refresh_operation_summaries(getattr(instance, '_summary_operation_ids', []))
+    else:
+        summary_service.refresh_operation_summaries(pk_set or [])
+
+
+@receiver(post_save, sender=Group)
+def refresh_summary_on_group_change(sender, instance, created, **kwargs):
+    """
+    Změna množství skupiny mění název i součet kusů ve všech jejích operacích.
+    """
+    if not created:
+        summary_service.refresh_operation_summaries(summary_service.operations_of_groups([instance.id]))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_operations(sender, instance, **kwargs):
+    instance._summary_operation_ids = summary_service.operations_of_groups([instance.id])
+
+
+@receiver(post_delete, sender=Group)
+def refresh_summary_on_group_removal(sender, instance, **kwargs):
+    """
+    Po smazání skupiny přepočítá operace, ve kterých byla.
+    """
+    summary_service.refresh_operation_summaries(getattr(instance, '_summary_operation_ids', []))
+
+
+@receiver(post_save, sender=Product)
+def refresh_summary_on_product_change(sender, instance, created, **kwargs):
+    """
+    Přejmenování produktu nebo změna SKU se promítne do souhrnů operací s jeho skupinami.
+    """
+    if created:
+        return
+    previous = getattr(instance, '_tracked_snapshot', {})
+    if previous.get('name') == instance.name and previous.get('sku') == instance.sku:
+        return
+    summary_service.refresh_operation_summaries(summary_service.operations_of_product(instance.id))
@@ -176,4 +176,196 @@ def test_create_operation_invalid_type(user_with_client, test_product):
         invoice_data={}
     )
     assert isinstance(result, dict)
-    assert result["error"] == "Neplatný typ operace. Musí být 'IN' nebo 'OUT'."
\ No newline at end of file
+    assert result["error"] == "Neplatný typ operace. Musí být 'IN' nebo 'OUT'."
+
+# Testuje FEFO alokaci – nejdřív se vydává šarže s nejbližší expirací, zbytek skupiny zůstane skladem
+@pytest.mark.django_db
+def test_allocation_fefo_prefers_earliest_expiration(user_with_client, test_product):
+    late = Batch.objects.create(batch_number='LATE', product=test_product, expiration_date='2099-12-31')
+    early = Batch.objects.create(batch_number='EARLY', product=test_product, expiration_date='2030-01-01')
+    late_group = Group.objects.create(batch=late, quantity=5)
+    early_group = Group.objects.create(batch=early, quantity=5)
+    operation = Operation.objects.create(number='OUT-FEFO', type='OUT', status='CREATED', user=user_with_client, client=test_product.client)
+
+    selected_groups = add_group_to_out_operation(operation, test_product.id, 7)
+
+    assert [g.id for g in selected_groups] == [early_group.id, late_group.id]
+    assert sorted(operation.groups.values_list('quantity', flat=True)) == [2, 5]
+    remainder = Group.objects.filter(batch=late).exclude(id=late_group.id).get()
+    assert remainder.quantity == 3
+
+
+# Testuje FIFO/LIFO strategie a limit prohledaných skupin
+@pytest.mark.django_db
+def test_allocation_strategies_and_row_limit(user_with_client, test_product):
+    from operation.services import allocation_service
+
+    batch = Batch.objects.create(batch_number='B-STRAT', product=test_product)
+    groups = [Group.objects.create(batch=batch, quantity=1) for _ in range(3)]
+
+    with transaction.atomic():
+        fifo = allocation_service.allocate(test_product.id, 1, strategy='FIFO')
+        lifo = allocation_service.allocate(test_product.id, 1, strategy='lifo')
+    assert fifo[0]["group"].id == groups[0].id
+    assert lifo[0]["group"].id == groups[-1].id
+
+    with pytest.raises(ValueError), transaction.atomic():
+        allocation_service.allocate(test_product.id, 3, max_rows=2)
+
+
+# Testuje, že skupiny už přiřazené do výdejky nejsou znovu alokovány
+@pytest.mark.django_db
+def test_allocation_skips_groups_in_out_operation(user_with_client, test_product):
+    batch = Batch.objects.create(batch_number='B-TWICE', product=test_product)
+    Group.objects.create(batch=batch, quantity=4)
+    client = test_product.client
+    first = Operation.objects.create(number='OUT-A', type='OUT', status='CREATED', user=user_with_client, client=client)
+    second = Operation.objects.create(number='OUT-B', type='OUT', status='CREATED', user=user_with_client, client=client)
+
+    add_group_to_out_operation(first, test_product.id, 4)
+
+    with pytest.raises(ValueError):
+        add_group_to_out_operation(second, test_product.id, 1)
+
+
+# Testuje hromadné vytvoření příjemky – počet dotazů nezávisí na počtu řádků
+@pytest.mark.django_db
+def test_create_operation_in_bulk_query_count(user_with_client, test_product, django_assert_max_num_queries):
+    client = user_with_client.client.first()
+    products = [{
+        "product_id": test_product.id,
+        "quantity": 2,
+        "batch_name": f"BULK-{i}",
+        "box_name": f"BOX-BULK-{i}",
+    } for i in range(50)]
+
+    with django_assert_max_num_queries(25):
+        result = create_operation(user_with_client, "IN", "IN-BULK", "", client.id, products)
+
+    assert isinstance(result, Operation)
+    assert result.groups.count() == 50
+    test_product.refresh_from_db()
+    assert test_product.amount == 100
+
+
+# Testuje, že duplicitní šarže v jednom požadavku vrátí chybu a nic nezaloží
+@pytest.mark.django_db
+def test_create_operation_in_duplicate_batch(user_with_client, test_product):
+    client = user_with_client.client.first()
+    line = {"product_id": test_product, "quantity": 1, "batch_name": "DUP"}
+    result = create_operation(user_with_client, "IN", "IN-DUP", "", client.id, [line, dict(line)])
+
+    assert result == {"error": "Šarže DUP už byla do této příjemky přidána."}
+    assert not Operation.objects.filter(number="IN-DUP").exists()
+
+
+# Testuje, že souhrnné sloupce operace odpovídají jejím skupinám po přidání i rozdělení
+@pytest.mark.django_db
+def test_operation_summary_columns(user_with_client, test_product):
+    client = test_product.client
+    inbound = Operation.objects.create(number='IN-SUM', type='IN', status='CREATED', user=user_with_client, client=client)
+    group = add_group_to_in_operation(inbound, test_product.id, 'S1', None, 10)
+
+    inbound.refresh_from_db()
+    assert inbound.groups_amount == 1
+    assert inbound.product_amount == 10
+    assert inbound.groups_name == '10 x Test Product'
+    assert inbound.product_search == 'TP001'
+
+    out = Operation.objects.create(number='OUT-SUM', type='OUT', status='CREATED', user=user_with_client, client=client)
+    add_group_to_out_operation(out, test_product.id, 4)
+
+    inbound.refresh_from_db()
+    out.refresh_from_db()
+    assert inbound.groups_amount == 2
+    assert inbound.product_amount == 10
+    assert out.groups_search == str(group.id)
+    assert out.product_amount == 4
+
+
+# Testuje podmíněný přechod stavu – jeden UPDATE, historie a metriky z předchozího stavu
+@pytest.mark.django_db
+def test_transition_compare_and_swap(user_with_client, django_capture_on_commit_callbacks, django_assert_num_queries):
+    from dashboard.models import ClientMetrics
+    from dashboard.services import metrics_service
+    from history.models import History
+    from operation.services import transition_service
+
+    client = user_with_client.client.first()
+    with django_capture_on_commit_callbacks(execute=True):
+        operation = Operation.objects.create(number='CAS001', type='OUT', status='CREATED', client=client)
+        metrics_service.rebuild_client_metrics([client.id])
+
+        # Známá instance: UPDATE stavu a UPDATE metrik klienta (+ savepoint uvnitř testovací transakce)
+        with django_assert_num_queries(4):
+            assert transition_service.transition(operation, 'BOX', user=user_with_client) == 'CREATED'
+
+        # Instance se starým stavem – souběžná změna se projeví jako konflikt, ne přepsání
+        stale = Operation.objects.get(id=operation.id)
+        stale.status = 'CREATED'
+        with pytest.raises(transition_service.TransitionConflict):
+            transition_service.transition(stale, 'CANCELLED')
+        with pytest.raises(transition_service.TransitionConflict):
+            transition_service.transition(operation.id, 'BOX')
+
+        assert transition_service.transition(operation.id, 'COMPLETED') == 'BOX'
+
+    assert Operation.objects.get(id=operation.id).status == 'COMPLETED'
+    assert list(History.objects.filter(related_id=operation.id, type='operation').order_by('id')
+                .values_list('description', flat=True))[1:] == [
+        "status změněno z 'CREATED' na 'BOX'", "status změněno z 'BOX' na 'COMPLETED'"
+    ]
+    metrics = ClientMetrics.objects.get(client=client)
+    assert (metrics.operations_created, metrics.operations_box, metrics.operations_completed) == (0, 0, 1)
+
+
+# Testuje zrušení operací – příjemku s vydaným zbožím odmítne, jinak vrátí zásoby hromadně
+@pytest.mark.django_db
+def test_reverse_operation_bulk(user_with_client, test_product, django_assert_max_num_queries):
+    from operation.services.reversal_service import ReversalConflict
+    from stock.models import LocationStock
+
+    client = user_with_client.client.first()
+    products = [{"product_id": test_product.id, "quantity": 2, "batch_name": f"REV-{i}", "box_name": f"BOX-REV-{i}"}
+                for i in range(50)]
+    inbound = create_operation(user_with_client, "IN", "IN-REV", "", client.id, products)
+    out = Operation.objects.create(number='OUT-REV', type='OUT', status='CREATED', client=client)
+    add_group_to_out_operation(out, test_product.id, 5)
+
+    with pytest.raises(ReversalConflict) as conflict:
+        remove_operation(inbound)
+    assert conflict.value.consumed == [{"product_id": test_product.id, "name": "Test Product", "quantity": 5}]
+    test_product.refresh_from_db()
+    assert test_product.amount == 95
+
+    # Počet dotazů nezávisí na počtu řádků operace (včetně sloučení rozdělené skupiny)
+    with django_assert_max_num_queries(35):
+        assert remove_operation(out) is True
+    test_product.refresh_from_db()
+    assert test_product.amount == 100
+    assert Group.objects.filter(batch__product=test_product).count() == 50
+
+    inbound = Operation.objects.get(id=inbound.id)
+    with django_assert_max_num_queries(25):
+        assert remove_operation(inbound, user=user_with_client) is True
+
+    test_product.refresh_from_db()
+    assert test_product.amount == 0
+    assert not Operation.objects.filter(id__in=[inbound.id, out.id]).exists()
+    assert not Batch.objects.filter(product=test_product).exists()
+    assert not Group.objects.filter(batch__product=test_product).exists()
+    assert not LocationStock.objects.filter(product=test_product, quantity__gt=0).exists()
+
+
+# Testuje mazání po dávkách – dlouhý seznam ID se rozdělí do více dotazů pod limitem parametrů
+@pytest.mark.django_db
+def test_delete_rows_in_chunks(monkeypatch, django_assert_num_queries):
+    from history.models import History
+    from utils import bulk_delete
+
+    monkeypatch.setattr(bulk_delete, "CHUNK_SIZE", 3)
+    ids = [History.objects.create(type="group", related_id=i, description="Mazání").id for i in range(7)]
+
+    with django_assert_num_queries(3):
+        assert bulk_delete.delete_rows(History, ids) == 7
+    assert not History.objects.filter(id__in=ids).exists()
@@ -45,6 +45,17 @@ class TestOperationViewSet:
         assert response.data['results']
         assert any(op['number'] == "OP001" for op in response.data['results'])
 
+    # Ověřuje, že výpis nenačítá skupiny – počet dotazů nezávisí na počtu operací
+    def test_list_operations_constant_queries(self, authenticated_operation_client, operation_user,
+                                              django_assert_max_num_queries):
+        client = operation_user.client.first()
+        for i in range(30):
+            Operation.objects.create(number=f"BULK{i}", type="IN", status="CREATED", client=client, user=operation_user)
+
+        with django_assert_max_num_queries(5):
+            response = authenticated_operation_client.get("/api/operations/?page_size=100")
+        assert response.status_code == status.HTTP_200_OK
+
     # Ověřuje získání detailu konkrétní operace podle ID
     def test_get_operation_detail(self, authenticated_operation_client, sample_operation):
         response = authenticated_operation_client.get(f"/api/operations/{sample_operation.id}/")
@@ -67,4 +78,59 @@ class TestOperationViewSet:
     def test_search_operations(self, authenticated_operation_client, sample_operation):
         response = authenticated_operation_client.get("/api/operations/search/?q=OP001")
         assert response.status_code == 200
-        assert any(op['id'] == sample_operation.id for op in response.data['results'])
\ No newline at end of file
+        assert any(op['id'] == sample_operation.id for op in response.data['results'])
+    # Změna stavu jedním podmíněným UPDATE – opakovaný přechod do stejného stavu nic nemění,
+    # nepovolený přechod vrací 400
+    def test_status_transition_conflict(self, authenticated_operation_client, sample_operation):
+        url = f"/api/operations/{sample_operation.id}/start_packaging/"
+        response = authenticated_operation_client.post(url)
+        assert response.status_code == 200
+        assert response.data["previous_status"] == "CREATED"
+
+        response = authenticated_operation_client.post(url)
+        assert response.status_code == 200
+        assert response.data["previous_status"] == "BOX"
+
+        response = authenticated_operation_client.patch(f"/api/operations/{sample_operation.id}/update_status/",
+                                                        {"status": "CANCELLED"}, format="json")
+        assert response.status_code == 200
+        assert response.data["previous_status"] == "BOX"
+        sample_operation.refresh_from_db()
+        assert sample_operation.status == "CANCELLED"
+
+        response = authenticated_operation_client.patch(f"/api/operations/{sample_operation.id}/update_status/",
+                                                        {"status": "BOX"}, format="json")
+        assert response.status_code == 400
+        response = authenticated_operation_client.post(f"/api/operations/{sample_operation.id}/complete_packing/")
+        assert response.status_code == 400
+        assert response.data["error"] == "Operace není ve stavu BOX"
+
+        response = authenticated_operation_client.post("/api/operations/999999/complete_packing/")
+        assert response.status_code == 404
+
+    # Hromadné dokončení a zrušení – výsledek pro každé ID, jeden UPDATE na předchozí stav
+    def test_bulk_transition_and_cancel(self, authenticated_operation_client, operation_user, client_factory):
+        client = operation_user.client.first()
+        boxed = [Operation.objects.create(number=f"SHIFT{i}", type="OUT", status="BOX", client=client) for i in range(3)]
+        created = Operation.objects.create(number="SHIFT-NEW", type="OUT", status="CREATED", client=client)
+        foreign = Operation.objects.create(number="FOREIGN", type="OUT", status="BOX", client=client_factory(name="Cizí"))
+
+        ids = [operation.id for operation in boxed] + [created.id, foreign.id]
+        response = authenticated_operation_client.post("/api/operations/bulk_transition/",
+                                                       {"status": "COMPLETED", "ids": ids}, format="json")
+        assert response.status_code == 200
+        assert response.data["updated"] == 3
+        results = {row["id"]: row for row in response.data["results"]}
+        assert results[created.id] == {"id": created.id, "result": "conflict", "status": "CREATED"}
+        assert results[foreign.id]["result"] == "not_found"
+        assert set(Operation.objects.filter(id__in=ids).values_list("status", flat=True)) == {"COMPLETED", "CREATED", "BOX"}
+
+        response = authenticated_operation_client.post("/api/operations/bulk_cancel/",
+                                                       {"filter": {"status": "CREATED"}}, format="json")
+        assert response.data["results"] == [{"id": created.id, "result": "ok", "previous_status": "CREATED"}]
+        created.refresh_from_db()
+        assert created.status == "CANCELLED"
+
+        response = authenticated_operation_client.post("/api/operations/bulk_cancel/", {"filter": {"number": "X"}},
+                                                       format="json")
+        assert response.status_code == 400
@@ -8,13 +8,18 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from operation.serializers import OperationSerializer, OperationListSerializer
+from operation.services import transition_service
 from operation.services.operation_service import *
+from operation.services.reversal_service import ReversalConflict
+from operation.services.transition_service import TransitionConflict
 from django.db.models import Q
 
-from utils.pagination import CustomPageNumberPagination
+from stock.services import location_service
+from utils.export import EXPORT_CHUNK_SIZE, export_response
+from utils.pagination import KeysetPagination, StreamingListMixin
 
 
-class OperationViewSet(viewsets.ReadOnlyModelViewSet):
+class OperationViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     """
     OperationViewSet poskytuje rozhraní pro čtení operací v systému skladového hospodářství.
 
@@ -23,19 +28,29 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
     - akci `/search/` pro fulltextové vyhledávání operací (číslo, šarže, produkt, status, typ)
     - akce `/types/` a `/statuses/` pro získání seznamu všech typů a stavů operací
     - akci `/all/` pro načtení všech operací s možností stránkování
+    - akci `/export/` pro streamovaný export operací s řádky (CSV, XLSX)
     - akci `/create/` pro vytvoření nové operace typu `IN` nebo `OUT`
     - akce pro detail, aktualizaci, smazání a změnu statusu operace
-    - pokročilé akce: přidání produktu do krabice, uzavření krabice, zahájení a dokončení balení
+    - hromadné akce `/bulk_transition/` a `/bulk_cancel/` (seznam ID nebo filtr, výsledek po operacích)
+    - pokročilé akce: přidání produktu do krabice, uzavření krabice, zahájení a dokončení balení,
+      pořadí vychystání (`/pick_path/`)
     - optimalizované dotazy pomocí `prefetch_related` pro výkon
     - filtrace operací podle klienta přihlášeného uživatele (`request.user.client`)
-    - použití vlastního stránkovače `CustomPageNumberPagination`
+    - kurzorové stránkování `KeysetPagination` (`?cursor=`), jinak klasické `CustomPageNumberPagination`
+    - streamovaný výpis bez stránkování (`?no_page=1`)
 
     Všechny endpointy vyžadují autentizaci a jsou chráněny pomocí `IsAuthenticated`.
     """
     queryset = Operation.objects.all()
     serializer_class = OperationSerializer
-    pagination_class = CustomPageNumberPagination
+    pagination_class = KeysetPagination
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-updated_at', '-id')
+
+    # Výpisy serializované ze souhrnných sloupců operace (bez načítání skupin)
+    LIST_ACTIONS = ('list', 'get_all_operations', 'search', 'export')
+    # Filtry hromadných akcí (`filter` v těle požadavku) → pole modelu
+    BULK_FILTERS = {'status': 'status', 'type': 'type', 'client': 'client_id'}
 
     @swagger_auto_schema(
         operation_description="Vrací seznam operací pro přihlášeného uživatele (klienta).",
@@ -57,7 +72,7 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
 
         :return: Třída serializeru
         """
-        if self.action == 'list':
+        if self.action in self.LIST_ACTIONS:
             return OperationListSerializer
         return OperationSerializer
 
@@ -70,15 +85,17 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
         client_id = self.request.GET.get('client')
         client_ids = list(self.request.user.client.values_list('id', flat=True))
 
-        groups_qs = Group.objects.select_related(
-            'batch__product',
-            'box'
-        ).select_related(
-            'batch'
-        )
-        prefetch = Prefetch('groups', queryset=groups_qs, to_attr='prefetched_groups')
+        queryset = Operation.objects.select_related('client').order_by('-updated_at')
 
-        queryset = Operation.objects.prefetch_related(prefetch).select_related('client').order_by('-updated_at')
+        # Detailní serializer potřebuje skupiny, výpisy si vystačí se souhrnnými sloupci
+        if self.action not in self.LIST_ACTIONS:
+            groups_qs = Group.objects.select_related(
+                'batch__product',
+                'box'
+            ).select_related(
+                'batch'
+            )
+            queryset = queryset.prefetch_related(Prefetch('groups', queryset=groups_qs, to_attr='prefetched_groups'))
 
         if client_id and int(client_id) in client_ids:
             queryset = queryset.filter(client_id=client_id)
@@ -123,7 +140,7 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
                 data_query,
                 Q()
             )
-            operations = Operation.objects.filter(query_filters).only("id")
+            operations = Operation.objects.filter(query_filters)
         else:
             operations = Operation.objects.filter(
                 Q(number=query) |
@@ -132,17 +149,13 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
                 Q(groups__batch__product__name=query) |
                 Q(type=query) |
                 Q(status=query),
-            ).only("id")
+            )
 
         if client_id:
             operations = operations.filter(client_id=client_id)
+        operations = operations.distinct().order_by('-updated_at')
 
-        paginator = CustomPageNumberPagination()
-        paginator.page_size = request.GET.get('page_size') or 10
-        paginated_data = paginator.paginate_queryset(operations, request)
-
-        serializer = self.get_serializer(paginated_data, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return self.paginate_or_stream(operations)
 
     @swagger_auto_schema(
         operation_description="Vrací seznam typů operací.",
@@ -175,13 +188,34 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Vrací seznam všech operací s možností stránkování.
         """
-        operations = self.get_queryset()
-        paginator = CustomPageNumberPagination()
-        paginator.page_size = request.GET.get('page_size') or 10
-        paginated_data = paginator.paginate_queryset(operations, request)
+        return self.paginate_or_stream(self.get_queryset())
 
-        serializer = self.get_serializer(paginated_data, many=True)
-        return paginator.get_paginated_response(serializer.data)
+    @swagger_auto_schema(
+        operation_description="Export operací s řádky (skupinami) jako CSV nebo XLSX – streamovaně.",
+        manual_parameters=[
+            openapi.Parameter("file_type", openapi.IN_QUERY, description="Formát (csv, xlsx)", type=openapi.TYPE_STRING),
+            openapi.Parameter("client", openapi.IN_QUERY, description="ID klienta", type=openapi.TYPE_STRING),
+        ],
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Export operací s řádky – jeden řádek na skupinu operace (operace bez skupin mají jeden
+        prázdný řádek). Data se čtou server-side kurzorem a odesílají průběžně.
+        """
+        rows = (
+            self.get_queryset()
+            .order_by('-updated_at', 'id', 'groups__id')
+            .values_list(
+                'number', 'type', 'status', 'client__name', 'created_at', 'updated_at',
+                'groups__batch__product__sku', 'groups__batch__product__name', 'groups__batch__batch_number',
+                'groups__batch__expiration_date', 'groups__box__ean', 'groups__quantity',
+            )
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        header = ('Číslo', 'Typ', 'Stav', 'Klient', 'Vytvořeno', 'Upraveno',
+                  'SKU', 'Produkt', 'Šarže', 'Expirace', 'EAN krabice', 'Množství')
+        return export_response(request, 'operace', header, rows)
 
     @swagger_auto_schema(
         operation_description="Vytváří novou operaci typu 'IN' nebo 'OUT'.",
@@ -275,20 +309,22 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
 
     @swagger_auto_schema(
         operation_description="Vymaže operaci podle ID.",
-        responses={200: openapi.Response(description="Smazáno")}
+        responses={200: openapi.Response(description="Smazáno"), 409: "Zboží příjemky je už použito v jiné operaci"}
     )
     @action(detail=True, methods=['delete'], url_path='remove')
     def remove_operation(self, request, pk=None):
         """
-        Vymaže operaci podle ID.
+        Vymaže operaci podle ID a vrátí její pohyby zásob.
 
         :param pk: ID operace
-        :return: JSON odpověď s potvrzením nebo chybou
+        :return: JSON odpověď s potvrzením nebo chybou (409 – zboží příjemky je už v jiné operaci)
         """
         operation = get_object_or_404(Operation, id=pk)
         try:
-            remove_operation(operation)
+            remove_operation(operation, user=request.user)
             return Response({"message": "Operace byla úspěšně smazána."}, status=200)
+        except ReversalConflict as e:
+            return Response({"error": str(e), "consumed": e.consumed}, status=409)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
 
@@ -309,14 +345,7 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
         :param pk: ID operace
         :return: JSON odpověď s potvrzením nebo chybou
         """
-        operation = get_object_or_404(Operation, id=pk)
-        new_status = request.data.get('status')
-        try:
-            operation.status = new_status
-            operation.save(user=request.user)
-            return Response({"message": "Status úěspěšně změněn"}, status=200)
-        except Exception as e:
-            return Response({"error": str(e)}, status=400)
+        return self._transition(request, pk, request.data.get('status'), "Status úěspěšně změněn")
 
     @swagger_auto_schema(
         operation_description="Přidá produkt z operace do zvolené krabice.",
@@ -361,6 +390,22 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
         summary = get_operation_product_summary(pk)
         return Response(summary, status=200)
 
+    @swagger_auto_schema(
+        operation_description="Vrací pořadí vychystání skupin operace po skladech, pozicích a krabicích.",
+        responses={200: openapi.Response(description="Seznam zastávek (pozice) se skupinami k vychystání")}
+    )
+    @action(detail=True, methods=['get'], url_path='pick_path')
+    def pick_path(self, request, pk=None):
+        """
+        Vrací pořadí vychystání – každá pozice je jedna zastávka, skupiny bez pozice jsou na konci.
+
+        :param pk: ID operace
+        :return: JSON se seznamem zastávek
+        """
+        operation = get_object_or_404(Operation.objects.only('id'), id=pk,
+                                      client_id__in=request.user.client.values_list('id', flat=True))
+        return Response(location_service.pick_path(operation.id), status=200)
+
     @swagger_auto_schema(
         operation_description="Uzavře krabici podle ID.",
         request_body=openapi.Schema(
@@ -396,14 +441,7 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
         :param pk: ID operace
         :return: JSON s potvrzením
         """
-        try:
-            operation = get_object_or_404(Operation, id=pk)
-            operation.status = 'BOX'
-            operation.save()
-        except Exception as e:
-            return Response({"error": str(e)}, status=400)
-
-        return Response({"message": "Krabice uzavřena"}, status=200)
+        return self._transition(request, pk, 'BOX', "Krabice uzavřena")
 
     @swagger_auto_schema(
         operation_description="Dokončí balení operace, nastaví status na 'COMPLETED'.",
@@ -417,12 +455,115 @@ class OperationViewSet(viewsets.ReadOnlyModelViewSet):
         :param pk: ID operace
         :return: JSON s potvrzením nebo chybou
         """
-        operation = get_object_or_404(Operation, id=pk)
+        return self._transition(request, pk, 'COMPLETED', "Operace byla úspěšně dokončena",
+                                conflict_error="Operace není ve stavu BOX")
 
-        if operation.status != "BOX":
-            return Response({"error": "Operace není ve stavu BOX"}, status=400)
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Hromadně změní stav operací. Operace se zadávají seznamem `ids` nebo filtrem "
+                              "`filter` (status, type, client). Vrací výsledek pro každé ID.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'status': openapi.Schema(type=openapi.TYPE_STRING),
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_INTEGER)),
+                'filter': openapi.Schema(type=openapi.TYPE_OBJECT),
+            },
+            required=['status']
+        ),
+        responses={200: openapi.Response(description="Výsledky po operacích")}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_transition')
+    def bulk_transition(self, request):
+        """
+        Hromadná změna stavu operací (např. dokončení výdejek na konci směny).
+
+        :param request: HTTP POST s 'status' a 'ids' nebo 'filter'
+        :return: JSON s výsledkem pro každé ID ('ok', 'conflict', 'not_found')
+        """
+        return self._bulk_transition(request, request.data.get('status'))
+
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Hromadně zruší operace (stav CANCELLED). Operace se zadávají seznamem `ids` "
+                              "nebo filtrem `filter` (status, type, client).",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_INTEGER)),
+                'filter': openapi.Schema(type=openapi.TYPE_OBJECT),
+            }
+        ),
+        responses={200: openapi.Response(description="Výsledky po operacích")}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_cancel')
+    def bulk_cancel(self, request):
+        """
+        Hromadné zrušení operací.
+
+        :param request: HTTP POST s 'ids' nebo 'filter'
+        :return: JSON s výsledkem pro každé ID ('ok', 'conflict', 'not_found')
+        """
+        return self._bulk_transition(request, 'CANCELLED')
+
+    def _bulk_transition(self, request, new_status):
+        """
+        Společná část hromadných akcí – výběr operací (ID nebo filtr) a přechod `transition_service`.
+        """
+        client_ids = list(request.user.client.values_list('id', flat=True))
+        ids = request.data.get('ids')
+        filters = request.data.get('filter')
+        try:
+            if ids is None and isinstance(filters, dict):
+                ids = self._filtered_ids(filters, client_ids)
+            if not isinstance(ids, list):
+                raise ValueError("Zadejte seznam 'ids' nebo objekt 'filter'.")
+            results = transition_service.bulk_transition(ids, new_status, user=request.user, client_ids=client_ids)
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=400)
+
+        return Response({
+            "status": new_status,
+            "updated": sum(1 for result in results.values() if result['result'] == 'ok'),
+            "results": [{"id": operation_id, **result} for operation_id, result in results.items()],
+        }, status=200)
+
+    def _filtered_ids(self, filters, client_ids):
+        """
+        ID operací klientů uživatele odpovídající filtru (nejvýš `MAX_BULK`).
+        """
+        unknown = set(filters) - set(self.BULK_FILTERS)
+        if unknown:
+            raise ValueError(f"Neznámý filtr: {', '.join(sorted(unknown))}.")
+        ids = list(
+            Operation.objects.filter(client_id__in=client_ids, **{
+                self.BULK_FILTERS[key]: value for key, value in filters.items()
+            }).order_by('id').values_list('id', flat=True)[:transition_service.MAX_BULK + 1]
+        )
+        if len(ids) > transition_service.MAX_BULK:
+            raise ValueError(f"Filtru odpovídá víc než {transition_service.MAX_BULK} operací.")
+        return ids
+
+    def _transition(self, request, pk, new_status, message, conflict_error=None):
+        """
+        Změní stav operace podmíněným UPDATE (`transition_service`) – bez načtení řádku předem.
 
-        operation.status = "COMPLETED"
-        operation.save()
+        Stavové kódy zůstávají jako při ukládání instance: operace už v cílovém stavu je 200 beze
+        změny (jen bez `conflict_error`), nepovolený přechod 400.
 
-        return Response({"message": "Operace byla úspěšně dokončena"}, status=200)
\ No newline at end of file
+        :param conflict_error: (volitelné) Chybová hláška pro operaci mimo povolený předchozí stav
+                               (i v cílovém stavu), např. dokončení balení mimo stav BOX
+        :return: 200 s potvrzením, 404 neexistující operace, 400 nepovolený přechod
+        """
+        client_ids = list(request.user.client.values_list('id', flat=True))
+        try:
+            previous_status = transition_service.transition(pk, new_status, user=request.user, client_ids=client_ids)
+        except TransitionConflict as e:
+            if e.current is None:
+                return Response({"error": str(e)}, status=404)
+            if e.current == new_status and conflict_error is None:
+                return Response({"message": message, "previous_status": e.current, "status": new_status}, status=200)
+            return Response({"error": conflict_error or str(e), "status": e.current}, status=400)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"message": message, "previous_status": previous_status, "status": new_status}, status=200)
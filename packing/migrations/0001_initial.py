@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-17 14:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('operation', '0010_operation_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackingSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('OPEN', 'Otevřená'), ('CLOSED', 'Uzavřená')], default='OPEN', max_length=20)),
+                ('products', models.JSONField(blank=True, default=dict)),
+                ('pending', models.JSONField(blank=True, default=dict)),
+                ('pending_scans', models.PositiveIntegerField(default=0)),
+                ('scanned_total', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('flushed_at', models.DateTimeField(blank=True, null=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('operation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='packing_sessions', to='operation.operation')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='packingsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'OPEN')), fields=('operation',), name='packing_session_open_uniq'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class PackingSession(models.Model):
+    """
+    Balení výdejky skenováním do krabic.
+
+    Počty zbývajících kusů po produktech jsou uložené přímo v relaci (`products`), takže sken
+    je jen úprava čítače. Naskenované kusy se sčítají po (krabice, produkt) v `pending`
+    a do skupin se zapisují hromadně – průběžně po `packing_service.FLUSH_SCANS` skenech a při uzavření.
+    """
+    STATUS_CHOICES = [
+        ('OPEN', 'Otevřená'),
+        ('CLOSED', 'Uzavřená'),
+    ]
+
+    operation = models.ForeignKey('operation.Operation', on_delete=models.CASCADE, related_name='packing_sessions')
+    user = models.ForeignKey('user.User', on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OPEN')
+
+    # {product_id: {"id", "name", "total_quantity", "rescanned"}} – stejný tvar jako souhrn operace
+    products = models.JSONField(default=dict, blank=True)
+    # {"box_id:product_id": množství} – naskenováno, ale ještě nezapsáno do skupin
+    pending = models.JSONField(default=dict, blank=True)
+    pending_scans = models.PositiveIntegerField(default=0)
+    scanned_total = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    flushed_at = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # Výdejka má nejvýš jednu otevřenou relaci balení
+            models.UniqueConstraint(fields=['operation'], condition=models.Q(status='OPEN'),
+                                    name='packing_session_open_uniq'),
+        ]
+
+    def __str__(self):
+        return f'Balení {self.operation_id} #{self.pk} ({self.status})'
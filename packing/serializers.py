@@ -0,0 +1,31 @@
+from rest_framework import serializers
+
+from packing.models import PackingSession
+
+
+class PackingSessionSerializer(serializers.ModelSerializer):
+    products = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PackingSession
+        fields = [
+            'id', 'operation', 'status', 'products', 'pending_scans', 'scanned_total',
+            'created_at', 'updated_at', 'flushed_at', 'closed_at',
+        ]
+        read_only_fields = fields
+
+    def get_products(self, session):
+        return [
+            {**product, 'remaining': product['total_quantity'] - product['rescanned']}
+            for product in session.products.values()
+        ]
+
+
+class PackingOpenSerializer(serializers.Serializer):
+    operation = serializers.IntegerField()
+
+
+class PackingScanSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    box_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
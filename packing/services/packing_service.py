@@ -0,0 +1,333 @@
+import logging
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from box.models import Box
+from group.models import Group
+from group.services import compaction_service
+from history.models import History
+from history.services import history_writer
+from operation.models import Operation
+from operation.services import summary_service
+from packing.models import PackingSession
+from search.services import search_service
+from stock.services.ledger_service import build_movement, operation_sign, record_movements
+
+logger = logging.getLogger(__name__)
+
+# Po kolika skenech se naskenované kusy průběžně zapíší do skupin
+FLUSH_SCANS = 100
+
+
+def product_counters(operation_id):
+    """
+    Souhrn produktů operace – celkové a přebalené (rescanned) množství. Jeden agregační dotaz.
+
+    :param operation_id: ID operace
+    :return: Slovník {product_id: {"id", "name", "total_quantity", "rescanned"}}
+    """
+    rows = (
+        Group.objects.filter(operations__id=operation_id)
+        .values(product_id=F('batch__product_id'), name=F('batch__product__name'))
+        .annotate(total_quantity=Sum('quantity'), rescanned=Sum('quantity', filter=Q(rescanned=True)))
+        .order_by('product_id')
+    )
+    return {
+        row['product_id']: {
+            'id': row['product_id'],
+            'name': row['name'],
+            'total_quantity': row['total_quantity'],
+            'rescanned': row['rescanned'] or 0,
+        }
+        for row in rows
+    }
+
+
+def pack_groups(operation, entries, user=None):
+    """
+    Hromadně přebalí kusy výdejky do krabic.
+
+    Bere nepřebalené skupiny produktu v pořadí ID: celá skupina se přesune do krabice,
+    z poslední se oddělí jen potřebné množství (nová skupina zůstává ve všech operacích původní).
+    Skupiny, vazby, pohyby skladové knihy i historie se zapisují hromadně. Nakonec se skupiny
+    dotčených šarží se stejnou krabicí a operacemi sloučí (`compaction_service.merge_batches`).
+
+    :param operation: Výdejka
+    :param entries: Seznam (box_id, product_id, množství)
+    :param user: (volitelné) Uživatel pro historii
+    :return: Seznam přesunutých a nově vzniklých skupin (bez skupin sloučených do jiné)
+    """
+    demand = defaultdict(list)
+    for box_id, product_id, quantity in entries:
+        if quantity > 0:
+            demand[product_id].append((box_id, quantity))
+    if not demand:
+        return []
+
+    through = Operation.groups.through
+
+    with transaction.atomic():
+        groups = list(
+            operation.groups.filter(batch__product_id__in=list(demand), rescanned=False)
+            .select_related('batch')
+            .select_for_update(of=('self',))
+            .order_by('id')
+        )
+        available = defaultdict(list)
+        for group in groups:
+            available[group.batch.product_id].append(group)
+
+        memberships = defaultdict(list)
+        for group_id, operation_id, operation_type in through.objects.filter(
+                group_id__in=[group.id for group in groups]).values_list('group_id', 'operation_id', 'operation__type'):
+            memberships[group_id].append((operation_id, operation_type))
+
+        original_quantities = {group.id: group.quantity for group in groups}
+        movements = []
+        moved = []
+        parts = []
+
+        for product_id, lines in demand.items():
+            requested = sum(quantity for _, quantity in lines)
+            total_available = sum(group.quantity for group in available[product_id])
+            if requested > total_available:
+                raise ValidationError(
+                    f"Požadované množství ({requested}) převyšuje dostupné množství ({total_available}).")
+
+            queue = iter(available[product_id])
+            group = next(queue)
+            for box_id, need in lines:
+                while need:
+                    if group.quantity <= need:
+                        # Celá skupina do krabice – výdej ze staré krabice, příjem do nové
+                        for operation_id, operation_type in memberships[group.id]:
+                            sign = operation_sign(operation_type)
+                            movements.append(build_movement(group, operation_id, -sign * group.quantity))
+                            movements.append(build_movement(group, operation_id, sign * group.quantity, box_id=box_id))
+                        need -= group.quantity
+                        group.box_id = box_id
+                        group.rescanned = True
+                        moved.append(group)
+                        group = next(queue, None)
+                    else:
+                        # Původní krabici si uložíme – zbytek skupiny se může ještě přesunout celý
+                        parts.append((group, group.box_id,
+                                      Group(batch=group.batch, box_id=box_id, quantity=need, rescanned=True)))
+                        group.quantity -= need
+                        need = 0
+
+        created = Group.objects.bulk_create([part for _, _, part in parts])
+        new_links = []
+        history = []
+        for source, source_box_id, part in parts:
+            history.append(History(type="group", related_id=part.id, user=user,
+                                   description=f"Vytvořena nová skupina s množstvím {part.quantity}"))
+            for operation_id, operation_type in memberships[source.id]:
+                new_links.append(through(operation_id=operation_id, group_id=part.id))
+                # Oddělená část přechází z původní skupiny do nové krabice – čítače se nemění
+                sign = operation_sign(operation_type)
+                movements.append(build_movement(source, operation_id, -sign * part.quantity, box_id=source_box_id))
+                movements.append(build_movement(part, operation_id, sign * part.quantity))
+
+        for group in groups:
+            if group.quantity != original_quantities[group.id]:
+                history.append(History(type="group", related_id=group.id, user=user,
+                                       description=f"Změněno množství z {original_quantities[group.id]} "
+                                                   f"na {group.quantity}"))
+
+        through.objects.bulk_create(new_links, batch_size=1000)
+        changed = {group.id: group for group in moved}
+        changed.update((source.id, source) for source, _, _ in parts)
+        Group.objects.bulk_update(list(changed.values()), ['quantity', 'box', 'rescanned'], batch_size=1000)
+
+        record_movements(movements)
+        history_writer.record_many(history)
+        search_service.schedule_instances([*created, *moved])
+
+        # Vazby zapsané hromadně neodesílají m2m_changed – souhrny přepočítáme sami
+        summary_service.refresh_operation_summaries(
+            operation_id for links in memberships.values() for operation_id, _ in links
+        )
+
+        # Kusy přebalené do stejné krabice po částech se hned sloučí do jedné skupiny
+        merged = compaction_service.merge_batches({group.batch_id for group in groups}, user=user)
+
+    return [group for group in [*moved, *created] if group.id not in merged]
+
+
+def open_session(operation, user=None):
+    """
+    Otevře relaci balení výdejky ve stavu BOX, případně vrátí už otevřenou.
+
+    :param operation: Výdejka
+    :param user: (volitelné) Uživatel, který balí
+    :return: Tuple (relace, zda byla založena)
+    """
+    if operation.status != 'BOX':
+        raise ValidationError("Operace není ve stavu BOX")
+
+    counters = product_counters(operation.id)
+    return PackingSession.objects.get_or_create(
+        operation=operation,
+        status='OPEN',
+        defaults={'user': user, 'products': {str(product_id): row for product_id, row in counters.items()}},
+    )
+
+
+def open_session_for(operation_id):
+    """
+    Otevřená relace balení operace.
+
+    :param operation_id: ID operace
+    :return: PackingSession nebo None
+    """
+    return PackingSession.objects.filter(operation_id=operation_id, status='OPEN').first()
+
+
+def _locked(session):
+    session = (
+        PackingSession.objects.select_related('operation')
+        .select_for_update(of=('self',))
+        .get(pk=session.pk)
+    )
+    if session.status != 'OPEN':
+        raise ValidationError("Relace balení je uzavřená.")
+    return session
+
+
+def scan(session, scans, flush=False):
+    """
+    Zaznamená skeny – sníží zbývající množství produktů v relaci. Dávka se přijme celá,
+    nebo vůbec. Do skupin se kusy zapíší hromadně po `FLUSH_SCANS` skenech.
+
+    :param session: Relace balení
+    :param scans: Seznam {"product_id", "box_id", "quantity"}
+    :param flush: Zapsat skeny do skupin hned (bez čekání na `FLUSH_SCANS`)
+    :return: Aktualizovaná relace
+    """
+    with transaction.atomic():
+        session = _locked(session)
+        if session.operation.status != 'BOX':
+            raise ValidationError("Operace není ve stavu BOX")
+
+        box_ids = {item['box_id'] for item in scans}
+        missing = box_ids - set(Box.objects.filter(id__in=box_ids).values_list('id', flat=True))
+        if missing:
+            raise ValidationError(f"Krabice {', '.join(map(str, sorted(missing)))} neexistuje.")
+
+        for item in scans:
+            product = session.products.get(str(item['product_id']))
+            if product is None:
+                raise ValidationError(f"Produkt {item['product_id']} není ve výdejce.")
+            remaining = product['total_quantity'] - product['rescanned']
+            if item['quantity'] > remaining:
+                raise ValidationError(
+                    f"Požadované množství ({item['quantity']}) převyšuje dostupné množství ({remaining}).")
+            product['rescanned'] += item['quantity']
+            key = f"{item['box_id']}:{item['product_id']}"
+            session.pending[key] = session.pending.get(key, 0) + item['quantity']
+
+        session.pending_scans += len(scans)
+        session.scanned_total += sum(item['quantity'] for item in scans)
+        if flush or session.pending_scans >= FLUSH_SCANS:
+            _flush(session)
+        session.save()
+    return session
+
+
+def _flush(session):
+    """
+    Zapíše naskenované kusy do skupin (bez uložení relace).
+
+    Pokud čítače relace neodpovídají skupinám (kusy zabalené mimo relaci), zapíše se jen to,
+    co ještě zbývá, nadbytečné skeny se zahodí a čítače se načtou znovu ze skupin – relace
+    tak zůstane použitelná a půjde uzavřít.
+    """
+    entries = []
+    for key, quantity in session.pending.items():
+        box_id, product_id = key.split(':')
+        entries.append((int(box_id), int(product_id), quantity))
+    try:
+        pack_groups(session.operation, entries, user=session.user)
+    except ValidationError:
+        counters = product_counters(session.operation_id)
+        fitted = _fit(entries, counters)
+        dropped = sum(quantity for _, _, quantity in entries) - sum(quantity for _, _, quantity in fitted)
+        logger.warning("Relace balení %s: čítače neodpovídají skupinám, zahozeno %s ks skenů.", session.id, dropped)
+        pack_groups(session.operation, fitted, user=session.user)
+        session.products = {str(product_id): row for product_id, row in
+                            product_counters(session.operation_id).items()}
+    session.pending = {}
+    session.pending_scans = 0
+    session.flushed_at = timezone.now()
+
+
+def _fit(entries, counters):
+    """
+    Omezí skeny na množství, které v operaci ještě zbývá přebalit.
+
+    :param entries: Seznam (box_id, product_id, množství)
+    :param counters: Čítače produktů ze skupin (`product_counters`)
+    :return: Seznam (box_id, product_id, množství) bez nadbytečných kusů
+    """
+    remaining = {product_id: row['total_quantity'] - row['rescanned'] for product_id, row in counters.items()}
+    fitted = []
+    for box_id, product_id, quantity in entries:
+        quantity = min(quantity, remaining.get(product_id, 0))
+        if quantity > 0:
+            remaining[product_id] -= quantity
+            fitted.append((box_id, product_id, quantity))
+    return fitted
+
+
+def _close(session):
+    session.status = 'CLOSED'
+    session.closed_at = timezone.now()
+    session.save()
+
+
+def close_session(session):
+    """
+    Zapíše zbývající skeny do skupin a uzavře relaci. Pokud operace už není ve stavu BOX,
+    nezapsané skeny se zahodí – skupiny operace mimo balení se nemění.
+
+    :param session: Relace balení
+    :return: Uzavřená relace
+    """
+    with transaction.atomic():
+        session = _locked(session)
+        if session.operation.status == 'BOX':
+            _flush(session)
+        else:
+            session.pending = {}
+            session.pending_scans = 0
+        _close(session)
+    return session
+
+
+def close_open_sessions(operation_ids):
+    """
+    Zapíše skeny a uzavře otevřené relace operací, které opouštějí stav BOX
+    (volá `transition_service` ve stejné transakci jako změnu stavu).
+
+    :param operation_ids: ID operací
+    :return: Počet uzavřených relací
+    """
+    operation_ids = list(operation_ids)
+    if not operation_ids:
+        return 0
+    sessions = list(
+        PackingSession.objects.filter(operation_id__in=operation_ids, status='OPEN')
+        .select_related('operation', 'user')
+        .select_for_update(of=('self',))
+        .order_by('id')
+    )
+    for session in sessions:
+        if session.pending:
+            _flush(session)
+        _close(session)
+    return len(sessions)
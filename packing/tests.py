@@ -0,0 +1,152 @@
+import pytest
+
+from group.models import Group
+from operation.models import Operation
+from operation.services.operation_service import (
+    add_group_to_in_operation, add_group_to_out_operation, create_new_box
+)
+from packing.models import PackingSession
+from packing.services import packing_service
+from product.models import Product
+
+
+# Fixture pro výdejku ve stavu BOX se 7 ks produktu (vydáno z příjemky s 10 ks)
+@pytest.fixture
+def boxed_operation(user_with_client):
+    client = user_with_client.client.first()
+    product = Product.objects.create(name="Balený produkt", sku="PACK-1", client=client)
+    incoming = Operation.objects.create(number="IN-PACK", type="IN", client=client)
+    add_group_to_in_operation(incoming, product.id, "P1", create_new_box("PACK-SKLAD").id, 10)
+    outgoing = Operation.objects.create(number="OUT-PACK", type="OUT", client=client)
+    add_group_to_out_operation(outgoing, product.id, 7, "P1")
+    outgoing.status = "BOX"
+    outgoing.save()
+    return outgoing
+
+
+@pytest.mark.django_db
+class TestPackingSession:
+
+    # Skeny jen upravují čítače relace, skupiny se zapíší hromadně při uzavření
+    def test_scan_and_close(self, authenticated_client, boxed_operation):
+        product = Product.objects.get(sku="PACK-1")
+        first, second = create_new_box("KRABICE-1"), create_new_box("KRABICE-2")
+
+        response = authenticated_client.post("/api/packing-sessions/", {"operation": boxed_operation.id}, format="json")
+        assert response.status_code == 201
+        session_id = response.data["id"]
+        # Opakované otevření vrátí stejnou relaci
+        assert authenticated_client.post("/api/packing-sessions/", {"operation": boxed_operation.id},
+                                         format="json").data["id"] == session_id
+
+        for _ in range(3):
+            authenticated_client.post(f"/api/packing-sessions/{session_id}/scan/",
+                                      {"product_id": product.id, "box_id": first.id}, format="json")
+        response = authenticated_client.post(f"/api/packing-sessions/{session_id}/scan/", {"scans": [
+            {"product_id": product.id, "box_id": first.id, "quantity": 2},
+            {"product_id": product.id, "box_id": second.id, "quantity": 2},
+        ]}, format="json")
+        assert response.status_code == 200
+        assert response.data["products"][0]["remaining"] == 0
+        assert response.data["pending_scans"] == 5
+
+        # Souhrn operace čte čítače relace, skupiny se zatím nezměnily
+        summary = authenticated_client.get(f"/api/operations/{boxed_operation.id}/product_summary/").data
+        assert summary == [{"id": product.id, "name": "Balený produkt", "total_quantity": 7, "rescanned": 7}]
+        assert not boxed_operation.groups.filter(rescanned=True).exists()
+
+        # Přes zbývající množství sken neprojde
+        response = authenticated_client.post(f"/api/packing-sessions/{session_id}/scan/",
+                                             {"product_id": product.id, "box_id": first.id}, format="json")
+        assert response.status_code == 400
+
+        response = authenticated_client.post(f"/api/packing-sessions/{session_id}/close/")
+        assert response.status_code == 200
+        assert response.data["status"] == "CLOSED"
+
+        packed = boxed_operation.groups.filter(rescanned=True)
+        assert sorted(packed.values_list("box_id", "quantity")) == [(first.id, 5), (second.id, 2)]
+        assert sum(Group.objects.filter(batch__product=product).values_list("quantity", flat=True)) == 10
+        product.refresh_from_db()
+        assert product.amount_cached == 3
+
+    # Průběžný zápis po FLUSH_SCANS skenech; relaci lze otevřít jen pro operaci ve stavu BOX
+    def test_periodic_flush(self, monkeypatch, authenticated_client, boxed_operation):
+        monkeypatch.setattr(packing_service, "FLUSH_SCANS", 2)
+        product = Product.objects.get(sku="PACK-1")
+        box = create_new_box("KRABICE-3")
+        session, _ = packing_service.open_session(boxed_operation)
+
+        packing_service.scan(session, [{"product_id": product.id, "box_id": box.id, "quantity": 1}])
+        session = packing_service.scan(session, [{"product_id": product.id, "box_id": box.id, "quantity": 3}])
+        assert session.pending == {} and session.flushed_at is not None
+        assert list(boxed_operation.groups.filter(rescanned=True).values_list("box_id", "quantity")) == [(box.id, 4)]
+
+        created = Operation.objects.create(number="OUT-NOVA", type="OUT", client=boxed_operation.client)
+        response = authenticated_client.post("/api/packing-sessions/", {"operation": created.id}, format="json")
+        assert response.status_code == 400
+        assert PackingSession.objects.count() == 1
+
+    # Opuštění stavu BOX (jednotlivě i hromadně) zapíše skeny relace a uzavře ji
+    @pytest.mark.parametrize("bulk", [False, True])
+    def test_leaving_box_flushes_session(self, boxed_operation, bulk):
+        from operation.services import transition_service
+
+        product = Product.objects.get(sku="PACK-1")
+        box = create_new_box("KRABICE-4")
+        session, _ = packing_service.open_session(boxed_operation)
+        packing_service.scan(session, [{"product_id": product.id, "box_id": box.id, "quantity": 7}])
+
+        if bulk:
+            transition_service.bulk_transition([boxed_operation.id], "COMPLETED")
+        else:
+            transition_service.transition(boxed_operation.id, "COMPLETED")
+
+        session.refresh_from_db()
+        assert session.status == "CLOSED" and session.pending == {}
+        assert list(boxed_operation.groups.values_list("box_id", "rescanned", "quantity")) == [(box.id, True, 7)]
+
+        # Uzavření relace mimo stav BOX skupiny nemění, nezapsané skeny zahodí
+        other, _ = PackingSession.objects.get_or_create(operation=boxed_operation, status="OPEN",
+                                                        defaults={"pending": {f"{box.id}:{product.id}": 1}})
+        assert packing_service.close_session(other).pending == {}
+        assert boxed_operation.groups.count() == 1
+
+    # Přebalení mimo relaci jde přes její čítače; rozjeté čítače relaci nezablokují
+    def test_add_product_to_box_uses_session(self, boxed_operation):
+        from django.core.exceptions import ValidationError
+        from operation.services.operation_service import add_product_to_box
+
+        product = Product.objects.get(sku="PACK-1")
+        box = create_new_box("KRABICE-5")
+        session, _ = packing_service.open_session(boxed_operation)
+
+        add_product_to_box(boxed_operation.id, box.id, product.id, 5)
+        session.refresh_from_db()
+        assert session.products[str(product.id)]["rescanned"] == 5 and session.pending == {}
+        with pytest.raises(ValidationError):
+            packing_service.scan(session, [{"product_id": product.id, "box_id": box.id, "quantity": 7}])
+
+        # Čítače relace neodpovídají skupinám (zabaleno přímo) – zapíše se jen zbytek, relace jde uzavřít
+        packing_service.scan(session, [{"product_id": product.id, "box_id": box.id, "quantity": 2}])
+        packing_service.pack_groups(boxed_operation, [(box.id, product.id, 1)])
+        session = packing_service.close_session(session)
+        assert session.status == "CLOSED"
+        assert session.products[str(product.id)]["rescanned"] == 7
+        assert sum(boxed_operation.groups.filter(rescanned=True).values_list("quantity", flat=True)) == 7
+
+    # Část skupiny do jedné krabice a zbytek celý do druhé – výdej části jde z původní krabice
+    def test_split_then_move_keeps_location_stock(self, user_with_client):
+        from stock.models import LocationStock
+
+        client = user_with_client.client.first()
+        product = Product.objects.create(name="Dělený produkt", sku="PACK-2", client=client)
+        source = create_new_box("PACK-ZDROJ")
+        incoming = Operation.objects.create(number="IN-SPLIT", type="IN", client=client)
+        add_group_to_in_operation(incoming, product.id, "S1", source.id, 10)
+        first, second = create_new_box("PACK-A"), create_new_box("PACK-B")
+
+        packing_service.pack_groups(incoming, [(first.id, product.id, 3), (second.id, product.id, 7)])
+
+        stock = dict(LocationStock.objects.filter(product=product).exclude(quantity=0).values_list("box_id", "quantity"))
+        assert stock == {first.id: 3, second.id: 7}
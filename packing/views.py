@@ -0,0 +1,106 @@
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from operation.models import Operation
+from packing.models import PackingSession
+from packing.serializers import PackingOpenSerializer, PackingScanSerializer, PackingSessionSerializer
+from packing.services import packing_service
+from utils.pagination import CustomPageNumberPagination
+
+
+class PackingSessionViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    PackingSessionViewSet – balení výdejky skenováním do krabic.
+
+    - `POST /packing-sessions/` otevře relaci pro výdejku ve stavu BOX (nebo vrátí už otevřenou)
+    - `POST /packing-sessions/{id}/scan/` přijme jeden sken nebo dávku `{"scans": [...]}`
+    - `POST /packing-sessions/{id}/close/` zapíše zbývající skeny do skupin a relaci uzavře
+    - `GET /packing-sessions/{id}/` vrací zbývající množství po produktech
+
+    Uživatel vidí jen relace operací svých klientů.
+    """
+    queryset = PackingSession.objects.all()
+    serializer_class = PackingSessionSerializer
+    pagination_class = CustomPageNumberPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return PackingSession.objects.filter(operation__client__in=self.request.user.client.all())
+
+    @swagger_auto_schema(
+        operation_description="Otevře relaci balení výdejky ve stavu BOX. Pokud už je otevřená, vrátí ji.",
+        request_body=PackingOpenSerializer,
+        responses={201: PackingSessionSerializer(), 200: PackingSessionSerializer()}
+    )
+    def create(self, request, *args, **kwargs):
+        data = PackingOpenSerializer(data=request.data)
+        data.is_valid(raise_exception=True)
+        operation = get_object_or_404(Operation, id=data.validated_data['operation'],
+                                      client__in=request.user.client.all())
+        try:
+            session, created = packing_service.open_session(operation, user=request.user)
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(PackingSessionSerializer(session).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Zaznamená sken (product_id, box_id, quantity) nebo dávku skenů v poli `scans`. "
+                              "Dávka se přijme celá, nebo vůbec.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'product_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'box_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'quantity': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'scans': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_OBJECT)),
+            }
+        ),
+        responses={200: PackingSessionSerializer()}
+    )
+    @action(detail=True, methods=['post'], url_path='scan')
+    def scan(self, request, pk=None):
+        """
+        Zaznamená skeny do relace – jen úprava čítačů, skupiny se zapisují hromadně.
+
+        :param pk: ID relace
+        :return: JSON se stavem relace
+        """
+        session = self.get_object()
+        scans = request.data.get('scans') if 'scans' in request.data else [request.data]
+        serializer = PackingScanSerializer(data=scans, many=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = packing_service.scan(session, serializer.validated_data)
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(PackingSessionSerializer(session).data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Zapíše zbývající skeny do skupin a uzavře relaci.",
+        responses={200: PackingSessionSerializer()}
+    )
+    @action(detail=True, methods=['post'], url_path='close')
+    def close(self, request, pk=None):
+        """
+        Uzavře relaci balení.
+
+        :param pk: ID relace
+        :return: JSON se stavem relace
+        """
+        try:
+            session = packing_service.close_session(self.get_object())
+        except ValidationError as e:
+            return Response({"error": " ".join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(PackingSessionSerializer(session).data, status=status.HTTP_200_OK)
@@ -1,30 +1,36 @@
 from django.db import models
 
-from history.models import History
+from history.services import history_writer
+from history.tracking import TrackedFieldsMixin
 
 
-class Position(models.Model):
+class Position(TrackedFieldsMixin, models.Model):
     code = models.CharField(max_length=100)
     warehouse = models.ForeignKey('warehouse.Warehouse', null=False, on_delete=models.CASCADE)
 
+    # Pole, jejichž změny se zapisují do historie
+    tracked_fields = ('code',)
+
     def __str__(self):
         return f'{self.code} ({self.warehouse.name})'
 
     def save(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         if self.pk:
-            previous = Position.objects.get(pk=self.pk)
-            if previous.code != self.code:
-                History.objects.create(
+            previous = self.tracked_previous()
+            if previous['code'] != self.code:
+                history_writer.record(
                     user=user,
                     type="position",
                     related_id=self.id,
-                    description=f"Změněn kód pozice z {previous.code} na {self.code}")
+                    description=f"Změněn kód pozice z {previous['code']} na {self.code}")
             super().save(*args, **kwargs)
+            self.refresh_tracked_snapshot()
 
         else:
             super().save(*args, **kwargs)
-            History.objects.create(
+            self.refresh_tracked_snapshot()
+            history_writer.record(
                 user=user,
                 type="position",
                 related_id=self.id,
@@ -32,7 +38,7 @@ class Position(models.Model):
 
     def delete(self, *args, **kwargs):
         user = kwargs.pop('user', None)
-        History.objects.create(
+        history_writer.record(
             user=user,
             type="position",
             related_id=self.id,
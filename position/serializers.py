@@ -4,6 +4,7 @@ from rest_framework import serializers
 from group.models import Group
 from position.models import Position
 from warehouse.models import Warehouse
+from search.services import search_service
 
 
 class PositionSerializer(serializers.ModelSerializer):
@@ -58,4 +59,6 @@ class PositionBulkSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Vytvoří více pozic najednou
-        return Position.objects.bulk_create([Position(**item) for item in validated_data])
\ No newline at end of file
+        positions = Position.objects.bulk_create([Position(**item) for item in validated_data])
+        search_service.schedule_instances(positions)
+        return positions
\ No newline at end of file
@@ -1,14 +1,13 @@
-from functools import reduce
-
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
 
 from position.models import Position
 from position.serializers import PositionSerializer
+from search.services import search_service
+from stock.services import location_service
 from utils.pagination import CustomPageNumberPagination
 
 
@@ -18,6 +17,7 @@ class PositionViewSet(viewsets.ModelViewSet):
 
    - Umožňuje vyhledávat podle názvu skladu, EAN krabice nebo kódu pozice.
    - Výsledky jsou stránkované pomocí `CustomPageNumberPagination`.
+   - Obsazenost pozic (`/occupancy/`) a obsah pozice (`/{id}/contents/`) ze zásob v krabicích.
    """
     queryset = Position.objects.all()
     serializer_class = PositionSerializer
@@ -90,26 +90,9 @@ class PositionViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        data_query = query.split(',')
-        if len(data_query) > 1:
-            data_query = [term.strip() for term in data_query if term.strip()]
-            query_filters = reduce(
-                lambda q, term: q |
-                                Q(warehouse__name__icontains=term) |
-                                Q(boxes__ean__icontains=term) |
-                                Q(code__icontains=term),
-                data_query,
-                Q()
-            )
-
-            positions = Position.objects.filter(query_filters).only("id")
-
-        else:
-            positions = Position.objects.filter(
-                Q(code__icontains=query) |
-                Q(boxes__ean__icontains=query) |
-                Q(warehouse__name__icontains=query)
-            )
+        terms = search_service.split_terms(query)
+        positions = Position.objects.filter(id__in=search_service.search('position', terms))
+        positions = search_service.rank(positions, 'position', terms)
 
         paginator = CustomPageNumberPagination()
         paginator.page_size = request.GET.get('page_size') or 10
@@ -117,3 +100,69 @@ class PositionViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(paginated_data, many=True)
         return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Obsazenost pozic – počet krabic se zbožím, počet SKU a množství "
+                              "(jen zboží klientů uživatele).",
+        manual_parameters=[
+            openapi.Parameter('client', openapi.IN_QUERY, description="ID klienta (volitelné)",
+                              type=openapi.TYPE_INTEGER),
+            openapi.Parameter('warehouse', openapi.IN_QUERY, description="ID skladu (volitelné)",
+                              type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Počet pozic",
+                              type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: openapi.Response(description="Seznam pozic sestupně podle počtu krabic")}
+    )
+    @action(detail=False, methods=['get'], url_path='occupancy')
+    def occupancy(self, request):
+        """
+        Obsazenost pozic zbožím klientů uživatele.
+
+        :param request: HTTP GET požadavek s volitelnými parametry `client`, `warehouse` a `limit`
+        :return: JSON seznam pozic s počtem krabic, SKU a množstvím
+        """
+        client_ids = self._client_ids(request)
+        try:
+            limit = int(request.GET.get('limit', location_service.MAX_LIMIT))
+        except ValueError:
+            return Response({"detail": "Parameter 'limit' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        warehouse_id = request.GET.get('warehouse') or None
+        if warehouse_id is not None:
+            try:
+                warehouse_id = int(warehouse_id)
+            except ValueError:
+                return Response({"detail": "Parameter 'warehouse' must be an integer."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        rows = location_service.occupancy(client_ids, warehouse_id, limit)
+        return Response(rows, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Obsah pozice po krabicích a šaržích (jen zboží klientů uživatele).",
+        responses={200: openapi.Response(description="Seznam zásob v krabicích na pozici")}
+    )
+    @action(detail=True, methods=['get'], url_path='contents')
+    def contents(self, request, pk=None):
+        """
+        Obsah pozice po krabicích a šaržích.
+
+        :param pk: ID pozice
+        :return: JSON seznam zásob (krabice, produkt, šarže, množství)
+        """
+        position = self.get_object()
+        return Response(location_service.position_contents(position.id, self._client_ids(request)),
+                        status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _client_ids(request):
+        """
+        Klienti uživatele, volitelně zúžení na parametr `client`.
+        """
+        client_ids = list(request.user.client.values_list('id', flat=True))
+        client_id = request.GET.get('client')
+        if client_id and client_id.isdigit() and int(client_id) in client_ids:
+            return [int(client_id)]
+        return client_ids
@@ -1,36 +1,21 @@
 from django.core.management.base import BaseCommand
-from collections import defaultdict
-from product.models import Product
-from operation.models import Operation
 
-class Command(BaseCommand):
-    help = "Přepočítá množství všech produktů a uloží je do amount_cached"
-
-    def handle(self, *args, **options):
-        self.stdout.write("📦 Spouštím přepočet množství...")
+from jobs.services import job_service
+from stock.services.ledger_service import recalculate_amounts
 
-        product_amounts = defaultdict(int)
 
-        # Všechny operace s přednačtenými skupinami, batch a produktem
-        operations = Operation.objects.prefetch_related(
-            "groups__batch__product"
-        )
-
-        for op in operations:
-            for group in op.groups.all():
-                product = getattr(group.batch, "product", None)
-                if not product:
-                    continue
-                if op.type == 'IN':
-                    product_amounts[product.id] += group.quantity
-                elif op.type == 'OUT':
-                    product_amounts[product.id] -= group.quantity
+class Command(BaseCommand):
+    help = "Přepočítá množství všech produktů a šarží a uloží je do amount_cached"
 
-        # Hromadný update všech produktů
-        products = Product.objects.filter(id__in=product_amounts.keys())
-        for p in products:
-            p.amount_cached = product_amounts[p.id]
+    def add_arguments(self, parser):
+        parser.add_argument("--background", action="store_true", help="Jen zařadí přepočet do fronty úloh")
 
-        Product.objects.bulk_update(products, ["amount_cached"])
+    def handle(self, *args, **options):
+        if options["background"]:
+            job = job_service.enqueue("stock.recalculate_amounts", unique=True)
+            self.stdout.write(self.style.SUCCESS(f"✅ Přepočet zařazen do fronty jako úloha #{job.id}."))
+            return
 
-        self.stdout.write(self.style.SUCCESS("✅ Hotovo – množství všech produktů aktualizováno."))
\ No newline at end of file
+        self.stdout.write("📦 Spouštím přepočet množství...")
+        recalculate_amounts()
+        self.stdout.write(self.style.SUCCESS("✅ Hotovo – množství všech produktů a šarží aktualizováno."))
@@ -1,14 +1,10 @@
-from datetime import timezone, datetime
-
 from django.db import models
-from django.db.models import Sum
 
-from group.models import Group
-from history.models import History
-from operation.models import Operation
+from history.services import history_writer
+from history.tracking import TrackedFieldsMixin
 
 
-class Product(models.Model):
+class Product(TrackedFieldsMixin, models.Model):
     sku = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -18,29 +14,24 @@ class Product(models.Model):
 
     _amount_override = models.IntegerField(null=True, blank=True)
 
+    # Pole, jejichž změny se zapisují do historie (klient kvůli kopii u šarží)
+    tracked_fields = ('name', 'sku', 'client_id')
+
     def __str__(self):
         return self.name or self.sku
 
     @property
     def amount(self):
         """
-        Dynamicky vypočítá množství produktu na základě sumy všech Group, kde je tento produkt.
+        Vrací aktuální množství produktu z čítače `amount_cached`.
+
+        Čítač udržuje skladová kniha (stock.services.ledger_service) ve stejné transakci jako pohyb.
         """
 
         if self._amount_override is not None:
             return self._amount_override
 
-        total_amount = 0
-        operations = Operation.objects.filter(groups__batch__product_id=self.id).only("groups__batch__product_id")
-        if len(operations) > 0:
-            for operation in operations:
-                if operation.type == 'IN':
-                    total_amount += sum(
-                        [group.quantity for group in operation.groups.filter(batch__product_id=self.id)])
-                if operation.type == 'OUT':
-                    total_amount -= sum(
-                        [group.quantity for group in operation.groups.filter(batch__product_id=self.id)])
-        return total_amount
+        return self.amount_cached
 
     def set_test_amount(self, value):
         """
@@ -51,19 +42,29 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         if self.pk:
-            previous = Product.objects.get(pk=self.pk)
-            if previous.name != self.name:
-                History.objects.create(
+            previous = self.tracked_previous()
+            if previous['name'] != self.name:
+                history_writer.record(
                     user=user,
                     type="product",
                     related_id=self.id,
-                    description=f"Změněn název produktu z {previous.name} na {self.name}"
+                    description=f"Změněn název produktu z {previous['name']} na {self.name}"
                 )
+            # Čítač zásob patří skladové knize – běžné uložení ho nepřepisuje
+            if not kwargs.get('update_fields'):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != 'amount_cached'
+                ]
             super().save(*args, **kwargs)
+            if previous['client_id'] != self.client_id:
+                self.batches.update(client_id=self.client_id)
+            self.refresh_tracked_snapshot()
 
         else:
             super().save(*args, **kwargs)
-            History.objects.create(
+            self.refresh_tracked_snapshot()
+            history_writer.record(
                 user=user,
                 type="product",
                 related_id=self.id,
@@ -72,7 +73,7 @@ class Product(models.Model):
 
     def delete(self, *args, **kwargs):
         user = kwargs.pop('user', None)
-        History.objects.create(
+        history_writer.record(
             user=user,
             type="product",
             related_id=self.id,
@@ -6,6 +6,7 @@ from batch.models import Batch
 from client.models import Client
 from group.models import Group
 from product.models import Product
+from search.services import search_service
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -50,7 +51,9 @@ class ProductSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Podpora hromadného vytváření, pokud přijde seznam objektů
         if isinstance(validated_data, list):
-            return Product.objects.bulk_create([Product(**item) for item in validated_data])
+            products = Product.objects.bulk_create([Product(**item) for item in validated_data])
+            search_service.schedule_instances(products)
+            return products
         return super().create(validated_data)
 
 
@@ -72,4 +75,6 @@ class ProductBulkSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # Vytvoří více produktů najednou pomocí `bulk_create`
-        return Product.objects.bulk_create([Product(**item) for item in validated_data])
\ No newline at end of file
+        products = Product.objects.bulk_create([Product(**item) for item in validated_data])
+        search_service.schedule_instances(products)
+        return products
\ No newline at end of file
@@ -1,4 +1,3 @@
-from functools import reduce
 from itertools import chain
 
 from drf_yasg import openapi
@@ -6,12 +5,14 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Sum, Prefetch
+from django.db.models import Sum, Prefetch
 
 from batch.models import Batch
 from group.models import Group
 from product.models import Product
 from product.serializers import ProductSerializer
+from search.services import search_service
+from stock.services import location_service
 from utils.pagination import CustomPageNumberPagination
 
 
@@ -24,7 +25,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     - filtrování podle klienta aktuálního uživatele
     - vyhledávání produktů podle názvu, popisu nebo SKU
     - hromadné vytvoření produktů (bulk_create)
-    - zjištění aktuálních zásob produktu
+    - zjištění aktuálních zásob produktu a jejich umístění (krabice a pozice)
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -130,6 +131,7 @@ class ProductViewSet(viewsets.ModelViewSet):
 
         if is_many:
             products = Product.objects.bulk_create([Product(**item) for item in serializer.validated_data])
+            search_service.schedule_instances(products)
             return Response(ProductSerializer(products, many=True).data, status=status.HTTP_201_CREATED)
 
         product = serializer.save()
@@ -161,16 +163,9 @@ class ProductViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        terms = [term.strip() for term in query.split(',') if term.strip()]
-        filters = reduce(
-            lambda acc, term: acc | Q(name__icontains=term) | Q(description__icontains=term) | Q(sku__icontains=term),
-            terms,
-            Q()
-        )
-
-        queryset = Product.objects.filter(filters)
-        if client_id:
-            queryset = queryset.filter(client_id=client_id)
+        terms = search_service.split_terms(query)
+        queryset = Product.objects.filter(id__in=search_service.search('product', terms, client_id))
+        queryset = search_service.rank(queryset, 'product', terms)
 
         paginator = CustomPageNumberPagination()
         paginator.page_size = request.GET.get('page_size') or 10
@@ -199,4 +194,20 @@ class ProductViewSet(viewsets.ModelViewSet):
             product = Product.objects.only('id', 'amount_cached').get(pk=pk)
             return Response({"available": product.amount_cached}, status=200)
         except Product.DoesNotExist:
-            return Response({"error": "Produkt nebyl nalezen"}, status=404)
\ No newline at end of file
+            return Response({"error": "Produkt nebyl nalezen"}, status=404)
+
+    @swagger_auto_schema(
+        responses={200: openapi.Response(description="Umístění produktu (sklad, pozice, krabice, šarže, množství)")},
+        operation_description="Vrací krabice a pozice, na kterých je produkt uložen."
+    )
+    @action(detail=True, methods=['get'], url_path='locations')
+    def get_product_locations(self, request, pk=None):
+        """
+        Vrací krabice a pozice, na kterých je produkt uložen.
+
+        :param request: HTTP GET požadavek
+        :param pk: ID produktu
+        :return: JSON seznam umístění seřazený podle skladu, pozice a krabice
+        """
+        product = self.get_object()
+        return Response(location_service.product_locations(product.id), status=200)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from search.services.search_service import DOCUMENT_ROWS, rebuild
+
+
+class Command(BaseCommand):
+    help = "Přepočítá vyhledávací dokumenty (SearchDocument) pro všechny nebo vybrané typy objektů"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", action="append", dest="entities", choices=list(DOCUMENT_ROWS),
+                            help="Typ dokumentu (lze zadat vícekrát), výchozí jsou všechny typy")
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔎 Spouštím přepočet vyhledávacího indexu...")
+
+        counts = rebuild(options.get("entities"))
+
+        summary = ", ".join(f"{entity}: {count}" for entity, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"✅ Hotovo – zaindexováno {summary}."))
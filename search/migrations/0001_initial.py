@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:44
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    GIN indexy pro PostgreSQL – `search_vector` vždy, trigramové indexy nad obsahem dokumentů
+    a popisem historie jen s rozšířením `pg_trgm` (jinak hledání funguje, jen bez indexu).
+    Na jiných databázích (SQLite v testech) se nic nevytváří.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        has_trigram = cursor.fetchone() is not None
+
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS search_document_vector_gin ON search_searchdocument USING gin (search_vector)'
+    )
+    if has_trigram:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS search_document_content_trgm '
+            'ON search_searchdocument USING gin (content gin_trgm_ops)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS history_description_trgm '
+            'ON history_history USING gin ((UPPER(description::text)) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS history_description_trgm')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('history', '0005_alter_history_options_remove_history_batch_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('product', 'Produkt'), ('batch', 'Šarže'), ('group', 'Skupina'), ('box', 'Krabice'), ('position', 'Pozice'), ('client', 'Klient')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('client_id', models.IntegerField(blank=True, null=True)),
+                ('content', models.TextField(blank=True, default='')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['entity', 'client_id'], name='search_sear_entity_aff9bf_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('entity', 'object_id'), name='search_document_unique_object'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,40 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalizovaný vyhledávací dokument – jeden řádek na objekt (produkt, šarže, skupina, ...).
+
+    `content` obsahuje malými písmeny spojené hodnoty všech prohledávaných polí objektu
+    i jeho vazeb, takže hledání je jeden indexovaný dotaz bez joinů. Na PostgreSQL je nad
+    `content` trigramový GIN index (hledání podřetězce) a `search_vector` s GIN indexem
+    slouží k řazení podle relevance.
+    """
+    ENTITY_CHOICES = [
+        ('product', 'Produkt'),
+        ('batch', 'Šarže'),
+        ('group', 'Skupina'),
+        ('box', 'Krabice'),
+        ('position', 'Pozice'),
+        ('client', 'Klient'),
+    ]
+
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    # Klient objektu (bez cizího klíče – jen pro filtr bez joinu)
+    client_id = models.IntegerField(null=True, blank=True)
+    content = models.TextField(blank=True, default='')
+    search_vector = SearchVectorField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity', 'object_id'], name='search_document_unique_object'),
+        ]
+        indexes = [
+            models.Index(fields=['entity', 'client_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.entity} #{self.object_id}'
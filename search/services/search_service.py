@@ -0,0 +1,286 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery
+
+from batch.models import Batch
+from box.models import Box
+from client.models import Client
+from group.models import Group
+from history.models import History
+from position.models import Position
+from product.models import Product
+from search.models import SearchDocument
+from utils.transaction_buffer import TransactionBuffer
+
+# Po kolika objektech se dokumenty přepočítávají a ukládají
+CHUNK_SIZE = 1000
+
+# Oddělovač polí v obsahu dokumentu (hledaný výraz tak nespojí konec jednoho pole se začátkem dalšího)
+SEPARATOR = ' | '
+
+
+def _product_rows(ids):
+    for product_id, client_id, *fields in Product.objects.filter(id__in=ids).values_list(
+            'id', 'client_id', 'name', 'description', 'sku'):
+        yield product_id, client_id, fields
+
+
+def _batch_rows(ids):
+    for batch_id, client_id, *fields in Batch.objects.filter(id__in=ids).values_list(
+            'id', 'product__client_id', 'product__name', 'product__sku', 'batch_number', 'expiration_date'):
+        yield batch_id, client_id, fields
+
+
+def _group_rows(ids):
+    for group_id, client_id, *fields in Group.objects.filter(id__in=ids).values_list(
+            'id', 'batch__product__client_id', 'batch__batch_number', 'batch__product__sku',
+            'batch__product__name', 'box__ean'):
+        yield group_id, client_id, [group_id, *fields]
+
+
+def _box_rows(ids):
+    for box_id, *fields in Box.objects.filter(id__in=ids).values_list('id', 'ean', 'position__code'):
+        yield box_id, None, fields
+
+
+def _position_rows(ids):
+    eans = defaultdict(list)
+    for position_id, ean in Box.objects.filter(position_id__in=ids).values_list('position_id', 'ean'):
+        eans[position_id].append(ean)
+    for position_id, code, warehouse_name in Position.objects.filter(id__in=ids).values_list(
+            'id', 'code', 'warehouse__name'):
+        yield position_id, None, [code, warehouse_name, *eans[position_id]]
+
+
+def _client_rows(ids):
+    for client_id, name, email in Client.objects.filter(id__in=ids).values_list('id', 'name', 'email'):
+        yield client_id, client_id, [name, email]
+
+
+# Načtení prohledávaných hodnot podle typu dokumentu
+DOCUMENT_ROWS = {
+    'product': _product_rows,
+    'batch': _batch_rows,
+    'group': _group_rows,
+    'box': _box_rows,
+    'position': _position_rows,
+    'client': _client_rows,
+}
+
+# Typ dokumentu pro model (pro hromadně vytvořené instance)
+MODEL_ENTITIES = {
+    Product: 'product',
+    Batch: 'batch',
+    Group: 'group',
+    Box: 'box',
+    Position: 'position',
+    Client: 'client',
+}
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def build_content(fields):
+    """
+    Spojí hodnoty polí do obsahu dokumentu (malými písmeny, bez prázdných hodnot).
+
+    :param fields: Hodnoty polí
+    :return: Text dokumentu
+    """
+    return SEPARATOR.join(str(value) for value in fields if value not in (None, '')).lower()
+
+
+def index(entity, ids):
+    """
+    Přepočítá dokumenty objektů – jeden dotaz na načtení hodnot a jeden upsert na dávku.
+    Dokumenty objektů, které už neexistují, se smažou.
+
+    :param entity: Typ dokumentu (klíč `DOCUMENT_ROWS`)
+    :param ids: ID objektů
+    :return: Počet uložených dokumentů
+    """
+    ids = sorted({object_id for object_id in ids if object_id})
+    saved = 0
+    for start in range(0, len(ids), CHUNK_SIZE):
+        saved += _index_chunk(entity, ids[start:start + CHUNK_SIZE])
+    return saved
+
+
+def _index_chunk(entity, ids):
+    documents = [
+        SearchDocument(entity=entity, object_id=object_id, client_id=client_id, content=build_content(fields))
+        for object_id, client_id, fields in DOCUMENT_ROWS[entity](ids)
+    ]
+    found = [document.object_id for document in documents]
+
+    SearchDocument.objects.filter(entity=entity, object_id__in=set(ids) - set(found)).delete()
+    if not documents:
+        return 0
+
+    SearchDocument.objects.bulk_create(
+        documents, update_conflicts=True, unique_fields=['entity', 'object_id'],
+        update_fields=['client_id', 'content', 'updated_at'],
+    )
+    if is_postgres():
+        SearchDocument.objects.filter(entity=entity, object_id__in=found).update(
+            search_vector=SearchVector('content', config='simple')
+        )
+    return len(documents)
+
+
+def rebuild(entities=None):
+    """
+    Plný přepočet indexu (po nasazení nebo hromadném importu mimo ORM).
+
+    :param entities: (volitelné) Omezení na vybrané typy dokumentů
+    :return: Slovník {typ: počet dokumentů}
+    """
+    counts = {}
+    for entity in entities or DOCUMENT_ROWS:
+        model = next(model for model, name in MODEL_ENTITIES.items() if name == entity)
+        SearchDocument.objects.filter(entity=entity).exclude(
+            object_id__in=model.objects.values('id')
+        ).delete()
+
+        counts[entity] = 0
+        ids = model.objects.order_by('id').values_list('id', flat=True)
+        last_id = 0
+        while True:
+            chunk = list(ids.filter(id__gt=last_id)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            counts[entity] += _index_chunk(entity, chunk)
+            last_id = chunk[-1]
+    return counts
+
+
+def schedule(entity, ids):
+    """
+    Naplánuje přepočet dokumentů. Uvnitř transakce se změny sloučí a zapíšou až po commitu
+    (opakované uložení stejného objektu se přepočítá jen jednou), mimo transakci hned.
+
+    :param entity: Typ dokumentu
+    :param ids: ID objektů (i smazaných – jejich dokument se odstraní)
+    """
+    ids = {object_id for object_id in ids if object_id}
+    if not ids:
+        return
+    if not connection.in_atomic_block:
+        index(entity, ids)
+        return
+    _transaction_pending.get()[entity].update(ids)
+
+
+def schedule_instances(instances):
+    """
+    Naplánuje indexaci hromadně vytvořených instancí (`bulk_create` neposílá signály).
+
+    :param instances: Instance modelů z `MODEL_ENTITIES`
+    """
+    ids = defaultdict(set)
+    for instance in instances:
+        entity = MODEL_ENTITIES.get(type(instance))
+        if entity and instance.pk:
+            ids[entity].add(instance.pk)
+        if isinstance(instance, Box):
+            # EAN krabice je součástí dokumentu pozice
+            ids['position'].add(instance.position_id)
+    for entity, entity_ids in ids.items():
+        schedule(entity, entity_ids)
+
+
+def flush_pending():
+    """
+    Zapíše přepočty naplánované v aktuální transakci hned (hledání uvnitř transakce tak vidí
+    i její vlastní změny). Po commitu už se znovu nepřepočítávají.
+    """
+    if not connection.in_atomic_block:
+        return
+    for pending in _transaction_pending.pending():
+        _index_pending(pending)
+        pending.clear()
+
+
+def _index_pending(pending):
+    for entity, entity_ids in pending.items():
+        index(entity, entity_ids)
+
+
+# Přepočty naplánované uvnitř transakce – po savepointech, vrácený savepoint se zahodí
+_transaction_pending = TransactionBuffer(lambda: defaultdict(set), _index_pending)
+
+
+def split_terms(query):
+    """
+    Rozdělí dotaz na hledané výrazy (oddělené čárkou).
+
+    :param query: Text z vyhledávacího pole
+    :return: Seznam výrazů
+    """
+    return [term.strip() for term in query.split(',') if term.strip()]
+
+
+def search(entity, terms, client_id=None):
+    """
+    Vrací ID objektů, jejichž dokument obsahuje alespoň jeden z výrazů (podřetězec,
+    bez ohledu na velikost písmen). Výsledek je subquery pro `filter(id__in=...)`.
+
+    :param entity: Typ dokumentu
+    :param terms: Hledané výrazy
+    :param client_id: (volitelné) Omezení na klienta
+    :return: Queryset hodnot `object_id`
+    """
+    flush_pending()
+    documents = SearchDocument.objects.filter(entity=entity)
+    # `content` je uložen malými písmeny – `contains` místo `icontains` využije trigramový index
+    documents = documents.filter(reduce(or_, [Q(content__contains=term.lower()) for term in terms], Q(pk__in=[])))
+    if client_id:
+        documents = documents.filter(client_id=client_id)
+    return documents.values('object_id')
+
+
+def rank(queryset, entity, terms):
+    """
+    Seřadí výsledky podle relevance (`ts_rank` nad `search_vector`). Mimo PostgreSQL
+    vrací queryset beze změny.
+
+    :param queryset: Queryset objektů (výsledek filtru přes `search`)
+    :param entity: Typ dokumentu
+    :param terms: Hledané výrazy
+    :return: Seřazený queryset
+    """
+    if not is_postgres():
+        return queryset
+    query = reduce(or_, [SearchQuery(term, config='simple', search_type='websearch') for term in terms])
+    relevance = SearchDocument.objects.filter(entity=entity, object_id=OuterRef('pk')).annotate(
+        relevance=SearchRank(F('search_vector'), query)
+    ).values('relevance')[:1]
+    return queryset.annotate(search_rank=Subquery(relevance)).order_by(F('search_rank').desc(nulls_last=True), '-pk')
+
+
+def history_filter(terms):
+    """
+    Podmínka pro hledání v historii. Historie je sama o sobě dokumentem – popis se hledá přes
+    trigramový index nad `UPPER(description)`, typ a ID objektu se porovnávají přesně
+    (místo přetypování celého sloupce na text).
+
+    :param terms: Hledané výrazy
+    :return: Objekt Q
+    """
+    types = [choice for choice, _ in History.TYPE_CHOICES]
+    conditions = []
+    for term in terms:
+        condition = Q(description__icontains=term)
+        matching_types = [type for type in types if term.lower() in type]
+        if matching_types:
+            condition |= Q(type__in=matching_types)
+        if term.isdigit():
+            condition |= Q(related_id=int(term))
+        conditions.append(condition)
+    return reduce(or_, conditions, Q(pk__in=[]))
@@ -0,0 +1,113 @@
+# search/signals.py
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from batch.models import Batch
+from box.models import Box
+from client.models import Client
+from group.models import Group
+from position.models import Position
+from product.models import Product
+from search.services import search_service
+from warehouse.models import Warehouse
+
+
+def _ids(queryset):
+    return list(queryset.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, created, **kwargs):
+    """
+    Přeindexuje produkt; změna názvu nebo SKU se promítne i do dokumentů jeho šarží a skupin.
+    """
+    search_service.schedule('product', [instance.id])
+    if created:
+        return
+    previous = getattr(instance, '_tracked_snapshot', {})
+    if previous.get('name') == instance.name and previous.get('sku') == instance.sku:
+        return
+    search_service.schedule('batch', _ids(Batch.objects.filter(product_id=instance.id)))
+    search_service.schedule('group', _ids(Group.objects.filter(batch__product_id=instance.id)))
+
+
+@receiver(post_save, sender=Batch)
+def index_batch(sender, instance, created, **kwargs):
+    """
+    Přeindexuje šarži a (u změny) skupiny, které nesou její číslo.
+    """
+    search_service.schedule('batch', [instance.id])
+    if not created:
+        search_service.schedule('group', _ids(Group.objects.filter(batch_id=instance.id)))
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, created, **kwargs):
+    """
+    Přeindexuje skupinu – jen novou nebo přesunutou do jiné krabice (množství v dokumentu není).
+    """
+    previous = getattr(instance, '_tracked_snapshot', {})
+    if created or previous.get('box_id', 0) != instance.box_id:
+        search_service.schedule('group', [instance.id])
+
+
+@receiver(pre_save, sender=Box)
+def remember_box_position(sender, instance, **kwargs):
+    # Původní pozice – její dokument obsahuje EAN krabice, která se může přesouvat
+    if instance.pk:
+        instance._search_position_ids = list(
+            Box.objects.filter(pk=instance.pk).values_list('position_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Box)
+def index_box(sender, instance, created, **kwargs):
+    """
+    Přeindexuje krabici, její původní i novou pozici a (u změny) skupiny v krabici.
+    """
+    search_service.schedule('box', [instance.id])
+    search_service.schedule('position', [instance.position_id, *getattr(instance, '_search_position_ids', [])])
+    if not created:
+        search_service.schedule('group', _ids(Group.objects.filter(box_id=instance.id)))
+
+
+@receiver(post_save, sender=Position)
+def index_position(sender, instance, created, **kwargs):
+    """
+    Přeindexuje pozici; změna kódu se promítne i do dokumentů krabic na pozici.
+    """
+    search_service.schedule('position', [instance.id])
+    if not created and getattr(instance, '_tracked_snapshot', {}).get('code') != instance.code:
+        search_service.schedule('box', _ids(Box.objects.filter(position_id=instance.id)))
+
+
+@receiver(post_save, sender=Warehouse)
+def index_warehouse_positions(sender, instance, created, **kwargs):
+    """
+    Název skladu je součástí dokumentů jeho pozic.
+    """
+    if not created:
+        search_service.schedule('position', _ids(Position.objects.filter(warehouse_id=instance.id)))
+
+
+@receiver(post_save, sender=Client)
+def index_client(sender, instance, **kwargs):
+    search_service.schedule('client', [instance.id])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Batch)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Position)
+@receiver(post_delete, sender=Client)
+def remove_document(sender, instance, **kwargs):
+    """
+    Odstraní dokument smazaného objektu (přepočet nenajde objekt a dokument smaže).
+    """
+    search_service.schedule(search_service.MODEL_ENTITIES[sender], [instance.id])
+
+
+@receiver(post_delete, sender=Box)
+def remove_box_document(sender, instance, **kwargs):
+    search_service.schedule('box', [instance.id])
+    search_service.schedule('position', [instance.position_id])
@@ -0,0 +1,83 @@
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from rest_framework import status
+
+from batch.models import Batch
+from box.models import Box
+from group.models import Group
+from history.models import History
+from product.models import Product
+from search.models import SearchDocument
+from search.services import search_service
+from user.models import User
+
+
+# Fixture pro přihlášeného API klienta s jedním produktem, šarží, krabicí a skupinou
+@pytest.fixture
+def search_data(api_client, client_factory):
+    client = client_factory()
+    user = User.objects.create(email="search@example.com", password="pass")
+    user.client.add(client)
+    api_client.force_authenticate(user=user)
+
+    product = Product.objects.create(name="Jablko", sku="SRCH-1", client=client)
+    batch = Batch.objects.create(product=product, batch_number="B-77")
+    box = Box.objects.create(ean="8590000000017")
+    group = Group.objects.create(batch=batch, box=box, quantity=3)
+    return api_client, client, product, group
+
+
+@pytest.mark.django_db
+class TestSearchDocuments:
+
+    # Přejmenování produktu se po commitu promítne do dokumentů jeho skupin
+    def test_group_document_follows_product_rename(self, search_data, django_capture_on_commit_callbacks):
+        api_client, client, product, group = search_data
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.name = "Hruška"
+            product.save()
+
+        res = api_client.get(f"/api/groups/search/?q=hruš&clientId={client.id}")
+        assert res.status_code == status.HTTP_200_OK
+        assert [row["id"] for row in res.data] == [group.id]
+
+        res = api_client.get("/api/groups/search/?q=jablko")
+        assert res.data == []
+
+    # Přepočet naplánovaný ve vráceném savepointu se po commitu neprovede
+    def test_rolled_back_savepoint_discards_schedule(self, search_data, django_capture_on_commit_callbacks):
+        _, _, product, _ = search_data
+        SearchDocument.objects.filter(entity="product").delete()
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            with pytest.raises(RuntimeError), transaction.atomic():
+                search_service.schedule("product", [product.id])
+                raise RuntimeError()
+        assert not SearchDocument.objects.filter(entity="product").exists()
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            with transaction.atomic():
+                search_service.schedule("product", [product.id])
+        assert SearchDocument.objects.filter(entity="product").count() == 1
+
+    # Hromadně založené objekty bez signálů doplní plný přepočet
+    def test_rebuild_indexes_bulk_created_rows(self, search_data):
+        _, client, product, _ = search_data
+        Product.objects.bulk_create([Product(name=f"Hromadný {i}", sku=f"SRCH-B{i}", client=client) for i in range(3)])
+
+        call_command("rebuild_search_index", entities=["product"])
+
+        assert SearchDocument.objects.filter(entity="product").count() == 4
+        matches = Product.objects.filter(id__in=search_service.search("product", ["hromadný"], client.id))
+        assert matches.count() == 3
+
+    # ID objektu v historii se porovnává přesně, ne jako podřetězec
+    def test_history_related_id_exact(self, search_data):
+        api_client, *_ = search_data
+        History.objects.create(type="product", related_id=5, description="a")
+        History.objects.create(type="product", related_id=15, description="b")
+
+        res = api_client.get("/api/history/search/?q=5")
+        assert [row["related_id"] for row in res.data["results"]] == [5]
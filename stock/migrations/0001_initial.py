@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def seed_opening_movements(apps, schema_editor):
+    """
+    Zapíše počáteční stav skladové knihy – jeden pohyb za každou vazbu skupiny na operaci
+    (se znaménkem podle typu operace a datem operace), aby kniha souhlasila s čítači.
+    """
+    Operation = apps.get_model('operation', 'Operation')
+    StockMovement = apps.get_model('stock', 'StockMovement')
+    signs = {'IN': 1, 'OUT': -1}
+
+    rows = (
+        Operation.groups.through.objects
+        .filter(operation__type__in=list(signs))
+        .values_list('group_id', 'group__batch_id', 'group__batch__product_id', 'group__box_id', 'group__quantity',
+                     'operation_id', 'operation__type', 'operation__created_at')
+        .order_by('operation_id', 'group_id')
+    )
+    StockMovement.objects.bulk_create(
+        (StockMovement(group_id=group_id, batch_id=batch_id, product_id=product_id, box_id=box_id,
+                       operation_id=operation_id, delta=signs[operation_type] * quantity, timestamp=created_at)
+         for group_id, batch_id, product_id, box_id, quantity, operation_id, operation_type, created_at
+         in rows.iterator() if quantity),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('product', '0005_product_amount_cached'),
+        ('group', '0003_alter_group_box'),
+        ('operation', '0009_remove_operation_shipping_extern_id_and_more'),
+        ('batch', '0003_batch_amount_cached'),
+        ('box', '0005_alter_box_depth_alter_box_height_alter_box_weight_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('batch', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='batch.batch')),
+                ('box', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='box.box')),
+                ('group', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='group.group')),
+                ('operation', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='operation.operation')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='product.product')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['product', 'timestamp'], name='stock_stock_product_69f43a_idx')],
+            },
+        ),
+        migrations.RunPython(seed_opening_movements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.30 on 2026-10-17 14:23
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def backfill_location_stock(apps, schema_editor):
+    """
+    Naplní zásoby v krabicích z vazeb operací (stejně jako `ledger_service.rebuild_location_stock`),
+    aby zahrnovaly i zboží naskladněné před zavedením skladové knihy.
+    """
+    Operation = apps.get_model('operation', 'Operation')
+    LocationStock = apps.get_model('stock', 'LocationStock')
+    signs = {'IN': 1, 'OUT': -1}
+
+    quantities = defaultdict(int)
+    products = {}
+    rows = (
+        Operation.groups.through.objects.filter(group__box__isnull=False)
+        .values('group__box_id', 'group__batch_id', 'group__batch__product_id', 'operation__type')
+        .annotate(total=Sum('group__quantity'))
+        .order_by()
+    )
+    for row in rows.iterator():
+        key = (row['group__box_id'], row['group__batch_id'])
+        quantities[key] += signs.get(row['operation__type'], 0) * (row['total'] or 0)
+        products[key] = row['group__batch__product_id']
+
+    LocationStock.objects.bulk_create(
+        (LocationStock(box_id=box_id, batch_id=batch_id, product_id=products[(box_id, batch_id)], quantity=quantity)
+         for (box_id, batch_id), quantity in quantities.items() if quantity),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0004_batch_client_expiring_index'),
+        ('box', '0005_alter_box_depth_alter_box_height_alter_box_weight_and_more'),
+        ('group', '0003_alter_group_box'),
+        ('operation', '0010_operation_summary'),
+        ('product', '0005_product_amount_cached'),
+        ('stock', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('batch', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='location_stock', to='batch.batch')),
+                ('box', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stock', to='box.box')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='location_stock', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('quantity__gt', 0)), fields=['product', 'box'], name='location_stock_product_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='locationstock',
+            constraint=models.UniqueConstraint(fields=('box', 'batch'), name='location_stock_box_batch_uniq'),
+        ),
+        migrations.RunPython(backfill_location_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+class StockMovement(models.Model):
+    """
+    Záznam skladové knihy – neměnný pohyb zásoby (append-only).
+
+    Vazby nemají databázové omezení, aby záznam přežil smazání šarže, krabice,
+    skupiny nebo operace, na kterou se vztahuje (stejně jako `History.related_id`).
+    """
+    product = models.ForeignKey('product.Product', on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='movements')
+    batch = models.ForeignKey('batch.Batch', null=True, blank=True, on_delete=models.DO_NOTHING,
+                              db_constraint=False, related_name='movements')
+    box = models.ForeignKey('box.Box', null=True, blank=True, on_delete=models.DO_NOTHING,
+                            db_constraint=False, related_name='movements')
+    group = models.ForeignKey('group.Group', null=True, blank=True, on_delete=models.DO_NOTHING,
+                              db_constraint=False, related_name='movements')
+    operation = models.ForeignKey('operation.Operation', null=True, blank=True, on_delete=models.DO_NOTHING,
+                                  db_constraint=False, related_name='movements')
+    delta = models.IntegerField()  # Kladná hodnota = příjem, záporná = výdej
+    timestamp = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "timestamp"]),
+        ]
+        ordering = ["-timestamp"]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.delta:+d} ({self.timestamp})"
+
+
+class LocationStock(models.Model):
+    """
+    Zásoba šarže v krabici – součet pohybů skladové knihy po (krabice, šarže).
+
+    Udržuje ho skladová kniha ve stejné transakci jako pohyb; slouží pro dotazy „co je na pozici“
+    a „kde je produkt“ bez procházení pohybů. Vazby jsou bez databázového omezení jako u pohybů.
+    """
+    box = models.ForeignKey('box.Box', on_delete=models.DO_NOTHING, db_constraint=False, related_name='stock')
+    batch = models.ForeignKey('batch.Batch', on_delete=models.DO_NOTHING, db_constraint=False,
+                              related_name='location_stock')
+    product = models.ForeignKey('product.Product', on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='location_stock')
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['box', 'batch'], name='location_stock_box_batch_uniq'),
+        ]
+        indexes = [
+            # Umístění produktu (jen nenulové zásoby)
+            models.Index(fields=['product', 'box'], name='location_stock_product_idx',
+                         condition=models.Q(quantity__gt=0)),
+        ]
+
+    def __str__(self):
+        return f"{self.box_id}/{self.batch_id}: {self.quantity}"
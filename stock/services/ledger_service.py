@@ -0,0 +1,325 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, When, F, IntegerField, Q, Sum
+
+from batch.models import Batch
+from group.models import Group
+from operation.models import Operation
+from product.models import Product
+from stock import signals as stock_signals
+from stock.models import LocationStock, StockMovement
+
+# Znaménko pohybu podle typu operace (příjem přidává, výdej odebírá)
+OPERATION_SIGN = {
+    'IN': 1,
+    'OUT': -1,
+}
+
+
+def operation_sign(operation_type):
+    """
+    Vrací znaménko pohybu pro daný typ operace.
+
+    :param operation_type: Typ operace ("IN" nebo "OUT")
+    :return: 1, -1 nebo 0 pro neznámý typ
+    """
+    return OPERATION_SIGN.get(operation_type, 0)
+
+
+def record_movements(movements):
+    """
+    Zapíše pohyby do skladové knihy a ve stejné transakci upraví čítače produktů a šarží
+    a zásoby v krabicích (`LocationStock`). Po úpravě čítačů odešle signál `stock_changed`.
+
+    :param movements: Seznam neuložených instancí StockMovement
+    :return: Seznam uložených pohybů (nulové pohyby se vynechají)
+    """
+    movements = [movement for movement in movements if movement.delta]
+    if not movements:
+        return []
+
+    product_deltas = defaultdict(int)
+    batch_deltas = defaultdict(int)
+    location_deltas = defaultdict(int)
+    location_products = {}
+    for movement in movements:
+        product_deltas[movement.product_id] += movement.delta
+        if movement.batch_id:
+            batch_deltas[movement.batch_id] += movement.delta
+            if movement.box_id:
+                location_deltas[(movement.box_id, movement.batch_id)] += movement.delta
+                location_products[(movement.box_id, movement.batch_id)] = movement.product_id
+
+    with transaction.atomic():
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        _apply_counter_deltas(Product, product_deltas)
+        _apply_counter_deltas(Batch, batch_deltas)
+        _apply_location_deltas(location_deltas, location_products)
+        stock_signals.stock_changed.send(sender=StockMovement, product_deltas=dict(product_deltas))
+
+    return movements
+
+
+def _apply_counter_deltas(model, deltas):
+    """
+    Přičte rozdíly k `amount_cached` jedním UPDATE dotazem pro všechny řádky.
+
+    :param model: Model s polem `amount_cached` (Product nebo Batch)
+    :param deltas: Slovník {pk: rozdíl}
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    model.objects.filter(pk__in=deltas.keys()).update(
+        amount_cached=Case(
+            *[When(pk=pk, then=F('amount_cached') + delta) for pk, delta in deltas.items()],
+            default=F('amount_cached'),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def _apply_location_deltas(deltas, products):
+    """
+    Přičte rozdíly k zásobám v krabicích – chybějící řádky založí, pak jeden UPDATE pro všechny.
+
+    :param deltas: Slovník {(box_id, batch_id): rozdíl}
+    :param products: Slovník {(box_id, batch_id): product_id}
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    LocationStock.objects.bulk_create(
+        [LocationStock(box_id=box_id, batch_id=batch_id, product_id=products[(box_id, batch_id)])
+         for box_id, batch_id in deltas],
+        ignore_conflicts=True,
+    )
+    LocationStock.objects.filter(
+        reduce(or_, [Q(box_id=box_id, batch_id=batch_id) for box_id, batch_id in deltas])
+    ).update(
+        quantity=Case(
+            *[When(box_id=box_id, batch_id=batch_id, then=F('quantity') + delta)
+              for (box_id, batch_id), delta in deltas.items()],
+            default=F('quantity'),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def rebuild_location_stock():
+    """
+    Přepočítá zásoby v krabicích z vazeb operací – stejný zdroj jako `recalculate_amounts`,
+    takže čítače i zásoby v krabicích po opravě souhlasí (i pro zboží naskladněné před
+    zavedením skladové knihy). Nulové řádky se neukládají.
+
+    :return: Počet řádků se zásobou
+    """
+    quantities = defaultdict(int)
+    products = {}
+    rows = (
+        Operation.groups.through.objects.filter(group__box__isnull=False)
+        .values("group__box_id", "group__batch_id", "group__batch__product_id", "operation__type")
+        .annotate(total=Sum("group__quantity"))
+        .order_by()
+    )
+    for row in rows.iterator():
+        key = (row["group__box_id"], row["group__batch_id"])
+        quantities[key] += operation_sign(row["operation__type"]) * (row["total"] or 0)
+        products[key] = row["group__batch__product_id"]
+
+    with transaction.atomic():
+        LocationStock.objects.all().delete()
+        created = LocationStock.objects.bulk_create(
+            (LocationStock(box_id=box_id, batch_id=batch_id, product_id=products[(box_id, batch_id)],
+                           quantity=quantity)
+             for (box_id, batch_id), quantity in quantities.items() if quantity),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def _movement(group_data, operation_id, delta, box_id=None):
+    """
+    Sestaví (neuložený) pohyb pro skupinu.
+
+    :param group_data: Slovník s klíči id, batch_id, product_id, box_id
+    :param operation_id: ID operace, ke které se pohyb vztahuje
+    :param delta: Změna množství
+    :param box_id: (volitelné) krabice, jinak krabice skupiny
+    :return: Instance StockMovement
+    """
+    return StockMovement(
+        product_id=group_data['product_id'],
+        batch_id=group_data['batch_id'],
+        box_id=box_id if box_id is not None else group_data['box_id'],
+        group_id=group_data['id'],
+        operation_id=operation_id,
+        delta=delta,
+    )
+
+
+def _group_data(group):
+    """
+    Převede instanci skupiny na slovník používaný při sestavování pohybů.
+    """
+    return {
+        'id': group.id,
+        'batch_id': group.batch_id,
+        'product_id': group.batch.product_id,
+        'box_id': group.box_id,
+    }
+
+
+def build_movement(group, operation_id, delta, box_id=None):
+    """
+    Sestaví (neuložený) pohyb pro instanci skupiny – pro hromadné zápisy mimo signály.
+
+    :param group: Skupina (s načtenou šarží)
+    :param operation_id: ID operace
+    :param delta: Změna množství
+    :param box_id: (volitelné) krabice, jinak krabice skupiny
+    :return: Instance StockMovement
+    """
+    return _movement(_group_data(group), operation_id, delta, box_id=box_id)
+
+
+def record_operation_groups(operation, group_ids, direction=1):
+    """
+    Zaznamená připojení (direction=1) nebo odpojení (direction=-1) skupin k operaci.
+
+    :param operation: Operace
+    :param group_ids: ID skupin
+    :param direction: 1 při připojení, -1 při odpojení
+    :return: Seznam zapsaných pohybů
+    """
+    sign = operation_sign(operation.type) * direction
+    if not sign or not group_ids:
+        return []
+
+    groups = Group.objects.filter(id__in=group_ids).values(
+        'id', 'batch_id', 'box_id', 'quantity', product_id=F('batch__product_id')
+    )
+    return record_movements([
+        _movement(group, operation.id, sign * group['quantity'])
+        for group in groups
+    ])
+
+
+def record_group_operations(group, operation_ids, direction=1):
+    """
+    Zaznamená připojení nebo odpojení operací ke skupině (reverzní strana M2M vazby).
+
+    :param group: Skupina
+    :param operation_ids: ID operací
+    :param direction: 1 při připojení, -1 při odpojení
+    :return: Seznam zapsaných pohybů
+    """
+    if not operation_ids:
+        return []
+
+    group_data = _group_data(group)
+    operations = Operation.objects.filter(id__in=operation_ids).values_list('id', 'type')
+    return record_movements([
+        _movement(group_data, operation_id, operation_sign(operation_type) * direction * group.quantity)
+        for operation_id, operation_type in operations
+    ])
+
+
+def record_group_change(group, previous_quantity, previous_box_id):
+    """
+    Zaznamená změnu množství nebo krabice skupiny pro všechny operace, ve kterých je.
+
+    Přesun do jiné krabice se zapíše jako dvojice pohybů (výdej ze staré, příjem do nové),
+    takže čítače produktu a šarže se změní jen o případný rozdíl množství.
+
+    :param group: Uložená skupina
+    :param previous_quantity: Množství před změnou
+    :param previous_box_id: Krabice před změnou
+    :return: Seznam zapsaných pohybů
+    """
+    box_changed = previous_box_id != group.box_id
+    if previous_quantity == group.quantity and not box_changed:
+        return []
+
+    memberships = list(group.operations.values_list('id', 'type'))
+    if not memberships:
+        return []
+
+    group_data = _group_data(group)
+    movements = []
+    for operation_id, operation_type in memberships:
+        sign = operation_sign(operation_type)
+        if box_changed:
+            movements.append(_movement(group_data, operation_id, -sign * previous_quantity, box_id=previous_box_id))
+            movements.append(_movement(group_data, operation_id, sign * group.quantity))
+        else:
+            movements.append(_movement(group_data, operation_id, sign * (group.quantity - previous_quantity)))
+
+    return record_movements(movements)
+
+
+def record_group_removal(group):
+    """
+    Zaznamená odstranění skupiny – vrátí její množství ve všech operacích.
+
+    :param group: Skupina před smazáním
+    :return: Seznam zapsaných pohybů
+    """
+    return record_group_operations(group, list(group.operations.values_list('id', flat=True)), direction=-1)
+
+
+def record_operation_removal(operation):
+    """
+    Zaznamená odstranění operace – vrátí pohyby všech jejích skupin.
+
+    :param operation: Operace před smazáním
+    :return: Seznam zapsaných pohybů
+    """
+    return record_operation_groups(operation, list(operation.groups.values_list('id', flat=True)), direction=-1)
+
+
+def recalculate_amounts(progress=None):
+    """
+    Přepočítá `amount_cached` všech produktů a šarží z vazeb operací (kontrola nebo oprava
+    čítačů). Součty spočítá jeden agregační dotaz, zápis je hromadný v jedné transakci.
+
+    :param progress: (volitelné) Callback `progress(procenta, zpráva)` pro úlohu na pozadí
+    :return: Slovník s počty přepočtených produktů, šarží a zásob v krabicích
+    """
+    product_amounts = defaultdict(int)
+    batch_amounts = defaultdict(int)
+
+    # Součty množství po šaržích a typech operací – jeden agregační dotaz nad vazbami
+    rows = (
+        Operation.groups.through.objects
+        .values("group__batch_id", "group__batch__product_id", "operation__type")
+        .annotate(total=Sum("group__quantity"))
+    )
+    for row in rows:
+        amount = operation_sign(row["operation__type"]) * (row["total"] or 0)
+        product_amounts[row["group__batch__product_id"]] += amount
+        batch_amounts[row["group__batch_id"]] += amount
+
+    if progress:
+        progress(50, "Součty spočítány, ukládám čítače.")
+
+    with transaction.atomic():
+        # Hromadný update všech produktů a šarží (bez pohybu = nulový stav)
+        products = list(Product.objects.only("id", "amount_cached"))
+        for product in products:
+            product.amount_cached = product_amounts.get(product.id, 0)
+        Product.objects.bulk_update(products, ["amount_cached"], batch_size=1000)
+
+        batches = list(Batch.objects.only("id", "amount_cached"))
+        for batch in batches:
+            batch.amount_cached = batch_amounts.get(batch.id, 0)
+        Batch.objects.bulk_update(batches, ["amount_cached"], batch_size=1000)
+
+        locations = rebuild_location_stock()
+
+    return {"products": len(products), "batches": len(batches), "locations": locations}
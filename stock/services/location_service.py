@@ -0,0 +1,138 @@
+from django.db.models import Count, F, Sum
+
+from group.models import Group
+from stock.models import LocationStock
+
+# Horní mez počtu řádků výpisů (pozice, umístění produktu)
+MAX_LIMIT = 500
+
+
+def _in_stock(client_ids=None):
+    """
+    Zásoby v krabicích s kladným množstvím, volitelně jen pro zadané klienty.
+    """
+    stock = LocationStock.objects.filter(quantity__gt=0)
+    if client_ids is not None:
+        stock = stock.filter(product__client_id__in=client_ids)
+    return stock
+
+
+def occupancy(client_ids=None, warehouse_id=None, limit=MAX_LIMIT):
+    """
+    Obsazenost pozic – počet krabic se zbožím, počet SKU a množství na pozici.
+    Jeden agregační dotaz nad zásobami v krabicích (`LocationStock`).
+
+    :param client_ids: (volitelné) ID klientů, jejichž zboží se počítá
+    :param warehouse_id: (volitelné) ID skladu
+    :param limit: Počet pozic
+    :return: Seznam {"position_id", "position", "warehouse", "boxes", "skus", "quantity"}
+             sestupně podle počtu krabic
+    """
+    stock = _in_stock(client_ids).filter(box__position__isnull=False)
+    if warehouse_id:
+        stock = stock.filter(box__position__warehouse_id=warehouse_id)
+    rows = (
+        stock.values(
+            position_id=F('box__position_id'),
+            position=F('box__position__code'),
+            warehouse=F('box__position__warehouse__name'),
+        )
+        .annotate(
+            boxes=Count('box_id', distinct=True),
+            skus=Count('product_id', distinct=True),
+            quantity=Sum('quantity'),
+        )
+        .order_by('-boxes', 'position')[:max(1, min(int(limit), MAX_LIMIT))]
+    )
+    return list(rows)
+
+
+def position_contents(position_id, client_ids=None):
+    """
+    Obsah pozice po krabicích a šaržích.
+
+    :param position_id: ID pozice
+    :param client_ids: (volitelné) ID klientů, jejichž zboží se vrací
+    :return: Seznam {"box_id", "ean", "product_id", "sku", "name", "batch_id", "batch_number",
+             "expiration_date", "quantity"} seřazený podle krabice a produktu
+    """
+    return list(
+        _in_stock(client_ids)
+        .filter(box__position_id=position_id)
+        .values(
+            'box_id', 'product_id', 'batch_id', 'quantity',
+            ean=F('box__ean'),
+            sku=F('product__sku'),
+            name=F('product__name'),
+            batch_number=F('batch__batch_number'),
+            expiration_date=F('batch__expiration_date'),
+        )
+        .order_by('ean', 'box_id', 'name', 'batch_id')
+    )
+
+
+def product_locations(product_id, limit=MAX_LIMIT):
+    """
+    Kde je produkt uložen – krabice a pozice se zásobou (index `location_stock_product_idx`).
+
+    :param product_id: ID produktu
+    :param limit: Počet řádků
+    :return: Seznam {"warehouse", "position_id", "position", "box_id", "ean", "batch_id", "batch_number",
+             "expiration_date", "quantity"} seřazený podle skladu, pozice a krabice
+    """
+    rows = (
+        LocationStock.objects.filter(product_id=product_id, quantity__gt=0)
+        .values(
+            'box_id', 'batch_id', 'quantity',
+            warehouse=F('box__position__warehouse__name'),
+            position_id=F('box__position_id'),
+            position=F('box__position__code'),
+            ean=F('box__ean'),
+            batch_number=F('batch__batch_number'),
+            expiration_date=F('batch__expiration_date'),
+        )
+        .order_by(F('warehouse').asc(nulls_last=True), F('position').asc(nulls_last=True), 'position_id',
+                  'ean', 'box_id', 'batch_id')
+    )
+    return list(rows[:max(1, min(int(limit), MAX_LIMIT))])
+
+
+def pick_path(operation_id):
+    """
+    Pořadí vychystání skupin operace – podle skladu, kódu pozice a krabice, aby se
+    každá pozice obešla jen jednou. Skupiny bez pozice jsou na konci.
+
+    :param operation_id: ID operace
+    :return: Seznam zastávek {"warehouse", "position_id", "position", "items": [{"group_id", "box_id",
+             "ean", "product_id", "sku", "name", "batch_number", "quantity"}]}
+    """
+    groups = (
+        Group.objects.filter(operations__id=operation_id)
+        .values(
+            'box_id', 'quantity',
+            group_id=F('id'),
+            warehouse=F('box__position__warehouse__name'),
+            position_id=F('box__position_id'),
+            position=F('box__position__code'),
+            ean=F('box__ean'),
+            product_id=F('batch__product_id'),
+            sku=F('batch__product__sku'),
+            name=F('batch__product__name'),
+            batch_number=F('batch__batch_number'),
+        )
+        .order_by(F('warehouse').asc(nulls_last=True), F('position').asc(nulls_last=True), 'position_id',
+                  'ean', 'box_id', 'group_id')
+    )
+
+    stops = []
+    for group in groups:
+        stop = {
+            'warehouse': group.pop('warehouse'),
+            'position_id': group.pop('position_id'),
+            'position': group.pop('position'),
+        }
+        if not stops or stops[-1]['position_id'] != stop['position_id']:
+            stops.append({**stop, 'items': []})
+        stops[-1]['items'].append(group)
+    return stops
+
@@ -0,0 +1,61 @@
+# stock/signals.py
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.dispatch import receiver, Signal
+
+from group.models import Group
+from operation.models import Operation
+from stock.services import ledger_service
+
+# Odesílá skladová kniha po změně čítačů – argument `product_deltas` je slovník {product_id: rozdíl}
+stock_changed = Signal()
+
+
+@receiver(m2m_changed, sender=Operation.groups.through)
+def record_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Zapíše do skladové knihy připojení/odpojení skupin k operaci (z obou stran M2M vazby).
+    """
+    if action == 'post_add':
+        direction = 1
+    elif action == 'pre_remove':
+        direction = -1
+    elif action == 'pre_clear':
+        direction = -1
+        related = instance.operations if reverse else instance.groups
+        pk_set = list(related.values_list('id', flat=True))
+    else:
+        return
+
+    if reverse:
+        ledger_service.record_group_operations(instance, pk_set, direction)
+    else:
+        ledger_service.record_operation_groups(instance, pk_set, direction)
+
+
+@receiver(post_save, sender=Group)
+def record_group_change(sender, instance, created, **kwargs):
+    """
+    Zapíše změnu množství nebo krabice existující skupiny.
+    """
+    previous = getattr(instance, '_stock_previous', None)
+    if created or previous is None:
+        return
+
+    instance._stock_previous = None
+    ledger_service.record_group_change(instance, *previous)
+
+
+@receiver(pre_delete, sender=Group)
+def record_group_removal(sender, instance, **kwargs):
+    """
+    Vrátí množství mazané skupiny ve všech jejích operacích.
+    """
+    ledger_service.record_group_removal(instance)
+
+
+@receiver(pre_delete, sender=Operation)
+def record_operation_removal(sender, instance, **kwargs):
+    """
+    Vrátí pohyby skupin mazané operace (M2M vazby se mažou bez m2m_changed).
+    """
+    ledger_service.record_operation_removal(instance)
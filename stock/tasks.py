@@ -0,0 +1,11 @@
+# stock/tasks.py
+from jobs.registry import task
+from stock.services.ledger_service import recalculate_amounts
+
+
+@task('stock.recalculate_amounts', max_attempts=2)
+def recalculate_amounts_task(job):
+    """
+    Přepočet čítačů zásob na pozadí (jinak blokuje webový worker nebo příkaz).
+    """
+    return recalculate_amounts(progress=job.report_progress)
@@ -0,0 +1,191 @@
+import pytest
+from django.core.management import call_command
+
+from batch.models import Batch
+from group.models import Group
+from operation.models import Operation
+from operation.services.operation_service import (
+    add_group_to_in_operation, add_group_to_out_operation, add_product_to_box, create_new_box, remove_operation
+)
+from product.models import Product
+from stock.models import LocationStock, StockMovement
+
+
+# Fixture pro produkt testovacího klienta
+@pytest.fixture
+def stock_product(client_factory):
+    return Product.objects.create(name="Ledger produkt", sku="LEDGER-1", client=client_factory())
+
+
+# Fixture pro příjemku s jednou skupinou (10 ks v šarži L1)
+@pytest.fixture
+def received_group(stock_product):
+    operation = Operation.objects.create(number="IN-L1", type="IN", client=stock_product.client)
+    box = create_new_box("LEDGER-BOX")
+    return add_group_to_in_operation(operation, stock_product.id, "L1", box.id, 10)
+
+
+@pytest.mark.django_db
+class TestStockLedger:
+
+    # Příjem zapíše pohyb a navýší čítače produktu i šarže
+    def test_in_operation_updates_counters(self, stock_product, received_group):
+        stock_product.refresh_from_db()
+        batch = Batch.objects.get(id=received_group.batch_id)
+
+        assert stock_product.amount == 10
+        assert batch.amount_cached == 10
+        assert StockMovement.objects.filter(product=stock_product).count() == 1
+
+    # Výdej s rozdělením skupiny sníží zásobu jen o vydané množství
+    def test_out_operation_with_split(self, stock_product, received_group):
+        out = Operation.objects.create(number="OUT-L1", type="OUT", client=stock_product.client)
+        add_group_to_out_operation(out, stock_product.id, 4, "L1")
+
+        stock_product.refresh_from_db()
+        assert stock_product.amount == 6
+        assert Batch.objects.get(id=received_group.batch_id).amount_cached == 6
+
+    # Přebalení do krabice nemění zásobu, ale zapíše přesun mezi krabicemi
+    def test_add_product_to_box_keeps_amount(self, stock_product, received_group):
+        operation = received_group.operations.get()
+        new_box = create_new_box("LEDGER-BOX-2")
+        add_product_to_box(operation.id, new_box.id, stock_product.id, 3)
+
+        stock_product.refresh_from_db()
+        assert stock_product.amount == 10
+        assert sum(StockMovement.objects.filter(box=new_box).values_list("delta", flat=True)) == 3
+
+    # Smazání výdejky vrátí vydané množství
+    def test_remove_out_operation_returns_stock(self, stock_product, received_group):
+        out = Operation.objects.create(number="OUT-L2", type="OUT", client=stock_product.client)
+        add_group_to_out_operation(out, stock_product.id, 10, "L1")
+        remove_operation(out)
+
+        stock_product.refresh_from_db()
+        assert stock_product.amount == 10
+
+    # Běžné uložení produktu nepřepíše čítač zásob
+    def test_product_save_does_not_overwrite_counter(self, stock_product, received_group):
+        stock_product.name = "Přejmenovaný produkt"
+        stock_product.save()
+
+        stock_product.refresh_from_db()
+        assert stock_product.amount_cached == 10
+
+    # Přepočet z vazeb operací dá stejný výsledek jako skladová kniha
+    def test_recalculate_command_matches_ledger(self, stock_product, received_group):
+        Product.objects.filter(id=stock_product.id).update(amount_cached=0)
+        Batch.objects.filter(id=received_group.batch_id).update(amount_cached=0)
+
+        call_command("recalculate_product_amounts")
+
+        stock_product.refresh_from_db()
+        assert stock_product.amount_cached == 10
+        assert Batch.objects.get(id=received_group.batch_id).amount_cached == 10
+
+
+@pytest.mark.django_db
+class TestLocationStock:
+
+    # Zásoba v krabici sleduje příjem, výdej i přesun mezi krabicemi; přepočet dá stejný stav
+    def test_location_stock_follows_ledger(self, stock_product, received_group):
+        new_box = create_new_box("LEDGER-BOX-2")
+        add_product_to_box(received_group.operations.get().id, new_box.id, stock_product.id, 3)
+        assert set(LocationStock.objects.values_list("box_id", "quantity")) == {
+            (received_group.box_id, 7), (new_box.id, 3)
+        }
+
+        out = Operation.objects.create(number="OUT-LS", type="OUT", client=stock_product.client)
+        add_group_to_out_operation(out, stock_product.id, 4, "L1")
+        expected = set(LocationStock.objects.filter(quantity__gt=0).values_list("box_id", "batch_id", "quantity"))
+        assert sum(quantity for _, _, quantity in expected) == 6
+
+        # Přepočet vychází z vazeb operací – zásoby bez pohybů ve skladové knize (před jejím zavedením) nechybí
+        LocationStock.objects.all().delete()
+        StockMovement.objects.all().delete()
+        call_command("recalculate_product_amounts")
+        assert set(LocationStock.objects.values_list("box_id", "batch_id", "quantity")) == expected
+
+    # Obsazenost pozic, umístění produktu a pořadí vychystání výdejky
+    def test_location_endpoints(self, export_client, stock_product, received_group):
+        from position.models import Position
+        from warehouse.models import Warehouse
+
+        warehouse = Warehouse.objects.create(name="Hlavní")
+        position = Position.objects.create(code="A-01", warehouse=warehouse)
+        received_group.box.position = position
+        received_group.box.save()
+
+        response = export_client.get("/api/positions/occupancy/")
+        assert response.status_code == 200
+        assert [(row["position"], row["boxes"], row["skus"], row["quantity"]) for row in response.data] == [
+            ("A-01", 1, 1, 10)
+        ]
+        response = export_client.get(f"/api/positions/occupancy/?warehouse={warehouse.id}")
+        assert [row["position"] for row in response.data] == ["A-01"]
+        response = export_client.get("/api/positions/occupancy/?warehouse=abc")
+        assert response.status_code == 400
+
+        response = export_client.get(f"/api/positions/{position.id}/contents/")
+        assert [(row["ean"], row["sku"], row["quantity"]) for row in response.data] == [("LEDGER-BOX", "LEDGER-1", 10)]
+
+        response = export_client.get(f"/api/products/{stock_product.id}/locations/")
+        assert [(row["warehouse"], row["position"], row["ean"], row["quantity"]) for row in response.data] == [
+            ("Hlavní", "A-01", "LEDGER-BOX", 10)
+        ]
+
+        out = Operation.objects.create(number="OUT-PICK", type="OUT", client=stock_product.client)
+        add_group_to_out_operation(out, stock_product.id, 4, "L1")
+        response = export_client.get(f"/api/operations/{out.id}/pick_path/")
+        assert response.status_code == 200
+        assert [(stop["position"], [item["quantity"] for item in stop["items"]]) for stop in response.data] == [
+            ("A-01", [4])
+        ]
+
+
+# Fixture pro API klienta přihlášeného uživatelem klienta produktu
+@pytest.fixture
+def export_client(api_client, stock_product):
+    from user.models import User
+
+    user = User.objects.create(email="export@example.com", password="pass")
+    user.client.add(stock_product.client)
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
+@pytest.mark.django_db
+class TestExports:
+
+    # Snímek zásob ze skladové knihy – řádek na šarži a krabici
+    def test_stock_export_csv(self, export_client, stock_product, received_group):
+        out = Operation.objects.create(number="OUT-E1", type="OUT", client=stock_product.client)
+        add_group_to_out_operation(out, stock_product.id, 4, "L1")
+
+        response = export_client.get("/api/stock/export/")
+        assert response.status_code == 200
+        assert response["Content-Disposition"] == 'attachment; filename="zasoby.csv"'
+
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        assert lines[0].startswith("Klient,SKU")
+        assert len(lines) == 2
+        assert lines[1].endswith(",LEDGER-BOX,,6")
+
+    # Export operací s řádky jako XLSX
+    def test_operation_export_xlsx(self, export_client, received_group):
+        import io
+        import openpyxl
+
+        response = export_client.get("/api/operations/export/?file_type=xlsx")
+        assert response.status_code == 200
+
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        assert rows[1][0] == "IN-L1"
+        assert rows[1][6:] == ("LEDGER-1", "Ledger produkt", "L1", None, "LEDGER-BOX", 10)
+
+    # Neznámý formát vrací 400
+    def test_unknown_file_type(self, export_client):
+        response = export_client.get("/api/history/export/?file_type=pdf")
+        assert response.status_code == 400
@@ -0,0 +1,8 @@
+# stock/urls.py
+from django.urls import path
+from stock.views import stock_export, stock_recalculate
+
+urlpatterns = [
+    path('export/', stock_export, name='stock_export'),
+    path('recalculate/', stock_recalculate, name='stock_recalculate'),
+]
@@ -0,0 +1,63 @@
+from django.db.models import Sum
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from jobs.serializers import JobSerializer
+from jobs.services import job_service
+from stock.models import StockMovement
+from utils.export import EXPORT_CHUNK_SIZE, export_response
+
+
+@swagger_auto_schema(method='get', operation_description="Export aktuálních zásob po šaržích a krabicích (CSV nebo XLSX) – streamovaně.", manual_parameters=[
+    openapi.Parameter('clientId', openapi.IN_QUERY, description="ID klienta", type=openapi.TYPE_STRING),
+    openapi.Parameter('file_type', openapi.IN_QUERY, description="Formát (csv, xlsx)", type=openapi.TYPE_STRING),
+])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stock_export(request):
+    """
+    Snímek zásob ze skladové knihy – součet pohybů po šarži a krabici (nulové stavy se vynechají).
+    Agregace běží v databázi, výsledek se čte server-side kurzorem a odesílá průběžně.
+
+    :param request: HTTP GET požadavek, volitelně s parametry 'clientId' a 'file_type'
+    :return: StreamingHttpResponse se souborem
+    """
+    client_ids = list(request.user.client.values_list('id', flat=True))
+    client_id = request.GET.get('clientId')
+    if client_id and client_id.isdigit() and int(client_id) in client_ids:
+        client_ids = [int(client_id)]
+
+    fields = (
+        'product__client__name', 'product__sku', 'product__name', 'batch__batch_number',
+        'batch__expiration_date', 'box__ean', 'box__position__code',
+    )
+    rows = (
+        StockMovement.objects.filter(product__client_id__in=client_ids)
+        .values('batch_id', 'box_id', *fields)
+        .annotate(quantity=Sum('delta'))
+        .exclude(quantity=0)
+        .order_by('product__sku', 'batch__batch_number', 'box__ean')
+        .values_list(*fields, 'quantity')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    header = ('Klient', 'SKU', 'Produkt', 'Šarže', 'Expirace', 'EAN krabice', 'Pozice', 'Množství')
+    return export_response(request, 'zasoby', header, rows)
+
+
+@swagger_auto_schema(method='post', operation_description="Zařadí přepočet čítačů zásob všech produktů a šarží do fronty úloh.", responses={202: JobSerializer()})
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def stock_recalculate(request):
+    """
+    Spustí přepočet `amount_cached` na pozadí a hned vrátí úlohu (stav na `/api/jobs/{id}/`).
+    Pokud přepočet už čeká nebo běží, vrátí se existující úloha.
+
+    :param request: HTTP POST požadavek
+    :return: Response s úlohou (202)
+    """
+    job = job_service.enqueue('stock.recalculate_amounts', user=request.user, unique=True)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,30 @@
+from django.db import connection
+
+# Počet ID v jednom DELETE – drží dotaz pod limitem parametrů databáze (PostgreSQL 65535)
+CHUNK_SIZE = 1000
+
+
+def delete_rows(model, ids):
+    """
+    Smaže řádky modelu podle primárního klíče po dávkách (`CHUNK_SIZE`) – bez signálů jednotlivých instancí
+    a bez kaskády ORM (Django by s posluchači signálů řádky načítal a mazal po instancích).
+
+    Volající předem odstraní závislé řádky (vazby M2M) a vedlejší efekty signálů – skladovou
+    knihu, historii, vyhledávání – zapíše hromadně sám.
+
+    :param model: Třída modelu
+    :param ids: Primární klíče
+    :return: Počet smazaných řádků
+    """
+    ids = list(ids)
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', chunk)
+            deleted += cursor.rowcount
+    return deleted
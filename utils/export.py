@@ -0,0 +1,167 @@
+import csv
+import zipfile
+from decimal import Decimal
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+# Po kolika řádcích se čte z databáze (server-side kurzor)
+EXPORT_CHUNK_SIZE = 2000
+
+# Po kolika bajtech se odesílá další část XLSX souboru
+XLSX_FLUSH_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class _Echo:
+    """
+    „Soubor“, jehož `write` jen vrací zapsaný text – csv.writer tak vyrábí řádky pro generátor.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(header, rows):
+    """
+    Generuje CSV po řádcích (s BOM, aby Excel správně načetl diakritiku).
+
+    :param header: Názvy sloupců
+    :param rows: Iterovatelné řádky (tuple hodnot)
+    :return: Generátor textových částí
+    """
+    writer = csv.writer(_Echo())
+    yield '\ufeff'
+    for row in chain([header], rows):
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class _StreamBuffer:
+    """
+    Nepřevíjecí výstup pro zipfile – zapsané bajty se průběžně vybírají a odesílají.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# Řídicí znaky, které XML nepovoluje
+_XML_ILLEGAL = {code: None for code in range(32) if code not in (9, 10, 13)}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(str(value).translate(_XML_ILLEGAL))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_stream(header, rows, sheet_name='Export'):
+    """
+    Generuje XLSX po řádcích – list se zapisuje přímo do ZIP streamu (inline řetězce, bez
+    sdílené tabulky), takže paměť drží jen rozpracovaný blok komprese.
+
+    :param header: Názvy sloupců
+    :param rows: Iterovatelné řádky (tuple hodnot)
+    :param sheet_name: Název listu
+    :return: Generátor bajtových částí
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content.replace('{sheet_name}', escape(sheet_name, {'"': '&quot;'})))
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.encode())
+            for row in chain([header], rows):
+                cells = ''.join('<c/>' if value is None else _xlsx_cell(value) for value in row)
+                sheet.write(f'<row>{cells}</row>'.encode())
+                if buffer.size >= XLSX_FLUSH_BYTES:
+                    yield buffer.drain()
+            sheet.write(_SHEET_END.encode())
+    yield buffer.drain()
+
+
+def export_response(request, filename, header, rows):
+    """
+    Streamovaná odpověď s exportem ve formátu podle parametru `?file_type=csv|xlsx` (výchozí CSV).
+
+    :param request: HTTP požadavek
+    :param filename: Název souboru bez přípony
+    :param header: Názvy sloupců
+    :param rows: Iterovatelné řádky – ideálně `values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)`
+    :return: StreamingHttpResponse
+    """
+    file_type = request.query_params.get('file_type', 'csv').lower()
+    if file_type not in EXPORT_FORMATS:
+        raise ValidationError({"file_type": f"Podporované formáty: {', '.join(EXPORT_FORMATS)}."})
+
+    content = csv_stream(header, rows) if file_type == 'csv' else xlsx_stream(header, rows, sheet_name=filename)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[file_type])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_type}"'
+    return response
@@ -1,5 +1,17 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db import connections
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
 
 class CustomPageNumberPagination(PageNumberPagination):
     # Výchozí počet položek na stránku
@@ -16,6 +28,7 @@ class CustomPageNumberPagination(PageNumberPagination):
 
     def paginate_queryset(self, queryset, request, view=None):
         # Pokud je v URL dotazu `no_page=1`, vrátí celý queryset bez stránkování
+        # (view s `StreamingListMixin` místo toho data streamuje)
         if request.query_params.get(self.no_page_param) == '1':
             return None
         return super().paginate_queryset(queryset, request, view)
@@ -25,4 +38,202 @@ class CustomPageNumberPagination(PageNumberPagination):
         return Response({
             'count': self.page.paginator.count,  # Celkový počet položek
             'results': data  # Aktuální stránka dat
-        })
\ No newline at end of file
+        })
+
+
+def keyset_filter(ordering, values):
+    """
+    Sestaví podmínku „za kurzorem“ pro řazení podle více polí, např. pro
+    (`-updated_at`, `-id`): `updated_at < v1 OR (updated_at = v1 AND id < v2)`.
+
+    :param ordering: Pole řazení (s `-` pro sestupné)
+    :param values: Hodnoty posledního záznamu ve stejném pořadí
+    :return: Objekt Q
+    """
+    conditions = []
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {ordering[i].lstrip('-'): values[i] for i in range(index)}
+        conditions.append(Q(**equal, **{f'{name}__{lookup}': values[index]}))
+    return reduce(or_, conditions)
+
+
+def keyset_values(obj, ordering):
+    """
+    Vrací hodnoty polí řazení z instance (pro sestavení kurzoru).
+    """
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def iterate_keyset(queryset, ordering, chunk_size=1000):
+    """
+    Prochází queryset po dávkách pomocí kurzoru místo OFFSETu – každá dávka stojí
+    stejně bez ohledu na to, jak hluboko v tabulce je.
+
+    :param queryset: Queryset k procházení
+    :param ordering: Pole řazení (poslední musí být unikátní, typicky `id`)
+    :param chunk_size: Velikost dávky
+    :return: Generátor seznamů instancí
+    """
+    queryset = queryset.order_by(*ordering)
+    values = None
+    while True:
+        chunk_qs = queryset.filter(keyset_filter(ordering, values)) if values else queryset
+        chunk = list(chunk_qs[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        values = keyset_values(chunk[-1], ordering)
+
+
+def estimate_count(queryset):
+    """
+    Odhad počtu řádků z plánu dotazu (PostgreSQL `EXPLAIN`) – bez procházení tabulky.
+
+    :param queryset: Queryset
+    :return: Odhadovaný počet nebo None, pokud databáze odhad neumí
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Kurzorové stránkování podle (`updated_at`, `id`) / (`timestamp`, `id`) – bez OFFSETu a COUNT(*).
+
+    Aktivuje se parametrem `?cursor=` (první stránka s prázdnou hodnotou), jinak se použije
+    klasické stránkování `CustomPageNumberPagination`, takže stávající klienti fungují beze změny.
+    Řazení určuje atribut `keyset_ordering` view. Celkový počet jen na vyžádání:
+    `?count=exact` nebo `?count=estimate`.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('-id',)
+
+    def __init__(self):
+        self.fallback = None
+        self.next_cursor = None
+        self.count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.fallback = CustomPageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        ordering = tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+        page_size = self.get_page_size(request)
+
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'exact':
+            self.count = queryset.count()
+        elif count_mode == 'estimate':
+            self.count = estimate_count(queryset)
+
+        queryset = queryset.order_by(*ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(keyset_filter(ordering, self.decode_cursor(cursor)))
+
+        page = list(queryset[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(keyset_values(page[-1], ordering))
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'count': self.count,  # None, pokud nebyl vyžádán
+            'next': self.get_next_link(),
+            'cursor': self.next_cursor,
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    @staticmethod
+    def encode_cursor(values):
+        # Časy v plné přesnosti (DjangoJSONEncoder je zkracuje na milisekundy a kurzor by pak
+        # přeskakoval nebo opakoval záznamy se stejným časem)
+        raw = json.dumps(values, default=lambda value: value.isoformat()).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise NotFound("Neplatný kurzor.")
+        if not isinstance(values, list):
+            raise NotFound("Neplatný kurzor.")
+        return values
+
+
+class StreamingListMixin:
+    """
+    Mixin pro ViewSety – `?no_page=1` místo načtení celé tabulky do paměti streamuje
+    JSON pole po dávkách (kurzorově podle `keyset_ordering`).
+    """
+    no_page_param = 'no_page'
+    stream_chunk_size = 1000
+    keyset_ordering = ('-id',)
+
+    def paginate_or_stream(self, queryset):
+        """
+        Vrací stránkovanou odpověď, nebo streamovaný export při `?no_page=1`.
+
+        :param queryset: Queryset k výpisu
+        :return: Response nebo StreamingHttpResponse
+        """
+        if self.request.query_params.get(self.no_page_param) == '1':
+            return self.stream_queryset(queryset)
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page if page is not None else queryset, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        return self.paginate_or_stream(self.filter_queryset(self.get_queryset()))
+
+    def stream_queryset(self, queryset):
+        """
+        Streamuje queryset jako JSON pole – paměť drží vždy jen jednu dávku.
+        """
+        def rows():
+            yield '['
+            first = True
+            for chunk in iterate_keyset(queryset, self.keyset_ordering, self.stream_chunk_size):
+                for item in self.get_serializer(chunk, many=True).data:
+                    yield ('' if first else ',') + json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+                    first = False
+            yield ']'
+
+        return StreamingHttpResponse(rows(), content_type='application/json')
@@ -0,0 +1,78 @@
+import threading
+import weakref
+
+from django.db import connection, transaction
+
+
+class TransactionBuffer:
+    """
+    Odložené změny, které se provedou až po commitu transakce (historie, vyhledávání, cache).
+
+    Každý savepoint (vnořený `atomic()`) má vlastní buffer s vlastním `on_commit` callbackem.
+    Vrácení savepointu zahodí jeho callback – Django ho odebere ze seznamu a buffer tím zanikne
+    (registr drží jen slabou referenci), takže změny z vráceného bloku se neprovedou.
+    Změny z ostatních úrovní transakce zůstávají.
+    """
+
+    def __init__(self, factory, flush):
+        """
+        :param factory: Funkce vracející prázdný kontejner (např. `list`, `set`)
+        :param flush: Funkce volaná po commitu s naplněným kontejnerem
+        """
+        self._factory = factory
+        self._flush = flush
+        self._state = threading.local()
+
+    def _registry(self):
+        registry = getattr(self._state, 'registry', None)
+        if registry is None:
+            registry = self._state.registry = {}
+        return registry
+
+    def get(self):
+        """
+        Vrací kontejner aktuálního savepointu; při prvním použití zaregistruje `on_commit`.
+        Volá se jen uvnitř transakce (`connection.in_atomic_block`).
+        """
+        key = tuple(connection.savepoint_ids)
+        registry = self._registry()
+        reference = registry.get(key)
+        pending = reference() if reference is not None else None
+        if pending is None or pending.done:
+            pending = _Pending(self, key)
+
+            def forget(reference, key=key):
+                if registry.get(key) is reference:
+                    del registry[key]
+
+            registry[key] = weakref.ref(pending, forget)
+            transaction.on_commit(pending.flush)
+        return pending.items
+
+    def pending(self):
+        """
+        Kontejnery čekající na commit v aktuální transakci (od nejvnějšího savepointu).
+        """
+        current = tuple(connection.savepoint_ids)
+        pending = []
+        for key, reference in sorted(self._registry().items(), key=lambda item: len(item[0])):
+            entry = reference()
+            if entry is not None and not entry.done and current[:len(key)] == key:
+                pending.append(entry.items)
+        return pending
+
+
+class _Pending:
+    """
+    Kontejner jedné úrovně transakce. Silnou referenci drží jen `on_commit` callback.
+    """
+
+    def __init__(self, buffer, key):
+        self.buffer = buffer
+        self.key = key
+        self.items = buffer._factory()
+        self.done = False
+
+    def flush(self):
+        self.done = True
+        self.buffer._flush(self.items)